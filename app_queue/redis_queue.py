@@ -1,41 +1,206 @@
+import asyncio
 import json
 import logging
+import queue
+import time
 from collections import deque
-from threading import Lock
+from collections.abc import Callable
+from threading import Lock, Thread
 from typing import Any
 
 import redis
+import redis.asyncio as aioredis
+
+from bot.config import REDIS_SOCKET_TIMEOUT, REDIS_URL, TELEGRAM_DEAD_LETTER_QUEUE, TELEGRAM_QUEUE_NAME
+from utils.metrics import QUEUE_DEAD_LETTER, QUEUE_DEPTH, QUEUE_FALLBACK, QUEUE_PUSHED
+
+QUEUED_AT_FIELD = "_queued_at"
+
+
+class QueuedItem(dict):
+    """A popped message; `queued_at` is the wall-clock time it was pushed (None if unknown).
+
+    The timestamp travels inside the serialized payload but is kept out of the
+    dict itself, so the item compares equal to what was pushed.
+    """
+
+    queued_at: float | None = None
+
+
+def _encode(item: dict[str, Any], queued_at: float) -> str:
+    return json.dumps({**item, QUEUED_AT_FIELD: queued_at}, ensure_ascii=False)
+
+
+def _decode(raw: str) -> QueuedItem:
+    data = json.loads(raw)
+    queued_at = data.pop(QUEUED_AT_FIELD, None)
+    item = QueuedItem(data)
+    item.queued_at = queued_at
+    return item
 
-from bot.config import REDIS_URL, TELEGRAM_QUEUE_NAME
 
 _fallback_queue: deque[dict[str, Any]] = deque()
 _fallback_lock = Lock()
 
+_client: redis.Redis | None = None
+_async_client: aioredis.Redis | None = None
+_client_lock = Lock()
+
 
 def _get_client() -> redis.Redis:
-    return redis.from_url(REDIS_URL, decode_responses=True)
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = redis.from_url(
+                    REDIS_URL,
+                    decode_responses=True,
+                    socket_timeout=REDIS_SOCKET_TIMEOUT,
+                    socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+                )
+    return _client
+
+
+def _get_async_client() -> aioredis.Redis:
+    global _async_client
+    if _async_client is None:
+        _async_client = aioredis.from_url(REDIS_URL, decode_responses=True)
+    return _async_client
+
+
+_push_queue: queue.Queue[tuple[Callable[..., None], tuple[Any, ...]]] = queue.Queue()
+_push_thread: Thread | None = None
+
+
+def _run_pushes() -> None:
+    while True:
+        func, args = _push_queue.get()
+        try:
+            func(*args)
+        finally:
+            _push_queue.task_done()
+
+
+def _offload(func: Callable[..., None], *args: Any) -> bool:
+    """Run a blocking push on the background thread when called from the event loop.
+
+    Alerts are queued from the position engine and the sender, which run in the
+    loop; a slow or unreachable Redis must not stall ticks. Returns False outside
+    a loop, where the caller pushes inline. One thread keeps pushes in order.
+    """
+    global _push_thread
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    with _client_lock:
+        if _push_thread is None:
+            _push_thread = Thread(target=_run_pushes, name="redis-push", daemon=True)
+            _push_thread.start()
+    _push_queue.put((func, args))
+    return True
+
+
+async def close_async_client() -> None:
+    global _async_client
+    # Pushes handed off by the loop must reach Redis before the process exits
+    await asyncio.to_thread(_push_queue.join)
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+def _pop_fallback(count: int) -> list[dict[str, Any]]:
+    with _fallback_lock:
+        return [_fallback_queue.popleft() for _ in range(min(count, len(_fallback_queue)))]
 
 
 def push(data: dict[str, Any]) -> None:
+    push_many([data])
+
+
+def push_many(items: list[dict[str, Any]]) -> None:
+    if not items:
+        return
+    queued_at = time.time()
+    QUEUE_PUSHED.inc(len(items))
+    if not _offload(_rpush, list(items), queued_at):
+        _rpush(items, queued_at)
+
+
+def _rpush(items: list[dict[str, Any]], queued_at: float) -> None:
     try:
         client = _get_client()
-        client.rpush(TELEGRAM_QUEUE_NAME, json.dumps(data, ensure_ascii=False))
+        client.rpush(TELEGRAM_QUEUE_NAME, *(_encode(item, queued_at) for item in items))
     except Exception as exc:  # noqa: BLE001
         logging.exception("Redis push failed, use in-memory fallback: %s", exc)
+        QUEUE_FALLBACK.inc(len(items))
+        fallback = []
+        for item in items:
+            queued = QueuedItem(item)
+            queued.queued_at = queued_at
+            fallback.append(queued)
         with _fallback_lock:
-            _fallback_queue.append(data)
+            _fallback_queue.extend(fallback)
+
+
+def push_dead_letter(item: dict[str, Any], reason: str) -> None:
+    """Park a message that can never be delivered so it can be inspected or replayed by hand."""
+    entry = {"task": item, "reason": reason}
+    QUEUE_DEAD_LETTER.inc()
+    if not _offload(_rpush_dead_letter, entry):
+        _rpush_dead_letter(entry)
+
+
+def _rpush_dead_letter(entry: dict[str, Any]) -> None:
+    try:
+        _get_client().rpush(TELEGRAM_DEAD_LETTER_QUEUE, json.dumps(entry, ensure_ascii=False))
+    except Exception as exc:  # noqa: BLE001
+        logging.error("Dead-letter push failed, message dropped: %s (%s)", entry, exc)
 
 
 def pop() -> dict[str, Any] | None:
+    items = pop_many(1)
+    return items[0] if items else None
+
+
+def pop_many(count: int) -> list[dict[str, Any]]:
     try:
         client = _get_client()
-        item = client.lpop(TELEGRAM_QUEUE_NAME)
-        if item:
-            return json.loads(item)
+        raw = client.lpop(TELEGRAM_QUEUE_NAME, count)
+        if raw:
+            return [_decode(item) for item in raw]
     except Exception as exc:  # noqa: BLE001
         logging.exception("Redis pop failed, trying in-memory fallback: %s", exc)
 
-    with _fallback_lock:
-        if _fallback_queue:
-            return _fallback_queue.popleft()
-    return None
+    return _pop_fallback(count)
+
+
+async def pop_many_async(count: int, timeout: float = 1.0) -> list[dict[str, Any]]:
+    """Wait up to `timeout` seconds with BLPOP, then take up to `count` items in total."""
+    items = _pop_fallback(count)
+    if items:
+        return items
+
+    client = _get_async_client()
+    result = await client.blpop([TELEGRAM_QUEUE_NAME], timeout=timeout)
+    if not result:
+        return []
+
+    raw = [result[1]]
+    if count > 1:
+        raw.extend(await client.lpop(TELEGRAM_QUEUE_NAME, count - 1) or [])
+    return [_decode(item) for item in raw]
+
+
+def queue_depth() -> int:
+    """Messages waiting for the worker: Redis list length plus the in-memory fallback."""
+    depth = len(_fallback_queue)
+    try:
+        depth += _get_client().llen(TELEGRAM_QUEUE_NAME)
+    except Exception:  # noqa: BLE001
+        pass
+    return depth
+
+
+QUEUE_DEPTH.set_function(queue_depth)
@@ -0,0 +1 @@
+"""Нагрузочные бенчмарки бота."""
@@ -0,0 +1,234 @@
+"""
+Нагрузочный бенчмарк ценового конвейера на синтетических тиках.
+
+Синтетические сообщения тикера проходят реальный путь бота:
+_on_message менеджера биржи -> PriceSlot -> PositionEngine -> Position.apply_batch.
+Алерты и записи в таблицу перехватываются и не отправляются. Отчет: тиков в секунду,
+p50/p99 задержки от прихода тика до решения движка и до алерта, число потоков и RSS.
+Результат сохраняется в JSON для сравнения между коммитами.
+
+Запуск:
+    python -m benchmarks.price_pipeline --symbols 1000 --positions 5000 --ticks 200000
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import resource
+import subprocess
+import threading
+import time
+from datetime import datetime
+
+from loguru import logger
+
+from utils import position_engine
+from utils.get_bingx_data import BingXWSManager
+from utils.get_bybit_data import BybitWSManager
+from utils.tick_replay import captured_side_effects
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+
+class BenchEngine(position_engine.PositionEngine):
+    """
+    Движок, который замеряет время от первого тика в слоте до обработки пачки.
+    """
+
+    def __init__(self, events, **kwargs):
+        super().__init__(**kwargs)
+        self._events = events
+        self._arrivals = {}  # { (exchange, coin): время первого тика пачки }
+        self.batch_latencies = []
+        self.alert_latencies = []
+
+    def _mark_dirty(self, key):
+        self._arrivals[key] = time.perf_counter()
+        super()._mark_dirty(key)
+
+    def on_batch(self, exchange, coin, last, high=None, low=None):
+        events_before = len(self._events)
+        super().on_batch(exchange, coin, last, high, low)
+        arrived = self._arrivals.pop(self._key(exchange, coin), None)
+        if arrived is None:
+            return
+        latency = time.perf_counter() - arrived
+        self.batch_latencies.append(latency)
+        if len(self._events) > events_before:
+            self.alert_latencies.append(latency)
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def rss_mb():
+    """
+    Текущий RSS процесса в МБ (пиковый, если /proc недоступен).
+    """
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def symbol_names(count):
+    return [f'SYM{i:04d}USDT' for i in range(count)]
+
+
+def encode_message(exchange, coin, price, ts_ms):
+    """
+    Сообщение тикера в формате биржи (BingX присылает gzip).
+
+    Биржи шлют компактный JSON без пробелов, и быстрые декодеры из ws_decode
+    рассчитаны именно на него: с пробелами кадр ушел бы на медленный json-путь.
+    """
+    if exchange == 'bingx':
+        payload = {'dataType': f"{coin.replace('USDT', '-USDT')}@ticker",
+                   'data': {'e': '24hTicker', 'E': ts_ms, 's': coin.replace('USDT', '-USDT'), 'c': f'{price:.6f}'}}
+        return gzip.compress(json.dumps(payload, separators=(',', ':')).encode())
+    payload = {'topic': f'tickers.{coin}', 'type': 'snapshot',
+               'data': {'symbol': coin, 'lastPrice': f'{price:.6f}'}, 'cs': ts_ms, 'ts': ts_ms}
+    return json.dumps(payload, separators=(',', ':'))
+
+
+def open_positions(engine, symbols, prices, count, exchange, rng):
+    """
+    Открывает count синтетических позиций, распределенных по символам.
+    """
+    for i in range(count):
+        coin = symbols[i % len(symbols)]
+        price = prices[coin]
+        side = rng.choice(('LONG', 'SHORT'))
+        sign = 1 if side == 'LONG' else -1
+        signal = {'coin': coin, 'side': side}
+        for tp in range(1, 6):
+            signal[f'tp{tp}'] = round(price * (1 + sign * 0.003 * tp), 6)
+        position = position_engine.Position.from_signal(None, signal, price, i + 2, i + 1, exchange)
+        engine.add_position(position, persist=False)
+
+
+def run(symbols=1000, positions=5000, ticks=200_000, batch=500, exchange='bybit', seed=1, backend='auto'):
+    """
+    Прогоняет ticks синтетических сообщений через конвейер.
+
+    Args:
+        symbols (int): Число монет в потоке.
+        positions (int): Число открытых позиций.
+        ticks (int): Общее число сообщений тикера.
+        batch (int): Сколько сообщений приходит между проходами движка.
+        exchange (str): 'bybit' или 'bingx' - чей обработчик сообщений используется.
+        seed (int): Зерно генератора.
+        backend (str): Реализация индекса уровней ('auto', 'numpy', 'bisect').
+
+    Returns:
+        dict: Результаты замера.
+    """
+    rng = random.Random(seed)
+    manager = BingXWSManager() if exchange == 'bingx' else BybitWSManager()
+    names = symbol_names(symbols)
+    prices = {coin: rng.uniform(0.1, 1000.0) for coin in names}
+
+    events = []
+    engine = BenchEngine(events, subscribe=lambda coin, _exchange, slot: manager.add_subscriber(coin, slot),
+                         unsubscribe=lambda coin, _exchange, slot: manager.remove_subscriber(coin, slot),
+                         index_factory=lambda: position_engine.make_trigger_index(backend))
+    with captured_side_effects(time.perf_counter, events):
+        open_positions(engine, names, prices, positions, exchange, rng)
+        engine.step()
+
+        # Сообщения готовятся заранее, чтобы замер не включал генерацию
+        messages = []
+        ts_ms = int(time.time() * 1000)
+        for i in range(ticks):
+            coin = names[rng.randrange(symbols)]
+            prices[coin] *= 1 + rng.gauss(0, 0.0005)
+            messages.append(encode_message(exchange, coin, prices[coin], ts_ms + i))
+
+        rss_before = rss_mb()
+        started = time.perf_counter()
+        for i, message in enumerate(messages, start=1):
+            manager._on_message(message)
+            if i % batch == 0:
+                engine.step()
+        engine.step()
+        elapsed = time.perf_counter() - started
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 4)
+
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'params': {'symbols': symbols, 'positions': positions, 'ticks': ticks, 'batch': batch,
+                   'exchange': exchange, 'seed': seed,
+                   'backend': type(engine._index_factory()).__name__},
+        'elapsed_s': round(elapsed, 4),
+        'ticks_per_s': round(ticks / elapsed, 1) if elapsed else None,
+        'batches': len(engine.batch_latencies),
+        'tick_to_decision_ms': {'p50': ms(percentile(engine.batch_latencies, 50)),
+                                'p99': ms(percentile(engine.batch_latencies, 99))},
+        'alerts': len(engine.alert_latencies),
+        'tick_to_alert_ms': {'p50': ms(percentile(engine.alert_latencies, 50)),
+                             'p99': ms(percentile(engine.alert_latencies, 99))},
+        'open_positions': engine.open_position_count(),
+        'threads': threading.active_count(),
+        'rss_mb': round(rss_mb(), 1),
+        'rss_growth_mb': round(rss_mb() - rss_before, 1),
+    }
+
+
+def save(result, path=None):
+    """
+    Сохраняет результат в JSON (по умолчанию benchmarks/results/<время>-<коммит>.json).
+    """
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        name = f"{datetime.now():%Y%m%d-%H%M%S}-{result['revision'] or 'local'}-{result['params']['exchange']}.json"
+        path = os.path.join(RESULTS_DIR, name)
+    with open(path, 'w') as file:
+        json.dump(result, file, indent=2, ensure_ascii=False)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк ценового конвейера на синтетических тиках")
+    parser.add_argument('--symbols', type=int, default=1000)
+    parser.add_argument('--positions', type=int, default=5000)
+    parser.add_argument('--ticks', type=int, default=200_000)
+    parser.add_argument('--batch', type=int, default=500, help="Сообщений между проходами движка")
+    parser.add_argument('--exchange', choices=('bybit', 'bingx'), default='bybit')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--backend', choices=('auto', 'numpy', 'bisect'), default='auto',
+                        help="Реализация индекса уровней срабатывания")
+    parser.add_argument('--output', help="Путь к JSON с результатом")
+    parser.add_argument('--with-logging', action='store_true',
+                        help="Не отключать логирование (замер включает запись bot.log)")
+    args = parser.parse_args(argv)
+
+    if not args.with_logging:
+        logger.disable('utils')
+    result = run(args.symbols, args.positions, args.ticks, args.batch, args.exchange, args.seed, args.backend)
+    path = save(result, args.output)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    print(f"Сохранено в {path}")
+
+
+if __name__ == '__main__':
+    main()
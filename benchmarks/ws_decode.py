@@ -0,0 +1,88 @@
+"""
+Микробенчмарк декодирования кадров тикеров Bybit и BingX.
+
+Сравнивает прежний путь (GzipFile + BytesIO, decode, json.loads всего кадра)
+с быстрым (zlib одним вызовом, вырезание символа/цены/времени) и полным разбором
+через utils.ws_decode.loads (orjson, если установлен). Отчет: микросекунды на кадр
+(лучший из нескольких прогонов).
+
+Запуск:
+    python -m benchmarks.ws_decode --frames 100000
+"""
+import argparse
+import gzip
+import io
+import json
+import timeit
+
+from utils.ws_decode import JSON_BACKEND, decode_bingx_ticker, decode_bybit_ticker, gunzip, loads
+
+BYBIT_FRAME = json.dumps({
+    "topic": "tickers.BTCUSDT", "type": "snapshot", "ts": 1700000000000, "cs": 1,
+    "data": {"symbol": "BTCUSDT", "tickDirection": "PlusTick", "price24hPcnt": "0.01", "lastPrice": "65000.5",
+             "prevPrice24h": "64000", "highPrice24h": "66000", "lowPrice24h": "63000", "prevPrice1h": "64900",
+             "markPrice": "65000.1", "indexPrice": "65000.2", "openInterest": "1000", "turnover24h": "1",
+             "volume24h": "1", "fundingRate": "0.0001", "bid1Price": "65000", "ask1Price": "65001"},
+}, separators=(',', ':'))
+
+BINGX_FRAME = gzip.compress(json.dumps({
+    "code": 0, "dataType": "BTC-USDT@ticker",
+    "data": {"e": "24hTicker", "E": 1700000000000, "s": "BTC-USDT", "p": "100", "P": "0.15", "c": "65000.5",
+             "L": "0.1", "h": "66000", "l": "63000", "v": "1000", "q": "1", "o": "64000", "O": 1, "C": 2,
+             "A": "1", "a": "65001", "B": "2", "b": "65000"},
+}, separators=(',', ':')).encode())
+
+
+def legacy_bybit(message):
+    data = json.loads(message)
+    return data['data']['symbol'], float(data['data']['lastPrice'])
+
+
+def legacy_bingx(message):
+    with gzip.GzipFile(fileobj=io.BytesIO(message)) as f:
+        text = f.read().decode('utf-8')
+    data = json.loads(text)
+    return data['data']['s'].replace('-', ''), float(data['data']['c'])
+
+
+def full_bybit(message):
+    data = loads(message)
+    return data['data']['symbol'], float(data['data']['lastPrice'])
+
+
+def full_bingx(message):
+    data = loads(gunzip(message))
+    return data['data']['s'].replace('-', ''), float(data['data']['c'])
+
+
+def fast_bingx(message):
+    return decode_bingx_ticker(gunzip(message))
+
+
+CASES = {
+    'bybit': (BYBIT_FRAME, {'legacy': legacy_bybit, f'full_{JSON_BACKEND}': full_bybit, 'fast': decode_bybit_ticker}),
+    'bingx': (BINGX_FRAME, {'legacy': legacy_bingx, f'full_{JSON_BACKEND}': full_bingx, 'fast': fast_bingx}),
+}
+
+
+def measure(decode, frame, frames, repeat=5):
+    best = min(timeit.repeat(lambda: decode(frame), number=frames, repeat=repeat))
+    return round(best / frames * 1e6, 3)
+
+
+def run(frames=100_000):
+    results = {}
+    for exchange, (frame, decoders) in CASES.items():
+        results[exchange] = {name: measure(decode, frame, frames) for name, decode in decoders.items()}
+    return {'unit': 'us_per_frame', 'json_backend': JSON_BACKEND, **results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Микробенчмарк декодирования кадров тикеров")
+    parser.add_argument('--frames', type=int, default=100_000)
+    args = parser.parse_args(argv)
+    print(json.dumps(run(args.frames), indent=2))
+
+
+if __name__ == '__main__':
+    main()
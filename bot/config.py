@@ -10,19 +10,70 @@ TECH_CHAT_ID = os.getenv("TECH_CHAT_ID") or os.getenv("TECH_CHANNEL_NAME", "")
 AV_CHAT_ID = os.getenv("AV_CHAT_ID") or os.getenv("AV_CHANNEL_NAME", "")
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "5"))
 TELEGRAM_QUEUE_NAME = os.getenv("TELEGRAM_QUEUE_NAME", "telegram_queue")
+TELEGRAM_DEAD_LETTER_QUEUE = os.getenv("TELEGRAM_DEAD_LETTER_QUEUE", "telegram_dead_letter")
+
+TELEGRAM_SEND_CONCURRENCY = int(os.getenv("TELEGRAM_SEND_CONCURRENCY", "8"))
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30"))
+TELEGRAM_CHAT_RATE_PER_MIN = float(os.getenv("TELEGRAM_CHAT_RATE_PER_MIN", "20"))
+TELEGRAM_CHAT_BURST = float(os.getenv("TELEGRAM_CHAT_BURST", "3"))
+TELEGRAM_CONNECTION_LIMIT = int(os.getenv("TELEGRAM_CONNECTION_LIMIT", "16"))
+TELEGRAM_KEEPALIVE_TIMEOUT = float(os.getenv("TELEGRAM_KEEPALIVE_TIMEOUT", "60"))
+TELEGRAM_COALESCE_WINDOW_MS = int(os.getenv("TELEGRAM_COALESCE_WINDOW_MS", "0"))
+TELEGRAM_SEND_RETRIES = int(os.getenv("TELEGRAM_SEND_RETRIES", "5"))
+TELEGRAM_BREAKER_THRESHOLD = int(os.getenv("TELEGRAM_BREAKER_THRESHOLD", "5"))
+TELEGRAM_BREAKER_RESET = float(os.getenv("TELEGRAM_BREAKER_RESET", "30"))
+TELEGRAM_SHUTDOWN_TIMEOUT = float(os.getenv("TELEGRAM_SHUTDOWN_TIMEOUT", "10"))
 
 WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "https://YOUR_DOMAIN_OR_NGROK")
 WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
 WEBHOOK_URL = f"{WEBHOOK_HOST.rstrip('/')}{WEBHOOK_PATH}"
 WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8000"))
+SIGNAL_QUEUE_SIZE = int(os.getenv("SIGNAL_QUEUE_SIZE", "100"))
+
+ADMIN_ENDPOINTS = os.getenv("ADMIN_ENDPOINTS", "False").lower() == "true"
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+ADMIN_PROFILE_MAX_SECONDS = float(os.getenv("ADMIN_PROFILE_MAX_SECONDS", "60"))
 
 EXCHANGE = os.getenv("EXCHANGE", "bybit").lower()
 LOG_PONG_MESSAGES = os.getenv("LOG_PONG_MESSAGES", "False").lower() == "true"
+LOG_ROTATION = os.getenv("LOG_ROTATION", "10 MB")
+LOG_RETENTION = os.getenv("LOG_RETENTION", "30 days")
+LOG_COMPRESSION = os.getenv("LOG_COMPRESSION", "gz")
+LOG_THROTTLE_SECONDS = float(os.getenv("LOG_THROTTLE_SECONDS", "60"))
 
 GS_JS_FILE = os.getenv("GS_JS_FILE", "service_account.json")
 GS_SHEET_FILE = os.getenv("GS_SHEET_FILE", "")
 G_LIST = os.getenv("G_LIST", "0")
+GS_FLUSH_INTERVAL_MS = int(os.getenv("GS_FLUSH_INTERVAL_MS", "500"))
+GS_FLUSH_MAX_CELLS = int(os.getenv("GS_FLUSH_MAX_CELLS", "200"))
+GS_ROW_RESYNC_INTERVAL = int(os.getenv("GS_ROW_RESYNC_INTERVAL", "300"))
+GS_MIRROR_FULL_REFRESH = int(os.getenv("GS_MIRROR_FULL_REFRESH", "3600"))
+GS_QUOTA_PER_MINUTE = int(os.getenv("GS_QUOTA_PER_MINUTE", "60"))
+GS_QUOTA_BURST = int(os.getenv("GS_QUOTA_BURST", "10"))
+GS_QUOTA_PAUSE = float(os.getenv("GS_QUOTA_PAUSE", "10"))
+GS_ASYNC_CLIENT = os.getenv("GS_ASYNC_CLIENT", "False").lower() == "true"
+SHEETS_BASE_URL = os.getenv("SHEETS_BASE_URL", "https://sheets.googleapis.com")
+GS_TOKEN_URL = os.getenv("GS_TOKEN_URL", "")
+GS_MAX_CONNECTIONS = int(os.getenv("GS_MAX_CONNECTIONS", "8"))
+GS_REQUEST_TIMEOUT = float(os.getenv("GS_REQUEST_TIMEOUT", "30"))
+
+POSITIONS_DB = os.getenv("POSITIONS_DB", "positions.db")
+FEED_MARK_INTERVAL = float(os.getenv("FEED_MARK_INTERVAL", "10"))
+TRIGGER_BACKEND = os.getenv("TRIGGER_BACKEND", "auto").lower()
+
+BYBIT_REST_URL = os.getenv("BYBIT_REST_URL", "https://api.bybit.com")
+BINGX_REST_URL = os.getenv("BINGX_REST_URL", "https://open-api.bingx.com")
+PRICE_SNAPSHOT_TIMEOUT = float(os.getenv("PRICE_SNAPSHOT_TIMEOUT", "5"))
+PRICE_CACHE_MAX_AGE = float(os.getenv("PRICE_CACHE_MAX_AGE", "3"))
+PRICE_CACHE_FRESH_AGE = float(os.getenv("PRICE_CACHE_FRESH_AGE", "1"))
+CATCH_UP_MAX_HOURS = float(os.getenv("CATCH_UP_MAX_HOURS", "24"))
+CATCH_UP_CONCURRENCY = int(os.getenv("CATCH_UP_CONCURRENCY", "8"))
+
+TICK_RECORD_DIR = os.getenv("TICK_RECORD_DIR", "")
+TICK_RECORD_MAX_MB = int(os.getenv("TICK_RECORD_MAX_MB", "16"))
+TICK_RECORD_MAX_FILES = int(os.getenv("TICK_RECORD_MAX_FILES", "48"))
 
 BINGX_API_KEY = os.getenv("BINGX_API_KEY", "")
 BINGX_API_SECRET = os.getenv("BINGX_API_SECRET", "")
@@ -1,28 +1,57 @@
 import asyncio
 import logging
-import threading
+import time
+from functools import partial
 
 from aiohttp import web
 from aiogram import Dispatcher, Router, types
 
-from bot.config import CHAT_ID, EXCHANGE, WEBHOOK_PATH, WEBHOOK_PORT, WEBHOOK_URL
+from app_queue.redis_queue import close_async_client
+from bot.config import (ADMIN_ENDPOINTS, CHAT_ID, EXCHANGE, GS_ASYNC_CLIENT, GS_FLUSH_INTERVAL_MS,
+                        GS_FLUSH_MAX_CELLS, GS_MIRROR_FULL_REFRESH, GS_ROW_RESYNC_INTERVAL, POSITIONS_DB,
+                        SIGNAL_QUEUE_SIZE, TICK_RECORD_DIR, TICK_RECORD_MAX_FILES, TICK_RECORD_MAX_MB, WEBHOOK_PATH, WEBHOOK_PORT, WEBHOOK_URL)
 from services.telegram.bot import bot
 from utils.tg_signal2 import parse_signal_data2
-from utils.google_sheet import init_gspread_client, get_old_orders, get_empty_row, get_order_number
-from utils.track_positions import track_position, row_order_iterator
+from utils.google_sheet import (init_gspread_client, enable_mirror, enable_scheduler, enable_write_buffer,
+                                select_live_trades)
+from utils.get_bingx_data import bingx_manager
+from utils.get_bybit_data import bybit_manager
+from utils.position_engine import tracking_engine
+from utils.catch_up import restore_positions
+from utils.position_store import PositionStore
+from utils.price_cache import price_cache
+from utils.row_allocator import row_allocator
+from utils.sheet_mirror import sheet_mirror
+from utils.sheets_scheduler import PRIORITY_NAMES, SheetsScheduler
+from utils.sheet_writer import SheetWriteBuffer
+from utils import sheets_client
+from utils.signal_intake import SignalIntake
+from utils.tick_recorder import TickRecorder
 from utils.logger_setup import logger
+from utils.metrics import (CONTENT_TYPE, REGISTRY, SHEETS_PENDING_CELLS, SHEETS_QUOTA_TOKENS, SHEETS_SCHEDULER_WAITING,
+                           SIGNAL_INTAKE_DEPTH, WS_CONNECTIONS, WS_SUBSCRIBED_COINS)
 from workers.telegram_worker import worker
 
 dp = Dispatcher()
 router = Router()
 worker_task: asyncio.Task | None = None
+engine_task: asyncio.Task | None = None
+resync_task: asyncio.Task | None = None
 worksheet = None
+tick_recorder: TickRecorder | None = None
+sheet_buffer = SheetWriteBuffer(GS_FLUSH_INTERVAL_MS / 1000, GS_FLUSH_MAX_CELLS)
+sheets_scheduler = SheetsScheduler()
+SHEETS_PENDING_CELLS.set_function(lambda: len(sheet_buffer))
+SHEETS_QUOTA_TOKENS.set_function(sheets_scheduler.tokens)
+for priority, name in enumerate(PRIORITY_NAMES):
+    SHEETS_SCHEDULER_WAITING.labels(priority=name).set_function(partial(sheets_scheduler.waiting_count, priority))
+for ws_manager in (bybit_manager, bingx_manager):
+    WS_SUBSCRIBED_COINS.labels(exchange=ws_manager.exchange).set_function(ws_manager.subscribed_count)
+    WS_CONNECTIONS.labels(exchange=ws_manager.exchange).set_function(ws_manager.connected_count)
 
 
 @router.channel_post()
 async def on_channel_post(message: types.Message) -> None:
-    global worksheet
-
     if not message.text:
         return
 
@@ -31,62 +60,148 @@ async def on_channel_post(message: types.Message) -> None:
         # Не отправляем начальное сообщение Signal: ... в канал
         # process_signal(parsed_signal, chat_id=CHAT_ID)
 
-        if worksheet is not None:
-            try:
-                empty_row = get_empty_row(worksheet)
-                if empty_row:
-                    order_number = get_order_number(worksheet, empty_row)
-                else:
-                    order_number = None
-                if empty_row and order_number:
-                    threading.Thread(
-                        target=track_position,
-                        args=(worksheet, False, parsed_signal, empty_row, order_number, EXCHANGE),
-                        daemon=True
-                    ).start()
-                    logger.info(f"Запущен трекинг для {parsed_signal.get('coin')} {parsed_signal.get('side')}")
-            except Exception as e:
-                logger.exception(f"Ошибка при запуске трекинга: {e}")
+        # Таблица и движок - в фоне: ответ webhook не зависит от задержек Google
+        signal_intake.submit(parsed_signal)
+
+
+async def start_tracking(parsed_signal: dict) -> None:
+    if worksheet is None:
+        logger.error(f"Таблица недоступна, сигнал не отслеживается: {parsed_signal}")
+        return
+    if not row_allocator.is_seeded:
+        await seed_rows()
+    # Строку и номер сделки движок возьмет у row_allocator, когда позиция откроется
+    tracking_engine.register_signal(worksheet, parsed_signal, EXCHANGE)
+    logger.info(f"Запущен трекинг для {parsed_signal.get('coin')} {parsed_signal.get('side')}")
+
+
+signal_intake = SignalIntake(start_tracking, SIGNAL_QUEUE_SIZE)
+SIGNAL_INTAKE_DEPTH.set_function(signal_intake.depth)
 
 
 dp.include_router(router)
 
 
-async def on_startup(app: web.Application) -> None:
-    global worker_task, worksheet
+async def open_worksheet():
+    if GS_ASYNC_CLIENT:
+        return await sheets_client.init_sheets_client(scheduler=sheets_scheduler)
+    return await asyncio.to_thread(init_gspread_client)
+
+
+async def seed_rows(full: bool = False) -> bool:
+    # Одно чтение обновляет зеркало листа, аллокатор сверяется уже с ним
+    if isinstance(worksheet, sheets_client.AsyncSheetsClient):
+        loaded = await sheet_mirror.refresh_async(worksheet, full)
+    else:
+        loaded = await asyncio.to_thread(sheet_mirror.refresh, worksheet, full)
+    if loaded:
+        row_allocator.update_from_column(sheet_mirror.column('A'))
+    return loaded
+
 
-    worksheet = init_gspread_client()
+async def resync_rows() -> None:
+    global worksheet
+
+    last_full_refresh = time.monotonic()
+    while True:
+        await asyncio.sleep(GS_ROW_RESYNC_INTERVAL)
+        try:
+            if worksheet is None:
+                # Позиции отслеживаются по локальному хранилищу, таблица догонит после подключения
+                worksheet = await open_worksheet()
+                sheet_buffer.worksheet = worksheet
+            if worksheet is not None:
+                # Обычно дочитываются только новые строки, ручные правки подхватываются полным чтением
+                full = time.monotonic() - last_full_refresh >= GS_MIRROR_FULL_REFRESH
+                if await seed_rows(full) and full:
+                    last_full_refresh = time.monotonic()
+        except Exception as e:
+            logger.exception(f"Ошибка сверки аллокатора строк: {e}")
+
+
+async def on_startup(app: web.Application) -> None:
+    global worker_task, engine_task, resync_task, worksheet, tick_recorder
+
+    if TICK_RECORD_DIR:
+        tick_recorder = TickRecorder(TICK_RECORD_DIR, TICK_RECORD_MAX_MB * 1024 * 1024, TICK_RECORD_MAX_FILES)
+        bybit_manager.recorder = bingx_manager.recorder = tick_recorder
+        logger.info(f"Запись тиков в {TICK_RECORD_DIR}")
+
+    # Все запросы к таблице (gspread, асинхронный клиент, буфер записи) делят одну квоту
+    enable_scheduler(sheets_scheduler)
+    sheet_buffer.scheduler = sheets_scheduler
+    enable_write_buffer(sheet_buffer)
+    enable_mirror(sheet_mirror)
+    if GS_ASYNC_CLIENT:
+        sheet_buffer.start_async()
+    else:
+        sheet_buffer.start()
+    engine_task = asyncio.create_task(tracking_engine.run())
+
+    # Снимок цен всех монет рабочей биржи: новые сигналы открываются сразу, без ожидания первого тика
+    bybit_manager.price_cache = bingx_manager.price_cache = price_cache
+    tracking_engine.use_price_cache(price_cache)
+    await price_cache.refresh_all([EXCHANGE])
+
+    # Открытые позиции восстанавливаются из локального хранилища, таблица для этого не нужна.
+    # Перед живыми тиками они догоняют историю цен, пропущенную, пока бот был выключен.
+    tracking_engine.store = PositionStore(POSITIONS_DB)
+    is_store_empty = tracking_engine.store.count() == 0
+    await restore_positions(tracking_engine, None, tracking_engine.store.load_open(),
+                            last_seen=tracking_engine.store.load_seen())
+
+    worksheet = await open_worksheet()
+    sheet_buffer.worksheet = worksheet
+    resync_task = asyncio.create_task(resync_rows())
     if worksheet is None:
         logger.critical("Не удалось инициализировать Google Sheets. Бот запущен без таблицы.")
     else:
+        await seed_rows(full=True)
+    if worksheet is not None and is_store_empty and sheet_mirror.loaded:
+        # Первый запуск с хранилищем: переносим незавершенные сделки из таблицы
         try:
-            old_orders = get_old_orders(worksheet)
+            old_orders = select_live_trades(sheet_mirror.values())
             if old_orders:
                 for old_order in old_orders:
-                    threading.Thread(
-                        target=track_position,
-                        args=(worksheet, True, old_order, None, None, EXCHANGE),
-                        daemon=True
-                    ).start()
+                    tracking_engine.register_order(worksheet, old_order, EXCHANGE)
                 logger.info(f"Запущен трекинг для {len(old_orders)} старых ордеров")
         except Exception as e:
             logger.exception(f"Ошибка при загрузке старых ордеров: {e}")
 
     await bot.set_webhook(WEBHOOK_URL)
+    signal_intake.start()
     worker_task = asyncio.create_task(worker())
     logger.info("Webhook is set: %s", WEBHOOK_URL)
 
 
 async def on_shutdown(app: web.Application) -> None:
-    if worker_task:
-        worker_task.cancel()
-        try:
-            await worker_task
-        except asyncio.CancelledError:
-            pass
+    await signal_intake.stop()
+    for task in (worker_task, engine_task, resync_task):
+        if task:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    await bybit_manager.stop()
+    await bingx_manager.stop()
+    if tick_recorder is not None:
+        tick_recorder.close()
+    if GS_ASYNC_CLIENT:
+        await sheet_buffer.stop_async()
+        if worksheet is not None:
+            await worksheet.close()
+    else:
+        await asyncio.to_thread(sheet_buffer.stop)
+    if tracking_engine.store is not None:
+        tracking_engine.save_seen()
+        tracking_engine.store.close()
 
+    await close_async_client()
     await bot.delete_webhook(drop_pending_updates=False)
     await bot.session.close()
+    await logger.complete()
 
 
 async def handle(request: web.Request) -> web.Response:
@@ -95,9 +210,18 @@ async def handle(request: web.Request) -> web.Response:
     return web.Response(text="ok")
 
 
+async def metrics(request: web.Request) -> web.Response:
+    body = await asyncio.to_thread(REGISTRY.render)
+    return web.Response(body=body.encode(), headers={"Content-Type": CONTENT_TYPE})
+
+
 def main() -> None:
     app = web.Application()
     app.router.add_post(WEBHOOK_PATH, handle)
+    app.router.add_get("/metrics", metrics)
+    if ADMIN_ENDPOINTS:
+        from utils.admin_api import setup_admin_routes
+        setup_admin_routes(app)
     app.on_startup.append(on_startup)
     app.on_shutdown.append(on_shutdown)
     web.run_app(app, host="0.0.0.0", port=WEBHOOK_PORT)
@@ -3,4 +3,5 @@ from bot.config import BINGX_API_KEY, BINGX_API_SECRET
 from bot.config import BOT_TOKEN as TOKEN
 from bot.config import CHAT_ID as CHANNEL_NAME
 from bot.config import EXCHANGE, G_LIST, GS_JS_FILE, GS_SHEET_FILE, LOG_PONG_MESSAGES
+from bot.config import LOG_COMPRESSION, LOG_RETENTION, LOG_ROTATION, LOG_THROTTLE_SECONDS
 from bot.config import TECH_CHAT_ID as TECH_CHANNEL_NAME
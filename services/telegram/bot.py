@@ -1,8 +1,52 @@
-from aiogram import Bot
+import asyncio
+import ssl
 
-from bot.config import BOT_TOKEN
+import certifi
+from aiogram import Bot, __version__ as aiogram_version
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiohttp import ClientSession, TCPConnector, hdrs
+from aiohttp.http import SERVER_SOFTWARE
+
+from bot.config import BOT_TOKEN, TELEGRAM_CONNECTION_LIMIT, TELEGRAM_KEEPALIVE_TIMEOUT
 
 if not BOT_TOKEN:
     raise RuntimeError("BOT_TOKEN is not set")
 
-bot = Bot(token=BOT_TOKEN)
+
+class KeepAliveSession(AiohttpSession):
+    """AiohttpSession that keeps idle Bot API connections open for `keepalive_timeout` seconds.
+
+    aiogram does not expose TCPConnector options, so this session builds its own
+    aiohttp ClientSession; aiohttp's 15s default would drop warm TLS connections
+    between bursts of alerts.
+    """
+
+    def __init__(self, limit: int, keepalive_timeout: float, **kwargs) -> None:
+        super().__init__(limit=limit, **kwargs)
+        self.limit = limit
+        self.keepalive_timeout = keepalive_timeout
+        self._http: ClientSession | None = None
+
+    async def create_session(self) -> ClientSession:
+        if self._http is None or self._http.closed:
+            connector = TCPConnector(
+                ssl=ssl.create_default_context(cafile=certifi.where()),
+                limit=self.limit,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=3600,
+            )
+            self._http = ClientSession(
+                connector=connector,
+                headers={hdrs.USER_AGENT: f"{SERVER_SOFTWARE} aiogram/{aiogram_version}"},
+            )
+        return self._http
+
+    async def close(self) -> None:
+        if self._http is not None and not self._http.closed:
+            await self._http.close()
+            # Let the SSL transports close before the loop stops
+            await asyncio.sleep(0.25)
+
+
+session = KeepAliveSession(limit=TELEGRAM_CONNECTION_LIMIT, keepalive_timeout=TELEGRAM_KEEPALIVE_TIMEOUT)
+bot = Bot(token=BOT_TOKEN, session=session)
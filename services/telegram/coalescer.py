@@ -0,0 +1,83 @@
+import time
+from collections.abc import Callable
+from typing import Any
+
+from app_queue.redis_queue import QueuedItem
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+SEPARATOR = "\n\n"
+
+
+class AlertCoalescer:
+    """Merge messages for the same chat and parse mode that arrive within `window` seconds.
+
+    A burst of alerts for one chat becomes one message per window, split so no
+    message exceeds Telegram's 4096-character limit. Messages keep their order
+    within a chat. Items that are not plain {chat_id, text, parse_mode} payloads
+    are passed through untouched.
+    """
+
+    def __init__(
+        self,
+        window: float,
+        max_length: int = TELEGRAM_MESSAGE_LIMIT,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.window = window
+        self.max_length = max_length
+        self._clock = clock
+        # (chat_id, parse_mode) -> [opened_at, texts, length, earliest queued_at]
+        self._buckets: dict[tuple[str, str | None], list[Any]] = {}
+
+    @property
+    def pending(self) -> int:
+        return len(self._buckets)
+
+    def next_deadline(self) -> float | None:
+        """Seconds until the oldest bucket is due, or None when nothing is held."""
+        if not self._buckets:
+            return None
+        oldest = min(bucket[0] for bucket in self._buckets.values())
+        return max(0.0, oldest + self.window - self._clock())
+
+    def add(self, item: dict[str, Any]) -> list[dict[str, Any]]:
+        """Hold `item` for merging; return messages that must be sent now."""
+        text = item.get("text")
+        if not isinstance(text, str) or not text or set(item) - {"chat_id", "text", "parse_mode"}:
+            return [item]
+
+        key = (str(item.get("chat_id", "")), item.get("parse_mode"))
+        queued_at = getattr(item, "queued_at", None)
+        ready = []
+        bucket = self._buckets.get(key)
+        if bucket is not None and bucket[2] + len(SEPARATOR) + len(text) > self.max_length:
+            ready.append(self._emit(key, self._buckets.pop(key)))
+            bucket = None
+        if bucket is None:
+            self._buckets[key] = [self._clock(), [text], len(text), queued_at]
+        else:
+            bucket[1].append(text)
+            bucket[2] += len(SEPARATOR) + len(text)
+            if bucket[3] is None:
+                bucket[3] = queued_at
+        return ready
+
+    def flush_due(self) -> list[dict[str, Any]]:
+        """Return merged messages whose window has elapsed."""
+        now = self._clock()
+        due = [key for key, bucket in self._buckets.items() if now - bucket[0] >= self.window]
+        return [self._emit(key, self._buckets.pop(key)) for key in due]
+
+    def flush_all(self) -> list[dict[str, Any]]:
+        ready = [self._emit(key, bucket) for key, bucket in self._buckets.items()]
+        self._buckets.clear()
+        return ready
+
+    @staticmethod
+    def _emit(key: tuple[str, str | None], bucket: list[Any]) -> dict[str, Any]:
+        chat_id, parse_mode = key
+        payload = QueuedItem(chat_id=chat_id, text=SEPARATOR.join(bucket[1]))
+        if parse_mode:
+            payload["parse_mode"] = parse_mode
+        payload.queued_at = bucket[3]
+        return payload
@@ -0,0 +1,68 @@
+import asyncio
+import time
+from collections.abc import Callable
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> float:
+        """Take a token if available; otherwise return seconds until the next one."""
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    async def acquire(self) -> None:
+        # The lock keeps waiters in FIFO order.
+        async with self._lock:
+            while True:
+                wait = self.try_acquire()
+                if wait <= 0:
+                    return
+                await asyncio.sleep(wait)
+
+
+class TelegramRateLimiter:
+    """Global bucket plus one bucket per chat, matching Telegram Bot API limits."""
+
+    def __init__(
+        self,
+        global_rate: float = 30.0,
+        group_rate_per_minute: float = 20.0,
+        group_burst: float = 3.0,
+        private_rate: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._clock = clock
+        self.global_bucket = TokenBucket(global_rate, global_rate, clock)
+        self.group_rate = group_rate_per_minute / 60
+        self.group_burst = group_burst
+        self.private_rate = private_rate
+        self._chat_buckets: dict[str, TokenBucket] = {}
+
+    def chat_bucket(self, chat_id: str) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if chat_id.startswith("-") or chat_id.startswith("@"):
+                bucket = TokenBucket(self.group_rate, self.group_burst, self._clock)
+            else:
+                bucket = TokenBucket(self.private_rate, 1, self._clock)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def acquire(self, chat_id: str) -> None:
+        await self.chat_bucket(chat_id).acquire()
+        await self.global_bucket.acquire()
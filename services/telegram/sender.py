@@ -1,14 +1,59 @@
 import logging
+import time
 
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramEntityTooLarge,
+    TelegramForbiddenError,
+    TelegramMigrateToChat,
+    TelegramNotFound,
+    TelegramRetryAfter,
+    TelegramUnauthorizedError,
+)
+
+from app_queue.redis_queue import push_dead_letter
+from bot.config import TELEGRAM_BREAKER_RESET, TELEGRAM_BREAKER_THRESHOLD, TELEGRAM_SEND_RETRIES
 from services.telegram.bot import bot
-from utils.retry import async_retry
+from utils.metrics import ALERT_TO_ACK_SECONDS, TELEGRAM_SEND_SECONDS, TELEGRAM_SENT
+from utils.retry import CircuitBreaker, async_retry
+
+# Errors Telegram will answer the same way no matter how often we ask:
+# invalid chat/text, bot blocked or kicked, bad token, message too long, chat migrated.
+PERMANENT_ERRORS = (
+    TelegramBadRequest,
+    TelegramEntityTooLarge,
+    TelegramForbiddenError,
+    TelegramMigrateToChat,
+    TelegramNotFound,
+    TelegramUnauthorizedError,
+)
+
+telegram_breaker = CircuitBreaker(TELEGRAM_BREAKER_THRESHOLD, TELEGRAM_BREAKER_RESET)
+
+
+def is_permanent_error(exc: Exception) -> bool:
+    return isinstance(exc, PERMANENT_ERRORS)
+
+
+def retry_after_delay(exc: Exception) -> float | None:
+    if isinstance(exc, TelegramRetryAfter):
+        return float(exc.retry_after)
+    return None
 
 
 async def send_message(chat_id: str, text: str, parse_mode: str | None = None) -> None:
     async def _send() -> None:
         await bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
 
-    await async_retry(_send, retries=5)
+    await async_retry(
+        _send,
+        retries=TELEGRAM_SEND_RETRIES,
+        max_delay=30.0,
+        jitter=0.5,
+        retry_after=retry_after_delay,
+        is_permanent=is_permanent_error,
+        breaker=telegram_breaker,
+    )
 
 
 async def send_task_message(task: dict) -> None:
@@ -20,4 +65,21 @@ async def send_task_message(task: dict) -> None:
         logging.warning("Skip invalid task payload: %s", task)
         return
 
-    await send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+    started = time.perf_counter()
+    try:
+        await send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+    except PERMANENT_ERRORS as exc:
+        logging.error("Telegram rejected message for %s: %s", chat_id, exc)
+        TELEGRAM_SENT.labels(result="rejected").inc()
+        push_dead_letter(task, f"{type(exc).__name__}: {exc}")
+    except RuntimeError as exc:
+        logging.error("Giving up on message for %s: %s", chat_id, exc.__cause__ or exc)
+        TELEGRAM_SENT.labels(result="gave_up").inc()
+        push_dead_letter(task, f"retries exhausted: {exc.__cause__ or exc}")
+    else:
+        TELEGRAM_SENT.labels(result="ok").inc()
+        queued_at = getattr(task, "queued_at", None)
+        if queued_at is not None:
+            ALERT_TO_ACK_SECONDS.observe(max(0.0, time.time() - queued_at))
+    finally:
+        TELEGRAM_SEND_SECONDS.observe(time.perf_counter() - started)
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from services.telegram.rate_limiter import TelegramRateLimiter
+
+
+class SenderPool:
+    """Send up to `concurrency` messages at once while keeping per-chat order.
+
+    Every chat gets its own lane that sends strictly one message after another,
+    so alerts for one chat never overtake each other; lanes for different chats
+    run concurrently. `submit` blocks once `max_pending` messages are in memory,
+    so the rest of the backlog stays in Redis.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[dict[str, Any]], Awaitable[None]],
+        limiter: TelegramRateLimiter,
+        concurrency: int,
+        max_pending: int | None = None,
+    ) -> None:
+        self._send = send
+        self._limiter = limiter
+        self._in_flight = asyncio.Semaphore(concurrency)
+        self._capacity = asyncio.Semaphore(max_pending or concurrency * 4)
+        self._lanes: dict[str, list[dict[str, Any]]] = {}
+        self._lane_tasks: set[asyncio.Task] = set()
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @property
+    def pending(self) -> int:
+        return sum(len(lane) for lane in self._lanes.values())
+
+    async def submit(self, item: dict[str, Any]) -> None:
+        await self._capacity.acquire()
+        chat_id = str(item.get("chat_id", "")).strip()
+        self._idle.clear()
+        lane = self._lanes.get(chat_id)
+        if lane is not None:
+            lane.append(item)
+            return
+        self._lanes[chat_id] = [item]
+        task = asyncio.create_task(self._run_lane(chat_id))
+        self._lane_tasks.add(task)
+        task.add_done_callback(self._lane_tasks.discard)
+
+    async def _run_lane(self, chat_id: str) -> None:
+        lane = self._lanes[chat_id]
+        try:
+            while lane:
+                item = lane[0]
+                try:
+                    await self._limiter.acquire(chat_id)
+                    async with self._in_flight:
+                        await self._send(item)
+                except Exception as exc:  # noqa: BLE001
+                    logging.exception("Worker error: %s", exc)
+                finally:
+                    lane.pop(0)
+                    self._capacity.release()
+        finally:
+            del self._lanes[chat_id]
+            if not self._lanes:
+                self._idle.set()
+
+    async def join(self) -> None:
+        await self._idle.wait()
+
+    async def close(self, timeout: float = 0.0) -> list[dict[str, Any]]:
+        """Give queued messages up to `timeout` seconds to go out, then stop the lanes.
+
+        Returns the messages that were not sent, oldest first per chat, so the
+        caller can put them back on the queue. A message cancelled mid-send is
+        included too: sending it twice is better than losing it.
+        """
+        if timeout > 0 and self._lanes:
+            try:
+                await asyncio.wait_for(self.join(), timeout)
+            except asyncio.TimeoutError:
+                logging.warning("Sender pool did not drain in %.0fs, %d messages left", timeout, self.pending)
+        unsent = [item for lane in self._lanes.values() for item in lane]
+        for task in list(self._lane_tasks):
+            task.cancel()
+        await asyncio.gather(*self._lane_tasks, return_exceptions=True)
+        return unsent
@@ -0,0 +1,34 @@
+import pytest
+
+from utils import position_engine
+from utils.row_allocator import RowAllocator
+
+
+@pytest.fixture
+def allocator():
+    # Column A with a header and 8 filled lines: the next free row is 10
+    allocator = RowAllocator()
+    allocator.update_from_column(["№"] + ["x"] * 8)
+    return allocator
+
+
+@pytest.fixture
+def engine_calls():
+    return []
+
+
+@pytest.fixture
+def engine(monkeypatch, allocator, engine_calls):
+    """PositionEngine with price feeds, alerts and sheet writes recorded in engine_calls."""
+    calls = engine_calls
+    monkeypatch.setattr(position_engine, "manage_websocket_connection", lambda *args: None)
+    monkeypatch.setattr(position_engine, "release_websocket_connection", lambda *args: calls.append(("release",) + args[:2]))
+    monkeypatch.setattr(position_engine, "send_alert", lambda msg: calls.append(("alert", msg)))
+    monkeypatch.setattr(position_engine, "send_av_alert", lambda msg: calls.append(("av_alert", msg)))
+    monkeypatch.setattr(position_engine, "gs_first_update", lambda *args: calls.append(("first", args[-2])))
+    monkeypatch.setattr(position_engine, "gs_tp_update", lambda ws, tp, row: calls.append(("tp", tp, row)))
+    monkeypatch.setattr(position_engine, "gs_final_tp_update", lambda ws, tp, row, opened: calls.append(("final", tp, row)))
+    monkeypatch.setattr(position_engine, "gs_av_update", lambda ws, av, row, price: calls.append(("av", av, row)))
+    monkeypatch.setattr(position_engine, "gs_breakeven_update", lambda ws, row, opened: calls.append(("breakeven", row)))
+    monkeypatch.setattr(position_engine, "gs_5_perc_alert_update", lambda ws, row: calls.append(("5perc", row)))
+    return position_engine.PositionEngine(clock=lambda: 0.0, allocator=allocator)
@@ -0,0 +1,24 @@
+from benchmarks import price_pipeline
+
+
+def test_price_pipeline_benchmark_smoke(tmp_path):
+    for exchange in ("bybit", "bingx"):
+        result = price_pipeline.run(symbols=5, positions=20, ticks=500, batch=50, exchange=exchange)
+
+        assert result["ticks_per_s"] > 0
+        assert result["batches"] > 0
+        assert result["tick_to_decision_ms"]["p99"] is not None
+        assert result["threads"] >= 1
+
+    path = price_pipeline.save(result, str(tmp_path / "result.json"))
+    assert (tmp_path / "result.json").exists() and path.endswith("result.json")
+
+
+def test_benchmark_frames_take_the_fast_decode_path():
+    from utils.ws_decode import decode_bingx_ticker, decode_bybit_ticker, gunzip
+
+    bybit = price_pipeline.encode_message("bybit", "BTCUSDT", 65000.5, 1700000000123)
+    bingx = price_pipeline.encode_message("bingx", "ETHUSDT", 2500.1, 1700000000000)
+
+    assert decode_bybit_ticker(bybit) == ("BTCUSDT", 65000.5, 1700000000.123)
+    assert decode_bingx_ticker(gunzip(bingx)) == ("ETHUSDT", 2500.1, 1700000000.0)
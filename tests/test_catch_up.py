@@ -0,0 +1,144 @@
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from utils import catch_up, position_engine
+
+
+def _state(row, updated_at, coin="BTCUSDT", exchange="bybit"):
+    position = position_engine.Position(None, row, coin, "LONG", "01.01.2026 00:00", 100.0,
+                                        [101.0, 102.0, 103.0, 104.0, 105.0], exchange)
+    return {**position.to_state(), "updated_at": updated_at}
+
+
+def _bybit_page(candles):
+    # Bybit returns the newest candle first: [start ms, open, high, low, close, volume, turnover]
+    return {"result": {"list": [[str(int(start * 1000)), "0", str(high), str(low), str(close), "0", "0"]
+                                for start, high, low, close in reversed(candles)]}}
+
+
+def _bybit_klines(candles):
+    # Like Bybit: candles inside [start, end], only the newest `limit` of them
+    async def get_json(url, params, timeout):
+        start, end = int(params["start"]) / 1000, int(params["end"]) / 1000
+        window = [candle for candle in candles if start <= candle[0] <= end]
+        return _bybit_page(window[-int(params["limit"]):])
+    return get_json
+
+
+def test_fetch_history_pages_through_klines():
+    candles = [(60.0 * i, 100.0, 99.0, 100.0) for i in range(5)]
+    requests = []
+    bybit = _bybit_klines(candles)
+
+    async def get_json(url, params, timeout):
+        requests.append(params)
+        return await bybit(url, params, timeout)
+
+    _, path, _, make_params, parse = catch_up.KLINE_ENDPOINTS["bybit"]
+    endpoints = {"bybit": ("http://stub", path, 2, make_params, parse)}
+    history = asyncio.run(catch_up.fetch_history("bybit", "BTCUSDT", 0.0, 240.0, get_json, endpoints))
+
+    assert history == candles
+    # Every window holds at most `limit` candles, so the newest-first cap never drops any
+    assert [(int(params["start"]), int(params["end"])) for params in requests] == [
+        (0, 60000), (120000, 180000), (240000, 240000)]
+
+
+def test_restore_applies_missed_events_once_per_coin(engine, engine_calls):
+    # Row 2 was last saved at 100 s, row 3 at 250 s; TP1 (101) is crossed at 120 s, TP1 and TP2 at 300 s
+    candles = [(120.0, 101.5, 100.0, 101.0), (180.0, 101.2, 100.5, 101.0), (300.0, 102.5, 101.0, 102.0)]
+    requests = []
+
+    bybit = _bybit_klines(candles)
+
+    async def get_json(url, params, timeout):
+        requests.append(params["symbol"])
+        if params["symbol"] != "BTCUSDT":
+            return _bybit_page([])
+        return await bybit(url, params, timeout)
+
+    states = [_state(2, 100.0), _state(3, 250.0), _state(4, 100.0, coin="ETHUSDT")]
+    stats = asyncio.run(catch_up.restore_positions(engine, None, states, get_json=get_json, clock=lambda: 400.0))
+
+    assert sorted(requests) == ["BTCUSDT", "ETHUSDT"]
+    assert stats == {"coins": 2, "positions": 3, "candles": 3}
+    tps = [call for call in engine_calls if call[0] == "tp"]
+    # Row 3 ignores the 120 s candle from before its last save
+    assert tps == [("tp", 1, 2), ("tp", 2, 2), ("tp", 1, 3), ("tp", 2, 3)]
+    assert engine.open_position_count() == 3
+
+
+def test_restore_applies_the_candle_containing_the_last_save(engine, engine_calls):
+    # Saved at 130 s; TP1 (101) was crossed at 150 s, inside the 120 s candle
+    get_json = _bybit_klines([(120.0, 101.5, 100.0, 101.0)])
+
+    stats = asyncio.run(catch_up.restore_positions(engine, None, [_state(2, 130.0)], get_json=get_json,
+                                                   clock=lambda: 170.0))
+
+    assert stats["candles"] == 1
+    assert [call for call in engine_calls if call[0] == "tp"] == [("tp", 1, 2)]
+
+
+def test_restore_skips_history_already_seen_live(engine, engine_calls):
+    # Saved at 100 s, but live ticks were processed up to 290 s: the 120 s wick to 101.5
+    # never reached the ticker stream and must not fire TP1 after a short restart
+    candles = [(120.0, 101.5, 100.0, 100.2), (240.0, 100.4, 100.1, 100.3), (300.0, 100.5, 100.2, 100.4)]
+    requests = []
+    bybit = _bybit_klines(candles)
+
+    async def get_json(url, params, timeout):
+        requests.append(int(params["start"]))
+        return await bybit(url, params, timeout)
+
+    stats = asyncio.run(catch_up.restore_positions(engine, None, [_state(2, 100.0)], get_json=get_json,
+                                                   clock=lambda: 330.0,
+                                                   last_seen={("bybit", "BTCUSDT"): 290.0}))
+
+    assert requests == [240000]
+    assert stats["candles"] == 2
+    assert [call for call in engine_calls if call[0] == "tp"] == []
+    assert engine.open_position_count() == 1
+
+
+def test_restore_without_history_still_tracks_positions(engine, engine_calls):
+    async def get_json(url, params, timeout):
+        raise OSError("exchange unreachable")
+
+    stats = asyncio.run(catch_up.restore_positions(engine, None, [_state(2, 100.0)], get_json=get_json,
+                                                   clock=lambda: 400.0))
+
+    assert stats["candles"] == 0
+    assert engine_calls == []
+    assert engine.open_position_count() == 1
+
+
+def test_restore_reads_bingx_klines_from_stub_server(engine, engine_calls):
+    seen = []
+
+    async def klines(request):
+        seen.append(dict(request.query))
+        return web.json_response({"code": 0, "data": [
+            {"time": 180000, "open": "100", "high": "103.5", "low": "100", "close": "103"},
+            {"time": 120000, "open": "100", "high": "100.5", "low": "99.5", "close": "100"},
+        ]})
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_get("/openApi/swap/v3/quote/klines", klines)
+        server = TestServer(app)
+        await server.start_server()
+        try:
+            _, path, limit, make_params, parse = catch_up.KLINE_ENDPOINTS["bingx"]
+            endpoints = {"bingx": (str(server.make_url("")), path, limit, make_params, parse)}
+            return await catch_up.restore_positions(engine, None, [_state(5, 100.0, exchange="bingx")],
+                                                    endpoints=endpoints, clock=lambda: 400.0)
+        finally:
+            await server.close()
+
+    stats = asyncio.run(scenario())
+
+    assert seen[0]["symbol"] == "BTC-USDT" and seen[0]["startTime"] == "60000"
+    assert stats["candles"] == 2
+    assert [call for call in engine_calls if call[0] == "tp"] == [("tp", 1, 5), ("tp", 2, 5), ("tp", 3, 5)]
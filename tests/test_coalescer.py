@@ -0,0 +1,48 @@
+from services.telegram.coalescer import AlertCoalescer
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_coalescer_merges_messages_within_window():
+    clock = FakeClock()
+    coalescer = AlertCoalescer(window=1.0, clock=clock)
+
+    assert coalescer.add({"chat_id": "-1", "text": "BTC TP1"}) == []
+    assert coalescer.add({"chat_id": "-1", "text": "ETH TP2"}) == []
+    assert coalescer.add({"chat_id": "-1", "text": "<b>SOL</b>", "parse_mode": "HTML"}) == []
+    assert coalescer.add({"chat_id": "-2", "text": "XRP stop"}) == []
+    assert coalescer.flush_due() == []
+
+    clock.now = 1.0
+    ready = coalescer.flush_due()
+
+    assert ready == [
+        {"chat_id": "-1", "text": "BTC TP1\n\nETH TP2"},
+        {"chat_id": "-1", "text": "<b>SOL</b>", "parse_mode": "HTML"},
+        {"chat_id": "-2", "text": "XRP stop"},
+    ]
+    assert coalescer.pending == 0
+
+
+def test_coalescer_respects_message_limit():
+    coalescer = AlertCoalescer(window=1.0, max_length=10, clock=FakeClock())
+
+    assert coalescer.add({"chat_id": "-1", "text": "aaaa"}) == []
+    assert coalescer.add({"chat_id": "-1", "text": "bbbb"}) == []
+    # 4 + 2 + 4 + 2 + 4 > 10: the held message goes out and a new one starts
+    assert coalescer.add({"chat_id": "-1", "text": "cccc"}) == [{"chat_id": "-1", "text": "aaaa\n\nbbbb"}]
+    assert coalescer.flush_all() == [{"chat_id": "-1", "text": "cccc"}]
+
+
+def test_coalescer_passes_through_unknown_payloads():
+    coalescer = AlertCoalescer(window=1.0, clock=FakeClock())
+    item = {"chat_id": "-1", "text": "x", "reply_to": 5}
+
+    assert coalescer.add(item) == [item]
+    assert coalescer.next_deadline() is None
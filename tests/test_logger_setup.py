@@ -0,0 +1,51 @@
+from utils.logger_setup import ThrottleFilter, logger
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _record(message, key=None):
+    extra = {} if key is None else {"throttle": key}
+    return {"message": message, "extra": extra}
+
+
+def test_throttle_filter_limits_repeats_per_key():
+    clock = FakeClock()
+    throttle = ThrottleFilter(60, clock=clock)
+
+    assert throttle(_record("closed", "bingx#1:close"))
+    assert not throttle(_record("closed", "bingx#1:close"))
+    assert not throttle(_record("closed", "bingx#1:close"))
+    assert throttle(_record("closed", "bingx#2:close"))
+    assert throttle(_record("no key"))
+    assert throttle(_record("no key"))
+
+    clock.now = 61
+    record = _record("closed", "bingx#1:close")
+    assert throttle(record)
+    assert record["message"] == "closed (еще 2 похожих скрыто)"
+
+
+def test_throttle_filter_disabled_with_zero_interval():
+    throttle = ThrottleFilter(0, clock=FakeClock())
+
+    assert all(throttle(_record("x", "k")) for _ in range(3))
+
+
+def test_throttled_messages_reach_sink_once():
+    messages = []
+    throttle = ThrottleFilter(60, clock=FakeClock())
+    handler_id = logger.add(messages.append, format="{message}", filter=throttle)
+    try:
+        for _ in range(5):
+            logger.bind(throttle="bybit:BTCUSDT:connected").info("connected")
+        logger.info("plain")
+    finally:
+        logger.remove(handler_id)
+
+    assert [message.strip() for message in messages] == ["connected", "plain"]
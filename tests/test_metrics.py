@@ -0,0 +1,83 @@
+from app_queue import redis_queue
+from services.telegram.coalescer import AlertCoalescer
+from utils.metrics import Counter, Gauge, Histogram, Registry
+
+
+def test_registry_renders_text_exposition():
+    registry = Registry()
+    ticks = Counter("ticks", "Ticks received", ("exchange",), registry=registry)
+    depth = Gauge("depth", "Queue depth", registry=registry)
+    ticks.labels(exchange="bybit").inc()
+    ticks.labels(exchange="bybit").inc(2)
+    ticks.labels(exchange='we"ird').inc()
+    depth.set_function(lambda: 7)
+
+    text = registry.render()
+
+    assert "# TYPE ticks_total counter" in text
+    assert 'ticks_total{exchange="bybit"} 3' in text
+    assert 'ticks_total{exchange="we\\"ird"} 1' in text
+    assert "# TYPE depth gauge" in text
+    assert "\ndepth 7\n" in text
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = Histogram("latency_seconds", "Latency", buckets=(0.1, 1.0), registry=registry)
+    for value in (0.05, 0.1, 0.5, 5.0):
+        latency.observe(value)
+
+    text = registry.render()
+
+    assert 'latency_seconds_bucket{le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{le="1"} 3' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in text
+    assert "latency_seconds_count 4" in text
+    assert "latency_seconds_sum 5.65" in text
+
+
+def test_failing_gauge_function_does_not_break_render():
+    registry = Registry()
+    gauge = Gauge("broken", "Broken", registry=registry)
+    gauge.set_function(lambda: 1 / 0)
+
+    assert "broken NaN" in registry.render()
+
+
+class FakeRedis:
+    def __init__(self):
+        self.items = []
+
+    def rpush(self, _queue_name, *items):
+        self.items.extend(items)
+
+    def lpop(self, _queue_name, count=None):
+        popped, self.items = self.items[:count], self.items[count:]
+        return popped
+
+
+def test_queued_at_survives_round_trip_without_changing_payload(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(redis_queue, "_get_client", lambda: fake)
+    monkeypatch.setattr(redis_queue.time, "time", lambda: 1000.0)
+
+    redis_queue.push({"chat_id": "1", "text": "hello"})
+    item = redis_queue.pop()
+
+    assert item == {"chat_id": "1", "text": "hello"}
+    assert item.queued_at == 1000.0
+
+
+def test_coalescer_keeps_earliest_queued_at():
+    coalescer = AlertCoalescer(window=1.0, clock=lambda: 0.0)
+    first = redis_queue.QueuedItem(chat_id="1", text="a")
+    first.queued_at = 10.0
+    second = redis_queue.QueuedItem(chat_id="1", text="b")
+    second.queued_at = 12.0
+
+    coalescer.add(first)
+    coalescer.add(second)
+    [merged] = coalescer.flush_all()
+
+    assert merged == {"chat_id": "1", "text": "a\n\nb"}
+    assert merged.queued_at == 10.0
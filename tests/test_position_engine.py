@@ -0,0 +1,112 @@
+from utils import position_engine
+
+
+def _signal(side="LONG", targets=(101.0, 102.0, 103.0, 104.0, 105.0)):
+    signal = {"coin": "BTC/USDT", "side": side}
+    for i, target in enumerate(targets, start=1):
+        signal[f"tp{i}"] = target
+    return signal
+
+
+def test_trigger_index_returns_only_crossed_positions():
+    index = position_engine.TriggerIndex()
+    index.set(1, up_levels=[110.0], down_levels=[90.0])
+    index.set(2, up_levels=[105.0], down_levels=[])
+    index.set(3, up_levels=[], down_levels=[95.0])
+
+    assert index.crossed(high=100.0, low=100.0) == set()
+    assert index.crossed(high=106.0, low=100.0) == {2}
+    assert index.crossed(high=100.0, low=94.0) == {3}
+
+    index.discard(2)
+    assert index.crossed(high=120.0, low=100.0) == {1}
+
+
+def test_pending_signal_opens_on_first_price(engine, engine_calls):
+    engine._handle_command(("signal", None, _signal(), "bybit"))
+    assert engine.open_position_count() == 0
+
+    engine.on_batch("bybit", "BTCUSDT", 100.0)
+
+    assert engine_calls == [("first", 10)]
+    assert engine.open_position_count() == 1
+
+
+def test_expired_signal_does_not_take_a_row(engine, engine_calls):
+    now = [0.0]
+    engine._clock = lambda: now[0]
+
+    engine._handle_command(("signal", None, _signal(), "bybit"))
+    now[0] = position_engine.PRICE_WAIT_TIMEOUT + 1
+    engine.step()
+    engine._handle_command(("signal", None, _signal(), "bybit"))
+    engine.on_batch("bybit", "BTCUSDT", 100.0)
+
+    # The signal that never got a price left no gap in the sheet
+    assert engine_calls == [("release", "BTCUSDT", "bybit"), ("first", 10)]
+
+
+def test_batch_fires_tp_and_closes_on_last_target(engine, engine_calls):
+    engine._handle_command(("signal", None, _signal(), "bybit"))
+    engine.on_batch("bybit", "BTCUSDT", 100.0)
+    engine_calls.clear()
+
+    engine.on_batch("bybit", "BTCUSDT", 100.5, high=101.5, low=100.0)
+    assert [call for call in engine_calls if call[0] == "tp"] == [("tp", 1, 10)]
+
+    for price in (102.0, 103.0, 104.0, 105.0):
+        engine.on_batch("bybit", "BTCUSDT", price)
+
+    # The last position of the coin is closed, so its price feed is released
+    assert engine_calls[-2:] == [("final", 5, 10), ("release", "BTCUSDT", "bybit")]
+    assert engine.open_position_count() == 0
+
+
+def test_short_position_averaging_and_deviation_alert(engine, engine_calls):
+    engine._handle_command(("signal", None, _signal("SHORT", (99.0, 98.0, 97.0, 96.0, 95.0)), "bybit"))
+    engine.on_batch("bybit", "BTCUSDT", 100.0)
+    engine_calls.clear()
+
+    engine.on_batch("bybit", "BTCUSDT", 110.5)
+
+    assert ("5perc", 10) in engine_calls
+    assert ("av", 1, 10) in engine_calls
+
+
+def test_ticks_are_conflated_into_one_batch_per_coin(monkeypatch, engine, engine_calls):
+    batches = []
+    engine.register_signal(None, _signal(), "bybit")
+    engine._drain()
+    monkeypatch.setattr(engine, "on_batch", lambda *args: batches.append(args))
+
+    slot = engine._slots[("bybit", "BTCUSDT")]
+    for price in (100.0, 103.0, 99.0, 101.0):
+        slot.put(price)
+    engine._drain()
+
+    assert batches == [("bybit", "BTCUSDT", 101.0, 103.0, 99.0)]
+
+
+def test_vector_trigger_index_matches_bisect_index():
+    import random
+
+    import pytest
+
+    pytest.importorskip("numpy")
+    rng = random.Random(3)
+    vector, reference = position_engine.VectorTriggerIndex(capacity=2), position_engine.TriggerIndex()
+
+    for step in range(300):
+        position_id = rng.randrange(40)
+        if rng.random() < 0.25:
+            vector.discard(position_id)
+            reference.discard(position_id)
+        else:
+            up = [rng.uniform(100, 120) for _ in range(rng.randrange(6))]
+            down = [rng.uniform(80, 100) for _ in range(rng.randrange(7))]
+            vector.set(position_id, up, down)
+            reference.set(position_id, up, down)
+        low = rng.uniform(80, 100)
+        high = rng.uniform(100, 120)
+        assert vector.crossed(high, low) == reference.crossed(high, low)
+        assert len(vector) == len(reference)
@@ -0,0 +1,72 @@
+from utils import position_engine
+from utils.position_store import PositionStore
+
+
+def _position(row=5):
+    position = position_engine.Position(None, row, "BTCUSDT", "LONG", "01.01, 10:00", 100.0,
+                                        [101.0, 102.0, 103.0, 104.0, 105.0], "bybit")
+    position.average_orders_list = [90.0, 72.0]
+    position.avg_prices_list = [95.0, 85.0]
+    position.breakeven = 100.08
+    return position
+
+
+def test_store_uses_wal_and_round_trips_state(tmp_path):
+    store = PositionStore(str(tmp_path / "positions.db"), clock=lambda: 42.0)
+    assert store._conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    store.save(_position().to_state())
+    states = store.load_open()
+
+    assert len(states) == 1
+    assert states[0]["updated_at"] == 42.0
+    restored = position_engine.Position.from_state(None, states[0])
+    assert restored.to_state() == _position().to_state()
+    assert restored.trigger_levels() == _position().trigger_levels()
+
+
+def test_closed_positions_are_not_loaded(tmp_path):
+    store = PositionStore(str(tmp_path / "positions.db"))
+    position = _position()
+    store.save(position.to_state())
+
+    position.is_open = False
+    store.save(position.to_state())
+
+    assert store.load_open() == []
+    assert store.count() == 1
+
+
+def test_engine_persists_state_after_each_event(tmp_path, monkeypatch):
+    store = PositionStore(str(tmp_path / "positions.db"))
+    monkeypatch.setattr(position_engine, "manage_websocket_connection", lambda *args: None)
+    monkeypatch.setattr(position_engine, "send_alert", lambda msg: None)
+    monkeypatch.setattr(position_engine, "gs_tp_update", lambda *args: None)
+    engine = position_engine.PositionEngine(store=store)
+
+    engine.add_position(_position())
+    engine.on_batch("bybit", "BTCUSDT", 101.5)
+
+    assert store.load_open()[0]["targets"] == [102.0, 103.0, 104.0, 105.0]
+
+
+def test_engine_saves_last_seen_price_time_per_coin(tmp_path, monkeypatch):
+    store = PositionStore(str(tmp_path / "positions.db"))
+    now = [1000.0]
+    monkeypatch.setattr(position_engine, "manage_websocket_connection", lambda *args: None)
+    monkeypatch.setattr(position_engine, "FEED_MARK_INTERVAL", 10)
+    engine = position_engine.PositionEngine(clock=lambda: now[0], store=store)
+    engine.add_position(_position())
+
+    engine._slots[("bybit", "BTCUSDT")].put(100.5)
+    engine.step()
+    assert store.load_seen() == {}
+
+    now[0] = 1012.0
+    engine._slots[("bybit", "BTCUSDT")].put(100.6)
+    engine.step()
+    assert store.load_seen() == {("bybit", "BTCUSDT"): 1012.0}
+
+    # An older mark never moves the saved time back
+    store.mark_seen({("bybit", "BTCUSDT"): 900.0})
+    assert store.load_seen() == {("bybit", "BTCUSDT"): 1012.0}
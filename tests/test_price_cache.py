@@ -0,0 +1,137 @@
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from utils import price_cache as price_cache_module
+from utils.price_cache import PriceCache
+
+
+def _signal():
+    signal = {"coin": "BTC/USDT", "side": "LONG"}
+    for i, target in enumerate((101.0, 102.0, 103.0, 104.0, 105.0), start=1):
+        signal[f"tp{i}"] = target
+    return signal
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+async def _stub_exchange():
+    """Local server answering like the Bybit and BingX "all tickers" endpoints."""
+    requests = []
+
+    async def bybit(request):
+        requests.append(("bybit", dict(request.query)))
+        return web.json_response({"retCode": 0, "result": {"category": "linear", "list": [
+            {"symbol": "BTCUSDT", "lastPrice": "65000.5"},
+            {"symbol": "ETHUSDT", "lastPrice": "3200.1"},
+            {"symbol": "DEADUSDT", "lastPrice": ""},
+        ]}})
+
+    async def bingx(request):
+        requests.append(("bingx", dict(request.query)))
+        return web.json_response({"code": 0, "data": [{"symbol": "DYDX-USDT", "lastPrice": "1.234"}]})
+
+    app = web.Application()
+    app.router.add_get("/v5/market/tickers", bybit)
+    app.router.add_get("/openApi/swap/v2/quote/ticker", bingx)
+    server = TestServer(app)
+    await server.start_server()
+    return server, requests
+
+
+def _endpoints(server):
+    base = str(server.make_url(""))
+    return {name: (base, path, params, parse)
+            for name, (_, path, params, parse) in price_cache_module.SNAPSHOT_ENDPOINTS.items()}
+
+
+def test_refresh_all_reads_bulk_snapshots_from_stub_server():
+    async def scenario():
+        server, requests = await _stub_exchange()
+        try:
+            cache = PriceCache(endpoints=_endpoints(server))
+            counts = await cache.refresh_all()
+        finally:
+            await server.close()
+        return cache, counts, requests
+
+    cache, counts, requests = asyncio.run(scenario())
+
+    assert counts == {"bybit": 2, "bingx": 1}
+    assert ("bybit", {"category": "linear"}) in requests
+    assert cache.get("bybit", "BTCUSDT") == 65000.5
+    assert cache.get("BingX", "DYDXUSDT") == 1.234
+    assert cache.get("bybit", "DEADUSDT") is None
+
+
+def test_failed_snapshot_keeps_previous_prices():
+    async def broken(url, params, timeout):
+        raise OSError("connection refused")
+
+    clock = FakeClock()
+    cache = PriceCache(get_json=broken, clock=clock)
+    cache.update("bybit", {"BTCUSDT": 100.0})
+
+    assert asyncio.run(cache.refresh("bybit")) == 0
+    assert cache.get("bybit", "BTCUSDT") == 100.0
+    clock.now = 61
+    assert cache.get("bybit", "BTCUSDT", max_age=60) is None
+
+
+def test_new_signal_opens_from_cached_price_without_waiting(engine, engine_calls):
+    cache = PriceCache(clock=FakeClock())
+    cache.update("bybit", {"BTCUSDT": 100.0})
+    engine.use_price_cache(cache)
+
+    engine._handle_command(("signal", None, _signal(), "bybit"))
+
+    assert engine_calls == [("first", 10)]
+    assert engine.open_position_count() == 1
+    assert engine.pending_signal_count() == 0
+
+
+def test_pending_signal_opens_when_requested_snapshot_arrives(engine, engine_calls):
+    async def get_json(url, params, timeout):
+        return {"result": {"list": [{"symbol": "BTCUSDT", "lastPrice": "100.0"}]}}
+
+    cache = PriceCache(get_json=get_json, clock=FakeClock())
+    engine.use_price_cache(cache)
+
+    async def scenario():
+        engine._handle_command(("signal", None, _signal(), "bybit"))
+        assert engine.pending_signal_count() == 1
+        await cache.schedule_refresh("bybit")
+        engine.step()
+
+    asyncio.run(scenario())
+
+    assert engine_calls == [("first", 10)]
+    assert engine.open_position_count() == 1
+    assert engine.pending_signal_count() == 0
+
+
+def test_stale_cached_price_does_not_open_the_position(monkeypatch, engine, engine_calls):
+    clock = FakeClock()
+    cache = PriceCache(clock=clock)
+    cache.update("bybit", {"BTCUSDT": 100.0})
+    clock.now = 2.0
+    refreshes = []
+    monkeypatch.setattr(cache, "schedule_refresh", refreshes.append)
+    engine.use_price_cache(cache)
+
+    engine._handle_command(("signal", None, _signal(), "bybit"))
+
+    assert engine_calls == [] and engine.pending_signal_count() == 1
+    assert refreshes == ["bybit"]
+
+    # The first live tick beats the snapshot and becomes the entry price
+    engine.on_batch("bybit", "BTCUSDT", 101.0)
+    assert engine_calls == [("first", 10)]
+    assert engine._positions[1].entry_price == 101.0
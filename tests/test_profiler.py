@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import time
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from utils import admin_api, profiler
+
+
+def _busy_loop(stop):
+    while not stop.is_set():
+        sum(range(100))
+
+
+def test_sample_stacks_sees_other_threads():
+    stop = threading.Event()
+    thread = threading.Thread(target=_busy_loop, args=(stop,), name="busy")
+    thread.start()
+    try:
+        counts, samples = profiler.sample_stacks(0.05, 0.001)
+    finally:
+        stop.set()
+        thread.join()
+
+    assert samples >= 2
+    busy = [stack for stack in counts if stack.startswith("busy;")]
+    assert busy and any("_busy_loop (test_profiler.py:" in stack for stack in busy)
+    assert not any("sample_stacks" in stack for stack in counts)
+
+    text = profiler.render_collapsed(counts)
+    stack, count = text.splitlines()[0].rsplit(" ", 1)
+    assert counts[stack] == int(count)
+
+
+def test_memory_tracker_reports_top_and_diff():
+    tracker = profiler.MemoryTracker()
+    tracker.start(frames=5)
+    try:
+        first = tracker.snapshot(limit=5)
+        hoard = [bytearray(1024) for _ in range(1000)]
+        second = tracker.snapshot(limit=5)
+    finally:
+        tracker.stop()
+
+    assert first["diff"] is None
+    assert second["top"] and second["diff"]
+    assert any("test_profiler.py" in entry["where"] and entry["size_diff"] >= 1000 * 1024
+               for entry in second["diff"])
+    assert len(hoard) == 1000
+    assert not tracker.running
+
+
+def _client(monkeypatch, token="secret"):
+    monkeypatch.setattr(admin_api, "ADMIN_TOKEN", token)
+    app = web.Application()
+    assert admin_api.setup_admin_routes(app) == bool(token)
+    return TestClient(TestServer(app), headers={"X-Admin-Token": token})
+
+
+def test_admin_profile_returns_folded_stacks_while_loop_keeps_running(monkeypatch):
+    async def scenario():
+        async with _client(monkeypatch) as client:
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    ticks += 1
+                    await asyncio.sleep(0.005)
+
+            task = asyncio.create_task(ticker())
+            started = time.monotonic()
+            response = await client.get("/admin/profile", params={"seconds": "0.2", "interval_ms": "2"})
+            task.cancel()
+            body = await response.text()
+            assert response.status == 200
+            assert "attachment" in response.headers["Content-Disposition"]
+            assert "event-loop;" in body
+            assert ticks > 5 and time.monotonic() - started >= 0.2
+
+    asyncio.run(scenario())
+
+
+def test_admin_endpoints_require_token(monkeypatch):
+    async def scenario():
+        async with _client(monkeypatch) as client:
+            assert (await client.post("/admin/tracemalloc/stop", headers={"X-Admin-Token": "wrong"})).status == 403
+            assert (await client.post("/admin/tracemalloc/stop")).status == 200
+            assert (await client.get("/admin/tracemalloc/snapshot")).status == 409
+
+    asyncio.run(scenario())
+
+
+def test_admin_endpoints_are_not_mounted_without_token(monkeypatch):
+    async def scenario():
+        async with _client(monkeypatch, token="") as client:
+            assert (await client.get("/admin/profile", params={"seconds": "0.1"})).status == 404
+
+    asyncio.run(scenario())
+
+
+def test_admin_profile_rejects_non_finite_numbers(monkeypatch):
+    async def scenario():
+        async with _client(monkeypatch) as client:
+            for value in ("nan", "inf", "-inf"):
+                response = await client.get("/admin/profile", params={"seconds": value})
+                assert response.status == 400
+            assert not admin_api._profile_lock.locked()
+
+    asyncio.run(scenario())
@@ -1,3 +1,6 @@
+import asyncio
+import threading
+
 from app_queue import redis_queue
 
 
@@ -5,13 +8,16 @@ class FakeRedis:
     def __init__(self):
         self.items = []
 
-    def rpush(self, _queue_name, item):
-        self.items.append(item)
+    def rpush(self, _queue_name, *items):
+        self.items.extend(items)
 
-    def lpop(self, _queue_name):
+    def lpop(self, _queue_name, count=None):
         if not self.items:
             return None
-        return self.items.pop(0)
+        if count is None:
+            return self.items.pop(0)
+        popped, self.items = self.items[:count], self.items[count:]
+        return popped
 
 
 def _clear_fallback_queue():
@@ -50,3 +56,71 @@ def test_pop_returns_none_when_empty(monkeypatch):
     monkeypatch.setattr(redis_queue, "_get_client", lambda: fake)
 
     assert redis_queue.pop() is None
+
+
+def test_push_many_uses_single_round_trip(monkeypatch):
+    _clear_fallback_queue()
+    fake = FakeRedis()
+    calls = []
+    monkeypatch.setattr(fake, "rpush", lambda name, *items: calls.append(items))
+    monkeypatch.setattr(redis_queue, "_get_client", lambda: fake)
+
+    redis_queue.push_many([{"chat_id": "1", "text": "a"}, {"chat_id": "1", "text": "b"}])
+
+    assert len(calls) == 1
+    assert len(calls[0]) == 2
+
+
+def test_pop_many_returns_items_in_order(monkeypatch):
+    _clear_fallback_queue()
+    fake = FakeRedis()
+    monkeypatch.setattr(redis_queue, "_get_client", lambda: fake)
+
+    redis_queue.push_many([{"text": str(i)} for i in range(5)])
+
+    assert [item["text"] for item in redis_queue.pop_many(3)] == ["0", "1", "2"]
+    assert [item["text"] for item in redis_queue.pop_many(3)] == ["3", "4"]
+    assert redis_queue.pop_many(3) == []
+
+
+class FakeAsyncRedis(FakeRedis):
+    async def blpop(self, keys, timeout=0):
+        if not self.items:
+            return None
+        return keys[0], self.items.pop(0)
+
+    async def lpop(self, _queue_name, count=None):
+        return FakeRedis.lpop(self, _queue_name, count)
+
+
+def test_pop_many_async_blocks_then_drains(monkeypatch):
+    _clear_fallback_queue()
+    fake = FakeAsyncRedis()
+    fake.items = ['{"text": "a"}', '{"text": "b"}', '{"text": "c"}']
+    monkeypatch.setattr(redis_queue, "_get_async_client", lambda: fake)
+
+    items = asyncio.run(redis_queue.pop_many_async(2, timeout=1))
+    assert items == [{"text": "a"}, {"text": "b"}]
+
+    fake.items = []
+    assert asyncio.run(redis_queue.pop_many_async(2, timeout=1)) == []
+
+
+def test_push_from_event_loop_is_done_off_the_loop(monkeypatch):
+    _clear_fallback_queue()
+    fake = FakeRedis()
+    threads = []
+    monkeypatch.setattr(fake, "rpush", lambda name, *items: threads.append(threading.current_thread()))
+    monkeypatch.setattr(redis_queue, "_get_client", lambda: fake)
+
+    async def scenario():
+        redis_queue.push({"chat_id": "1", "text": "from the engine"})
+        redis_queue.push_dead_letter({"chat_id": "1", "text": "bad"}, "403")
+        await redis_queue.close_async_client()
+
+    asyncio.run(scenario())
+    redis_queue.push({"chat_id": "1", "text": "from a thread"})
+
+    assert len(threads) == 3
+    assert all(thread.name == "redis-push" for thread in threads[:2])
+    assert threads[2] is threading.current_thread()
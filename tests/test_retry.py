@@ -42,4 +42,130 @@ def test_async_retry_raises_after_max_retries(monkeypatch):
     except RuntimeError as exc:
         assert "Max retries exceeded" in str(exc)
 
-    assert sleep_calls == [1.0, 2.0, 4.0]
+    # No pointless sleep after the last attempt.
+    assert sleep_calls == [1.0, 2.0]
+
+
+class FloodWait(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"retry after {retry_after}")
+        self.retry_after = retry_after
+
+
+def test_async_retry_honours_server_retry_after(monkeypatch):
+    sleep_calls = []
+    attempts = {"count": 0}
+
+    async def fake_sleep(delay):
+        sleep_calls.append(delay)
+
+    async def flooded():
+        attempts["count"] += 1
+        if attempts["count"] == 1:
+            raise FloodWait(7)
+        return "ok"
+
+    monkeypatch.setattr(retry_module.asyncio, "sleep", fake_sleep)
+
+    result = asyncio.run(retry_module.async_retry(
+        flooded,
+        base_delay=1.0,
+        jitter=0.5,
+        retry_after=lambda exc: getattr(exc, "retry_after", None),
+    ))
+
+    assert result == "ok"
+    assert sleep_calls == [7]
+
+
+def test_async_retry_fails_fast_on_permanent_error(monkeypatch):
+    sleep_calls = []
+    attempts = {"count": 0}
+
+    async def fake_sleep(delay):
+        sleep_calls.append(delay)
+
+    async def rejected():
+        attempts["count"] += 1
+        raise ValueError("chat not found")
+
+    monkeypatch.setattr(retry_module.asyncio, "sleep", fake_sleep)
+
+    try:
+        asyncio.run(retry_module.async_retry(
+            rejected, is_permanent=lambda exc: isinstance(exc, ValueError)))
+        assert False, "Expected ValueError"
+    except ValueError:
+        pass
+
+    assert attempts["count"] == 1
+    assert sleep_calls == []
+
+
+def test_async_retry_jitter_and_max_delay(monkeypatch):
+    sleep_calls = []
+
+    async def fake_sleep(delay):
+        sleep_calls.append(delay)
+
+    async def always_fail():
+        raise RuntimeError("down")
+
+    monkeypatch.setattr(retry_module.asyncio, "sleep", fake_sleep)
+    monkeypatch.setattr(retry_module.random, "uniform", lambda low, high: high)
+
+    try:
+        asyncio.run(retry_module.async_retry(
+            always_fail, retries=5, base_delay=1.0, max_delay=2.0, jitter=0.5))
+    except RuntimeError:
+        pass
+
+    assert sleep_calls == [1.5, 3.0, 3.0, 3.0]
+
+
+def test_circuit_breaker_opens_and_probes():
+    now = {"t": 0.0}
+    breaker = retry_module.CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=lambda: now["t"])
+
+    assert breaker.acquire() == 0
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == breaker.OPEN
+    assert breaker.acquire() == 10
+
+    now["t"] = 10
+    assert breaker.acquire() == 0  # single probe
+    assert breaker.state == breaker.HALF_OPEN
+    assert breaker.acquire() > 0  # others keep waiting
+
+    breaker.record_failure()
+    assert breaker.state == breaker.OPEN
+
+    now["t"] = 20
+    assert breaker.acquire() == 0
+    breaker.record_success()
+    assert breaker.state == breaker.CLOSED
+    assert breaker.acquire() == 0
+
+
+def test_async_retry_waits_on_open_breaker(monkeypatch):
+    now = {"t": 0.0}
+    sleep_calls = []
+
+    async def fake_sleep(delay):
+        sleep_calls.append(delay)
+        now["t"] += delay
+
+    breaker = retry_module.CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=lambda: now["t"])
+    breaker.record_failure()
+
+    async def ok():
+        return "sent"
+
+    monkeypatch.setattr(retry_module.asyncio, "sleep", fake_sleep)
+
+    result = asyncio.run(retry_module.async_retry(ok, retries=1, breaker=breaker))
+
+    assert result == "sent"
+    assert sleep_calls == [30]
+    assert breaker.state == breaker.CLOSED
@@ -0,0 +1,30 @@
+from utils.row_allocator import RowAllocator, next_order_number
+
+
+def test_next_order_number_skips_empty_and_header():
+    assert next_order_number(["№"]) == 1
+    assert next_order_number(["№", "1", "2", ""]) == 3
+    assert next_order_number(["№", "7", "note"]) == 8
+
+
+def test_allocate_returns_unique_rows_and_numbers():
+    allocator = RowAllocator()
+    assert allocator.allocate() is None
+
+    allocator.update_from_column(["№", "1", "2"])
+
+    assert allocator.allocate() == (4, 3)
+    assert allocator.allocate() == (5, 4)
+
+
+def test_resync_never_moves_counters_backwards():
+    allocator = RowAllocator()
+    allocator.update_from_column(["№", "1"])
+    allocator.allocate()
+    allocator.allocate()
+
+    allocator.update_from_column(["№", "1", "2"])
+    assert allocator.allocate() == (5, 4)
+
+    allocator.update_from_column(["№", "1", "2", "3", "4", "5", "6", "9"])
+    assert allocator.allocate() == (9, 10)
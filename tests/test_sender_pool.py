@@ -0,0 +1,102 @@
+import asyncio
+
+from services.telegram.rate_limiter import TelegramRateLimiter, TokenBucket
+from services.telegram.sender_pool import SenderPool
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_allows_burst_then_reports_wait():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=20 / 60, capacity=3, clock=clock)
+
+    assert [bucket.try_acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.try_acquire() == 3.0
+
+    clock.now = 3.0
+    assert bucket.try_acquire() == 0.0
+
+
+def test_rate_limiter_uses_group_and_private_buckets():
+    limiter = TelegramRateLimiter(group_rate_per_minute=20, group_burst=3, private_rate=1)
+
+    assert limiter.chat_bucket("-1001").rate == 20 / 60
+    assert limiter.chat_bucket("-1001").capacity == 3
+    assert limiter.chat_bucket("12345").rate == 1
+
+
+class UnlimitedLimiter:
+    async def acquire(self, chat_id):
+        return None
+
+
+def test_sender_pool_sends_chats_concurrently_in_per_chat_order():
+    sent = []
+    active = {"now": 0, "max": 0}
+
+    async def fake_send(item):
+        active["now"] += 1
+        active["max"] = max(active["max"], active["now"])
+        await asyncio.sleep(0.01)
+        sent.append((item["chat_id"], item["text"]))
+        active["now"] -= 1
+
+    async def scenario():
+        pool = SenderPool(fake_send, UnlimitedLimiter(), concurrency=4)
+        for i in range(3):
+            await pool.submit({"chat_id": "-1", "text": str(i)})
+            await pool.submit({"chat_id": "-2", "text": str(i)})
+        await pool.join()
+        await pool.close()
+
+    asyncio.run(scenario())
+
+    assert [text for chat, text in sent if chat == "-1"] == ["0", "1", "2"]
+    assert [text for chat, text in sent if chat == "-2"] == ["0", "1", "2"]
+    assert active["max"] == 2
+
+
+def test_sender_pool_survives_send_errors():
+    sent = []
+
+    async def flaky_send(item):
+        if item["text"] == "bad":
+            raise RuntimeError("boom")
+        sent.append(item["text"])
+
+    async def scenario():
+        pool = SenderPool(flaky_send, UnlimitedLimiter(), concurrency=2)
+        await pool.submit({"chat_id": "-1", "text": "bad"})
+        await pool.submit({"chat_id": "-1", "text": "ok"})
+        await pool.join()
+
+    asyncio.run(scenario())
+
+    assert sent == ["ok"]
+
+
+def test_sender_pool_close_returns_messages_left_after_timeout():
+    sent = []
+
+    async def slow_send(item):
+        await asyncio.sleep(0.05)
+        sent.append(item["text"])
+
+    async def scenario():
+        pool = SenderPool(slow_send, UnlimitedLimiter(), concurrency=2)
+        for text in "abc":
+            await pool.submit({"chat_id": "-1", "text": text})
+        return await pool.close(timeout=0.07)
+
+    unsent = asyncio.run(scenario())
+
+    assert sent == ["a"]
+    # "b" was cancelled mid-send and goes back with "c"
+    assert [item["text"] for item in unsent] == ["b", "c"]
+
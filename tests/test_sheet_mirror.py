@@ -0,0 +1,106 @@
+from utils import google_sheet
+from utils.sheet_mirror import SheetMirror
+
+HEADER = ["№", "Монета", "Сторона"]
+
+
+class FakeWorksheet:
+    def __init__(self, rows):
+        self.rows = rows
+        self.reads = []
+        self.updates = []
+
+    def get_all_values(self):
+        self.reads.append("all")
+        return [list(row) for row in self.rows]
+
+    def get(self, cell_range):
+        self.reads.append(cell_range)
+        start = int(cell_range.split(":")[0][1:])
+        return [list(row) for row in self.rows[start - 1:]]
+
+    def acell(self, label):
+        self.reads.append(label)
+        raise AssertionError("read-before-write must be answered by the mirror")
+
+    def col_values(self, col):
+        self.reads.append(f"col{col}")
+        raise AssertionError("column A must be answered by the mirror")
+
+    def update(self, cell_range, values):
+        self.updates.append((cell_range, values))
+        return {"updatedCells": 1}
+
+
+def _execute(operation, *args):
+    return operation(*args)
+
+
+def _loaded_mirror(monkeypatch, rows):
+    monkeypatch.setattr(google_sheet, "_execute_with_retry", _execute)
+    monkeypatch.setattr("utils.sheet_mirror._execute_with_retry", _execute)
+    worksheet = FakeWorksheet(rows)
+    mirror = SheetMirror()
+    monkeypatch.setattr(google_sheet, "_mirror", mirror)
+    monkeypatch.setattr(google_sheet, "_write_buffer", None)
+    assert mirror.refresh(worksheet)
+    return mirror, worksheet
+
+
+def test_load_answers_cells_and_columns():
+    mirror = SheetMirror()
+    assert mirror.get(2, "A") is None
+
+    mirror.load([HEADER, ["1", "BTC"], [], ["3", "ETH", "", "", "", "", "", "", "", "", "", "", "➕"]])
+
+    assert mirror.get(2, "B") == "BTC"
+    assert mirror.get(3, "A") == "" and mirror.get(2, "Q") == ""
+    assert mirror.column("A") == ["№", "1", "", "3"]
+    assert mirror.last_row == 4
+    assert google_sheet.select_live_trades(mirror.values())[0][-1] == 4
+
+
+def test_reload_keeps_writes_made_while_reading():
+    mirror = SheetMirror()
+    mirror.load([HEADER, ["1", "BTC"]])
+    mirror.apply(2, {"O": 1})
+    since = mirror.mark()
+    mirror.apply(2, {"K": 1, "L": 95.5})
+
+    # The sheet answered before the second write reached it
+    mirror.load([HEADER, ["1", "BTC", "", "", "", "", "", "", "", "", "", "", "", "", "1"]], since=since)
+
+    assert (mirror.get(2, "O"), mirror.get(2, "K"), mirror.get(2, "L")) == ("1", "1", "95.5")
+
+
+def test_tp_update_checks_mirror_instead_of_reading_the_cell(monkeypatch):
+    mirror, worksheet = _loaded_mirror(monkeypatch, [HEADER, ["1", "BTC"] + [""] * 12 + ["2"]])
+
+    assert google_sheet.gs_tp_update(worksheet, 2, 2) is None
+    google_sheet.gs_tp_update(worksheet, 3, 2)
+
+    assert worksheet.reads == ["all"]
+    assert worksheet.updates == [("O2", [[3]])]
+    assert mirror.get(2, "O") == "3"
+
+
+def test_order_number_and_empty_row_come_from_mirror(monkeypatch):
+    mirror, worksheet = _loaded_mirror(monkeypatch, [HEADER, ["7", "BTC"], ["", "note"]])
+
+    assert google_sheet.get_empty_row(worksheet) == 3
+    assert google_sheet.get_order_number(worksheet, 4) == 8
+    google_sheet.gs_first_update(worksheet, "ETH/USDT", "LONG", "01.01.2026", 1.0, 2, 3, 4, 5, 6, True, 4, 8)
+
+    assert google_sheet.get_order_number(worksheet, 5) == 9
+    assert worksheet.reads == ["all"]
+
+
+def test_periodic_refresh_reads_only_new_rows(monkeypatch):
+    mirror, worksheet = _loaded_mirror(monkeypatch, [HEADER, ["1", "BTC"]])
+    worksheet.rows.append(["2", "SOL"])
+
+    assert mirror.refresh(worksheet)
+    assert mirror.refresh(worksheet, full=True)
+
+    assert worksheet.reads == ["all", "A3:ZZ", "all"]
+    assert mirror.column("A") == ["№", "1", "2"]
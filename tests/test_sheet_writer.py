@@ -0,0 +1,66 @@
+from utils import google_sheet
+from utils.sheet_writer import SheetWriteBuffer, build_requests
+
+
+class FakeWorksheet:
+    def __init__(self):
+        self.batches = []
+
+    def batch_update(self, requests):
+        self.batches.append(requests)
+        return {"ok": True}
+
+
+def _execute(operation, *args):
+    return operation(*args)
+
+
+def test_build_requests_merges_adjacent_columns():
+    requests = build_requests({5: {"L": 1.5, "K": 2, "O": 3}, 2: {"Q": "➕"}})
+
+    assert requests == [
+        {"range": "Q2", "values": [["➕"]]},
+        {"range": "K5:L5", "values": [[2, 1.5]]},
+        {"range": "O5", "values": [[3]]},
+    ]
+
+
+def test_updates_for_many_rows_are_sent_in_one_batch():
+    worksheet = FakeWorksheet()
+    buffer = SheetWriteBuffer(execute=_execute)
+
+    for row in range(10, 60):
+        buffer.put(worksheet, row, {"O": 1})
+    buffer.put(worksheet, 10, {"O": 2})
+
+    assert len(buffer) == 50
+    assert buffer.flush() == 1
+    assert len(worksheet.batches) == 1
+    assert worksheet.batches[0][0] == {"range": "O10", "values": [[2]]}
+    assert len(buffer) == 0
+
+
+def test_failed_flush_keeps_newer_values():
+    worksheet = FakeWorksheet()
+    buffer = SheetWriteBuffer(execute=lambda operation, *args: None)
+
+    buffer.put(worksheet, 3, {"K": 1, "L": 100.0})
+    buffer.flush()
+    buffer.put(worksheet, 3, {"K": 2})
+    buffer._requeue(worksheet, {3: {"K": 1}})
+
+    assert buffer._pending[worksheet] == {3: {"K": 2, "L": 100.0}}
+
+
+def test_gs_updates_go_to_write_buffer(monkeypatch):
+    worksheet = FakeWorksheet()
+    buffer = SheetWriteBuffer(execute=_execute)
+    monkeypatch.setattr(google_sheet, "_write_buffer", buffer)
+
+    google_sheet.gs_av_update(worksheet, 1, 7, 95.5)
+    google_sheet.gs_tp_update(worksheet, 2, 7)
+    google_sheet.gs_breakeven_update(worksheet, 7, False)
+
+    assert worksheet.batches == []
+    buffer.flush()
+    assert worksheet.batches == [[{"range": "K7:O7", "values": [[1, 95.5, "➖", "✅", 2]]}]]
@@ -0,0 +1,240 @@
+import asyncio
+from urllib.parse import parse_qs
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from utils import sheets_client
+from utils.sheet_writer import SheetWriteBuffer
+from utils.sheets_client import AsyncSheetsClient, ServiceAccountToken, StaticToken
+from utils.sheets_scheduler import SheetsScheduler
+
+
+class StubSheets:
+    """Minimal Sheets v4 + OAuth token endpoint keeping values in a dict of cells."""
+
+    def __init__(self, title="Сделки"):
+        self.title = title
+        self.cells = {}  # {(row, col): value}
+        self.tokens_issued = 0
+        self.requests = []
+        self.fail_next = []  # statuses to answer before serving normally
+
+    def app(self):
+        app = web.Application()
+        app.router.add_post("/token", self.token)
+        app.router.add_get("/v4/spreadsheets/{id}", self.metadata)
+        app.router.add_get("/v4/spreadsheets/{id}/values/{range}", self.get_values)
+        app.router.add_put("/v4/spreadsheets/{id}/values/{range}", self.update)
+        app.router.add_post("/v4/spreadsheets/{id}/values:batchUpdate", self.batch_update)
+        return app
+
+    async def token(self, request):
+        form = parse_qs(await request.text())
+        assert form["grant_type"] == ["urn:ietf:params:oauth:grant-type:jwt-bearer"]
+        self.tokens_issued += 1
+        return web.json_response({"access_token": f"token-{self.tokens_issued}", "expires_in": 3600})
+
+    def _check(self, request):
+        self.requests.append((request.method, request.match_info.get("range"), request.headers["Authorization"]))
+        if self.fail_next:
+            status = self.fail_next.pop(0)
+            return web.json_response({"error": {"code": status}}, status=status)
+        return None
+
+    async def metadata(self, request):
+        error = self._check(request)
+        if error is not None:
+            return error
+        return web.json_response({"sheets": [
+            {"properties": {"sheetId": 1, "title": "Архив", "index": 1}},
+            {"properties": {"sheetId": 0, "title": self.title, "index": 0}},
+        ]})
+
+    def _parse(self, cell_range):
+        title, _, cells = cell_range.rpartition("!")
+        assert title == f"'{self.title}'"
+        return cells
+
+    async def get_values(self, request):
+        error = self._check(request)
+        if error is not None:
+            return error
+        cell_range = self._parse(request.match_info["range"])
+        column = cell_range.split(":")[0].rstrip("0123456789")
+        rows = sorted(row for row, col in self.cells if col == column)
+        if request.query.get("majorDimension") == "COLUMNS":
+            values = [[self.cells.get((row, column), "") for row in range(1, (rows[-1] if rows else 0) + 1)]]
+            return web.json_response({"values": values} if rows else {})
+        row = int(cell_range[len(column):])
+        value = self.cells.get((row, column))
+        return web.json_response({"values": [[value]]} if value is not None else {})
+
+    def _write(self, cell_range, values):
+        start = self._parse(cell_range).split(":")[0]
+        column = start.rstrip("0123456789")
+        row = int(start[len(column):])
+        for offset, value in enumerate(values[0]):
+            self.cells[(row, chr(ord(column) + offset))] = str(value)
+
+    async def update(self, request):
+        error = self._check(request)
+        if error is not None:
+            return error
+        assert request.query["valueInputOption"] == "RAW"
+        body = await request.json()
+        self._write(body["range"], body["values"])
+        return web.json_response({"updatedCells": len(body["values"][0])})
+
+    async def batch_update(self, request):
+        error = self._check(request)
+        if error is not None:
+            return error
+        body = await request.json()
+        for item in body["data"]:
+            self._write(item["range"], item["values"])
+        return web.json_response({"totalUpdatedCells": sum(len(item["values"][0]) for item in body["data"])})
+
+
+async def _serve(stub):
+    server = TestServer(stub.app())
+    await server.start_server()
+    return server
+
+
+def _client(server, **kwargs):
+    return AsyncSheetsClient("sheet-id", kwargs.pop("token", StaticToken("static")),
+                             base_url=str(server.make_url("")), base_delay=0.0, **kwargs)
+
+
+def _service_account_info(token_url):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                            serialization.NoEncryption()).decode()
+    return {"client_email": "bot@project.iam.gserviceaccount.com", "private_key": pem,
+            "private_key_id": "1", "token_uri": token_url}
+
+
+def test_spreadsheet_id_from_url():
+    url = "https://docs.google.com/spreadsheets/d/1AbC-d_9/edit#gid=0"
+    assert sheets_client.spreadsheet_id_from_url(url) == "1AbC-d_9"
+
+
+def test_gs_operations_round_trip_through_stub_server():
+    stub = StubSheets()
+    stub.cells[(1, "A")] = "№"
+
+    async def scenario():
+        server = await _serve(stub)
+        try:
+            async with _client(server) as client:
+                assert await client.connect()
+                assert client.title == "Сделки"
+                row = await sheets_client.get_empty_row(client)
+                order = await sheets_client.get_order_number(client, row)
+                await sheets_client.gs_first_update(client, "BTC/USDT", "LONG", "01.01.2026 00:00", 100.0,
+                                                    101, 102, 103, 104, 105, True, row, order)
+                await sheets_client.gs_tp_update(client, 2, row)
+                stale = await sheets_client.gs_tp_update(client, 1, row)
+                await sheets_client.gs_av_update(client, 1, row, 95.5)
+                await sheets_client.gs_final_tp_update(client, 5, row, False)
+                return row, order, stale, await sheets_client.get_empty_row(client)
+        finally:
+            await server.close()
+
+    row, order, stale, next_row = asyncio.run(scenario())
+
+    assert (row, order, next_row) == (2, 1, 3)
+    assert stale is None
+    assert stub.cells[(2, "A")] == "1" and stub.cells[(2, "B")] == "BTC"
+    assert (stub.cells[(2, "K")], stub.cells[(2, "L")]) == ("1", "95.5")
+    assert (stub.cells[(2, "M")], stub.cells[(2, "O")]) == ("➖", "5")
+
+
+def test_retries_server_errors_and_gives_up_on_bad_request(monkeypatch):
+    alerts = []
+    monkeypatch.setattr(sheets_client, "send_tech_alert", alerts.append)
+    stub = StubSheets()
+
+    async def scenario():
+        server = await _serve(stub)
+        try:
+            async with _client(server, retries=3) as client:
+                stub.fail_next = [429, 503]
+                assert await client.connect()
+                stub.fail_next = [400]
+                return await client.update("O2", [[1]])
+        finally:
+            await server.close()
+
+    assert asyncio.run(scenario()) is None
+    # Two failed attempts, the successful one, then a single rejected write
+    assert len(stub.requests) == 4
+    assert alerts == ["Ошибка запроса к Google API при операции update ❌"]
+
+
+def test_service_account_token_is_cached_and_refreshed_ahead_of_expiry():
+    stub = StubSheets()
+    now = [1_000_000.0]
+
+    async def scenario():
+        server = await _serve(stub)
+        try:
+            token = ServiceAccountToken(_service_account_info(str(server.make_url("/token"))),
+                                        refresh_margin=300, clock=lambda: now[0])
+            async with _client(server, token=token) as client:
+                assert await client.connect()
+                await asyncio.gather(*(client.acell(f"A{row}") for row in range(2, 10)))
+                now[0] += 3600 - 299  # Inside the refresh margin
+                await client.acell("A2")
+        finally:
+            await server.close()
+
+    asyncio.run(scenario())
+
+    assert stub.tokens_issued == 2
+    assert {auth for *_, auth in stub.requests[:-1]} == {"Bearer token-1"}
+    assert stub.requests[-1][2] == "Bearer token-2"
+
+
+def test_write_buffer_flushes_through_async_client():
+    stub = StubSheets()
+
+    async def scenario():
+        server = await _serve(stub)
+        try:
+            async with _client(server) as client:
+                assert await client.connect()
+                buffer = SheetWriteBuffer(flush_interval=0.01, max_cells=1000)
+                buffer.start_async()
+                buffer.put(client, 5, {"O": 1, "M": "➕"})
+                buffer.put(client, 6, {"Q": "➕"})
+                await asyncio.sleep(0.2)
+                buffer.put(client, 7, {"O": 3})
+                await buffer.stop_async()
+                return len(buffer)
+        finally:
+            await server.close()
+
+    assert asyncio.run(scenario()) == 0
+    assert stub.cells[(5, "O")] == "1" and stub.cells[(6, "Q")] == "➕" and stub.cells[(7, "O")] == "3"
+    assert [method for method, *_ in stub.requests] == ["GET", "POST", "POST"]
+
+
+def test_quota_errors_wait_for_scheduler_without_using_attempts():
+    stub = StubSheets()
+    scheduler = SheetsScheduler(per_minute=600, burst=10, quota_pause=0.01)
+
+    async def scenario():
+        server = await _serve(stub)
+        try:
+            async with _client(server, retries=1, scheduler=scheduler) as client:
+                stub.fail_next = [429, 429]
+                return await client.connect()
+        finally:
+            await server.close()
+
+    assert asyncio.run(scenario())
+    assert len(stub.requests) == 3
@@ -0,0 +1,138 @@
+import asyncio
+
+import gspread
+
+from utils import google_sheet
+from utils.sheet_writer import SheetWriteBuffer
+from utils.sheets_scheduler import (PRIORITY_CRITICAL, PRIORITY_LOW, PRIORITY_NORMAL, SheetsScheduler,
+                                    current_priority, scheduling_priority)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class QuotaResponse:
+    text = "quota"
+
+    def json(self):
+        return {"error": {"code": 429, "message": "Quota exceeded", "status": "RESOURCE_EXHAUSTED"}}
+
+
+class FakeWorksheet:
+    def __init__(self):
+        self.batches = []
+
+    def batch_update(self, requests):
+        self.batches.append(requests)
+        return {"ok": True}
+
+
+def test_bucket_never_exceeds_quota_per_minute():
+    clock = FakeClock()
+    scheduler = SheetsScheduler(per_minute=60, burst=10, quota_pause=0, clock=clock, sleep=clock.sleep)
+
+    granted = 0
+    while clock.now < 60:
+        scheduler.acquire(PRIORITY_CRITICAL)
+        if clock.now < 60:
+            granted += 1
+
+    assert granted <= 60
+    assert granted >= 59
+
+
+def test_lower_classes_keep_a_reserve_for_closures():
+    clock = FakeClock()
+    scheduler = SheetsScheduler(per_minute=60, burst=8, clock=clock, sleep=clock.sleep)
+    for _ in range(4):
+        scheduler.acquire(PRIORITY_CRITICAL)
+
+    # 4 of 8 tokens left: the 5% flag needs 1 + half the bucket, TP needs 1 + a quarter
+    assert scheduler.wait_time(PRIORITY_LOW) > 0
+    assert scheduler.wait_time(PRIORITY_NORMAL) == 0
+    assert scheduler.wait_time(PRIORITY_CRITICAL) == 0
+
+
+def test_waiting_requests_are_served_by_priority():
+    scheduler = SheetsScheduler(per_minute=20 * 60 + 2, burst=2, poll_interval=0.005)
+    done = []
+
+    async def request(name, priority):
+        await scheduler.acquire_async(priority)
+        done.append(name)
+
+    async def scenario():
+        await scheduler.acquire_async(PRIORITY_CRITICAL)
+        await scheduler.acquire_async(PRIORITY_CRITICAL)
+        tasks = [asyncio.create_task(request(name, priority)) for name, priority in
+                 (("flag", PRIORITY_LOW), ("tp", PRIORITY_NORMAL), ("close", PRIORITY_CRITICAL))]
+        await asyncio.sleep(0)
+        assert scheduler.waiting_count() == 3
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+
+    assert done == ["close", "tp", "flag"]
+    assert scheduler.waiting_count() == 0
+
+
+def test_quota_error_pauses_instead_of_using_up_attempts(monkeypatch):
+    clock = FakeClock()
+    scheduler = SheetsScheduler(per_minute=60, burst=10, quota_pause=5, clock=clock, sleep=clock.sleep)
+    monkeypatch.setattr(google_sheet, "_scheduler", scheduler)
+    monkeypatch.setattr(google_sheet, "MAX_RETRIES", 1)
+    monkeypatch.setattr(google_sheet, "RETRY_DELAY", 0)
+    calls = []
+
+    def batch_update(requests):
+        calls.append(clock.now)
+        if len(calls) < 3:
+            raise gspread.exceptions.APIError(QuotaResponse())
+        return {"ok": True}
+
+    assert google_sheet._execute_with_retry(batch_update, []) == {"ok": True}
+    # Each 429 stops every request for quota_pause seconds
+    assert calls[0] == 0 and calls[1] >= 5 and calls[2] >= 10
+
+
+def test_write_buffer_holds_low_priority_cells_under_pressure(monkeypatch):
+    clock = FakeClock()
+    scheduler = SheetsScheduler(per_minute=60, burst=8, clock=clock, sleep=clock.sleep)
+    for _ in range(5):
+        scheduler.acquire(PRIORITY_CRITICAL)
+    worksheet = FakeWorksheet()
+    buffer = SheetWriteBuffer(execute=lambda operation, *args: operation(*args))
+    buffer.scheduler = scheduler
+    monkeypatch.setattr(google_sheet, "_write_buffer", buffer)
+    monkeypatch.setattr(google_sheet, "_mirror", None)
+
+    google_sheet.gs_5_perc_alert_update(worksheet, 5)
+    assert buffer.pending_priority() == PRIORITY_LOW
+    assert buffer._should_defer()
+
+    google_sheet.gs_final_tp_update(worksheet, 5, 6, False)
+    assert buffer.pending_priority() == PRIORITY_CRITICAL
+    assert not buffer._should_defer()
+    buffer.flush()
+
+    # Both rows went out in the one request the closure was allowed to make
+    assert len(worksheet.batches) == 1
+    assert [request["range"] for request in worksheet.batches[0]] == ["Q5", "M6", "O6"]
+    assert buffer.pending_priority() is None
+
+
+def test_priority_context_is_restored():
+    assert current_priority() == PRIORITY_NORMAL
+    with scheduling_priority(PRIORITY_LOW):
+        with scheduling_priority(PRIORITY_CRITICAL):
+            assert current_priority() == PRIORITY_CRITICAL
+        assert current_priority() == PRIORITY_LOW
+    assert current_priority() == PRIORITY_NORMAL
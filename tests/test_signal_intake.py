@@ -0,0 +1,96 @@
+import asyncio
+import time
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from utils import signal_intake as signal_intake_module
+from utils.signal_intake import SignalIntake
+from utils.tg_signal2 import parse_signal_data2
+
+SHEETS_LATENCY = 0.3
+
+SIGNAL_TEXT = (
+    "🚀 #{coin}/USDT [LONG]\n"
+    "Entry: market\n"
+    "Take-Profit:\n"
+    "1) 101.1 (25%)\n"
+    "Stop-loss: 95.5\n"
+)
+
+
+def test_webhook_latency_does_not_depend_on_sheets_latency():
+    processed = []
+
+    async def slow_sheet_work(signal):
+        # Stands in for the blocking gspread calls of the real pipeline
+        await asyncio.to_thread(time.sleep, SHEETS_LATENCY)
+        processed.append(signal["coin"])
+
+    async def scenario():
+        intake = SignalIntake(slow_sheet_work, maxsize=10)
+
+        async def webhook(request):
+            signal = parse_signal_data2((await request.json())["text"])
+            if signal:
+                intake.submit(signal)
+            return web.Response(text="ok")
+
+        app = web.Application()
+        app.router.add_post("/webhook", webhook)
+        intake.start()
+        latencies = []
+        async with TestClient(TestServer(app)) as client:
+            for coin in ("BTC", "ETH", "SOL", "XRP"):
+                started = time.perf_counter()
+                response = await client.post("/webhook", json={"text": SIGNAL_TEXT.format(coin=coin)})
+                latencies.append(time.perf_counter() - started)
+                assert response.status == 200
+            assert processed == []
+            await intake.stop(timeout=5)
+        return latencies
+
+    latencies = asyncio.run(scenario())
+
+    # All four responses came back before the first sheet call finished
+    assert sum(latencies) < SHEETS_LATENCY
+    assert processed == ["BTC/USDT", "ETH/USDT", "SOL/USDT", "XRP/USDT"]
+
+
+def test_full_queue_drops_signal_with_alert(monkeypatch):
+    alerts = []
+    monkeypatch.setattr(signal_intake_module, "send_tech_alert", alerts.append)
+
+    async def never_done(signal):
+        await asyncio.Event().wait()
+
+    async def scenario():
+        intake = SignalIntake(never_done, maxsize=1)
+        accepted = [intake.submit({"coin": "BTC/USDT"}), intake.submit({"coin": "ETH/USDT"})]
+        return accepted, len(intake)
+
+    accepted, depth = asyncio.run(scenario())
+
+    assert accepted == [True, False]
+    assert depth == 1
+    assert alerts and "ETH/USDT" in alerts[0]
+
+
+def test_processing_error_does_not_stop_pipeline():
+    processed = []
+
+    async def process(signal):
+        if signal["coin"] == "BAD":
+            raise ValueError("sheet unavailable")
+        processed.append(signal["coin"])
+
+    async def scenario():
+        intake = SignalIntake(process)
+        intake.start()
+        intake.submit({"coin": "BAD"})
+        intake.submit({"coin": "BTC/USDT"})
+        await intake.stop(timeout=1)
+
+    asyncio.run(scenario())
+
+    assert processed == ["BTC/USDT"]
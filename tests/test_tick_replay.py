@@ -0,0 +1,57 @@
+from utils import position_engine
+from utils.tick_recorder import TickRecorder, read_ticks, tick_files
+from utils.tick_replay import ReplayClock, ReplayFeed, captured_side_effects, replay
+
+
+def _record(directory, ticks, **kwargs):
+    clock = ReplayClock()
+    recorder = TickRecorder(str(directory), clock=clock, **kwargs)
+    for local_ts, exchange, coin, price in ticks:
+        clock.now = local_ts
+        recorder.record(exchange, coin, price, exchange_ts=local_ts - 0.05)
+    recorder.close()
+
+
+def test_recorder_round_trip_and_rotation(tmp_path):
+    ticks = [(1000.0 + i, "bybit", "BTCUSDT" if i % 2 else "ETHUSDT", 100.0 + i) for i in range(50)]
+    _record(tmp_path, ticks, chunk_size=8, max_file_bytes=256)
+
+    files = tick_files(str(tmp_path))
+    assert len(files) > 1
+
+    read = list(read_ticks(files))
+    assert [(t[3], t[0], t[1], t[4]) for t in read] == ticks
+    assert read[0][2] == 999.95
+
+
+def test_reader_skips_truncated_chunk(tmp_path):
+    _record(tmp_path, [(1.0, "bingx", "SOLUSDT", 10.0), (2.0, "bingx", "SOLUSDT", 11.0)], chunk_size=1)
+    path = tick_files(str(tmp_path))[0]
+    with open(path, "ab") as file:
+        file.write(b"TCK1\x05")
+
+    assert [t[4] for t in read_ticks([path])] == [10.0, 11.0]
+
+
+def test_replay_drives_engine_with_recorded_clock(tmp_path, allocator):
+    ticks = [(100.0, "bybit", "BTCUSDT", 100.0), (100.1, "bybit", "BTCUSDT", 100.4),
+             (3600.0, "bybit", "BTCUSDT", 101.2), (3600.1, "bybit", "BTCUSDT", 100.9)]
+    _record(tmp_path, ticks)
+
+    clock = ReplayClock()
+    feed = ReplayFeed()
+    engine = position_engine.PositionEngine(clock=clock, subscribe=feed.subscribe, unsubscribe=feed.unsubscribe,
+                                             allocator=allocator)
+    events = []
+    signal = {"coin": "BTC/USDT", "side": "LONG", "tp1": 101.0, "tp2": 102.0, "tp3": 103.0, "tp4": 104.0, "tp5": 105.0}
+
+    with captured_side_effects(clock, events):
+        engine.register_signal(None, signal, "bybit")
+        stats = replay(engine, feed, clock, read_ticks(tick_files(str(tmp_path))), batch_interval=0.3)
+
+    assert position_engine.send_alert is not None and position_engine.send_alert.__module__ == "utils.tg_signal"
+    assert stats["ticks"] == 4
+    names = [(at, name) for at, name, _ in events]
+    assert names[0] == (100.3, "gs_first_update")
+    assert (3600.1, "send_alert") in names
+    assert (3600.1, "gs_tp_update") in names
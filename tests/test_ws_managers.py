@@ -0,0 +1,194 @@
+import gzip
+import json
+
+from utils.get_bingx_data import BingXWSManager
+from utils.get_bybit_data import BybitWSManager
+from utils.ws_base import PriceSlot
+
+
+class FakeChannel:
+    def __init__(self):
+        self.items = []
+
+    def put(self, item):
+        self.items.append(item)
+
+
+def test_bybit_ticker_is_published_to_subscribers():
+    manager = BybitWSManager()
+    channel = FakeChannel()
+    manager.add_subscriber("BTCUSDT", channel)
+
+    reply = manager._on_message(json.dumps({"data": {"symbol": "BTCUSDT", "lastPrice": "101.5"}}))
+
+    assert reply is None
+    assert channel.items == [101.5]
+    assert manager.connection_states["BTCUSDT"] == {"connected": True}
+
+
+def test_bybit_json_ping_returns_pong():
+    manager = BybitWSManager()
+
+    assert json.loads(manager._on_message(json.dumps({"op": "ping"}))) == {"op": "pong"}
+
+
+def test_bingx_gzip_ticker_and_ping():
+    manager = BingXWSManager()
+    channel = FakeChannel()
+    manager.add_subscriber("ETHUSDT", channel)
+
+    frame = gzip.compress(json.dumps({"data": {"s": "ETH-USDT", "c": "2500.1"}}).encode())
+    assert manager._on_message(frame) is None
+    assert channel.items == [2500.1]
+
+    assert manager._on_message(gzip.compress(b"Ping")) == "Pong"
+
+
+def test_close_resets_connection_states():
+    manager = BybitWSManager()
+    manager.add_subscriber("BTCUSDT", FakeChannel())
+    manager._on_message(json.dumps({"data": {"symbol": "BTCUSDT", "lastPrice": "1"}}))
+
+    manager.connections[0]._on_close(1006, None)
+
+    assert manager.connection_states["BTCUSDT"] == {"connected": False}
+
+
+def test_price_slot_conflates_ticks_between_reads():
+    ready = []
+    slot = PriceSlot(on_ready=lambda: ready.append(True))
+
+    for price in (10.0, 12.0, 9.0, 11.0):
+        slot.put(price)
+
+    assert ready == [True]
+    assert slot.read() == (11.0, 12.0, 9.0, 4)
+    assert slot.read() is None
+
+    slot.put(5.0)
+    assert ready == [True, True]
+    assert slot.read() == (5.0, 5.0, 5.0, 1)
+
+
+def test_fast_ticker_decoders_extract_symbol_price_and_time():
+    from utils.ws_decode import decode_bingx_ticker, decode_bybit_ticker, gunzip
+
+    bybit = json.dumps({"topic": "tickers.BTCUSDT", "ts": 1700000000123,
+                        "data": {"symbol": "BTCUSDT", "lastPrice": "65000.5"}, "cs": 7}, separators=(",", ":"))
+    assert decode_bybit_ticker(bybit) == ("BTCUSDT", 65000.5, 1700000000.123)
+    assert decode_bybit_ticker('{"topic":"tickers.BTCUSDT","data":{"symbol":"BTCUSDT","bid1Price":"1"}}') is None
+
+    bingx = gzip.compress(b'{"code":0,"data":{"E":1700000000000,"s":"ETH-USDT","c":"2500.1"}}')
+    assert decode_bingx_ticker(gunzip(bingx)) == ("ETHUSDT", 2500.1, 1700000000.0)
+    assert decode_bingx_ticker(b'{"data":[{"s":"ETH-USDT","c":"1"}]}') is None
+    assert gunzip(b"Ping") == b"Ping"
+
+
+def test_bybit_price_delta_without_last_price_is_ignored():
+    manager = BybitWSManager()
+    channel = FakeChannel()
+    manager.add_subscriber("BTCUSDT", channel)
+
+    assert manager._on_message('{"topic":"tickers.BTCUSDT","type":"delta","data":{"symbol":"BTCUSDT"}}') is None
+    assert manager._on_message('{"topic":"tickers.BTCUSDT","data":{"symbol":"BTCUSDT","lastPrice":"2"},"ts":1}') is None
+    assert channel.items == [2.0]
+
+
+class FakeWS:
+    closed = False
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_str(self, payload):
+        self.sent.append(json.loads(payload))
+
+
+def test_subscriptions_are_batched_refcounted_and_sharded():
+    import asyncio
+
+    class SmallBybit(BybitWSManager):
+        max_args_per_frame = 2
+        max_topics_per_connection = 3
+
+    async def scenario():
+        manager = SmallBybit()
+        first, second = FakeChannel(), FakeChannel()
+        manager.add_subscriber("AUSDT", first)
+        manager.add_subscriber("AUSDT", second)
+        connection = manager.connections[0]
+        connection.ws = FakeWS()
+        connection._on_open()
+        await asyncio.sleep(0)
+        assert connection.ws.sent == [{"op": "subscribe", "args": ["tickers.AUSDT"]}]
+
+        for coin in ("BUSDT", "CUSDT", "DUSDT"):
+            manager.add_subscriber(coin, FakeChannel())
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert connection.ws.sent[-1] == {"op": "subscribe", "args": ["tickers.BUSDT", "tickers.CUSDT"]}
+        assert len(manager.connections) == 2
+        assert manager.connections[1].coins == {"DUSDT"}
+
+        manager.remove_subscriber("AUSDT", first)
+        await asyncio.sleep(0)
+        assert "AUSDT" in connection.coins
+
+        manager.remove_subscriber("AUSDT", second)
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert connection.ws.sent[-1] == {"op": "unsubscribe", "args": ["tickers.AUSDT"]}
+        assert "AUSDT" not in manager.subscribers
+
+        # The freed place on the first connection is reused
+        manager.add_subscriber("EUSDT", FakeChannel())
+        assert manager._coin_connections["EUSDT"] is connection
+
+    asyncio.run(scenario())
+
+
+def test_bingx_sends_one_topic_per_frame():
+    frames = BingXWSManager()._subscription_payloads(["BTCUSDT", "ETHUSDT"], subscribe=False)
+
+    assert [json.loads(frame) for frame in frames] == [
+        {"id": "unsub_BTCUSDT", "reqType": "unsub", "dataType": "BTC-USDT@ticker"},
+        {"id": "unsub_ETHUSDT", "reqType": "unsub", "dataType": "ETH-USDT@ticker"},
+    ]
+
+
+def test_fan_out_uses_snapshot_and_defers_connection_alerts(monkeypatch):
+    import asyncio
+
+    from utils import ws_base
+
+    alerts = []
+    monkeypatch.setattr(ws_base, "send_tech_alert", alerts.append)
+
+    async def scenario():
+        manager = BybitWSManager()
+        late = FakeChannel()
+
+        class Unsubscriber(FakeChannel):
+            def put(self, item):
+                super().put(item)
+                manager.remove_subscriber("BTCUSDT", late)
+
+        first = Unsubscriber()
+        manager.add_subscriber("BTCUSDT", first)
+        manager.add_subscriber("BTCUSDT", late)
+
+        manager._publish("BTCUSDT", 1.0)
+        # Subscription changes during delivery do not affect the tick in flight
+        assert first.items == [1.0] and late.items == [1.0]
+        assert manager.subscribers["BTCUSDT"] == (first,)
+        assert alerts == []
+        await asyncio.sleep(0)
+        assert alerts == ["Подключились к Bybit Stream для BTCUSDT ✅"]
+
+        manager.add_subscriber("ETHUSDT", FakeChannel())
+        manager._publish("ETHUSDT", 2.0)
+        manager.connections[0]._on_close(1006, None)
+        await asyncio.sleep(0)
+        assert alerts[-1] == "Отключились от Bybit Stream для BTCUSDT, ETHUSDT ❌"
+
+    asyncio.run(scenario())
@@ -1 +1,10 @@
-from .tg_signal import send_alert, send_av_alert, send_tech_alert
+__all__ = ['send_alert', 'send_av_alert', 'send_tech_alert']
+
+
+def __getattr__(name):
+    # tg_signal подгружается при первом обращении: он тянет за собой очередь Redis,
+    # а очередь сама импортирует utils.metrics, и прямой импорт здесь замкнул бы цикл
+    if name in __all__:
+        from . import tg_signal
+        return getattr(tg_signal, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
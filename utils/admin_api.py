@@ -0,0 +1,106 @@
+"""
+Служебные эндпоинты диагностики: профиль потоков и event loop, снимки памяти.
+
+Подключаются к приложению aiohttp бота только при ADMIN_ENDPOINTS=true и непустом
+ADMIN_TOKEN; каждый запрос должен передать токен в заголовке X-Admin-Token.
+
+    GET  /admin/profile?seconds=10&interval_ms=5   - collapsed stacks (файл для flamegraph)
+    POST /admin/tracemalloc/start?frames=25        - включить tracemalloc
+    GET  /admin/tracemalloc/snapshot?limit=20      - топ выделений и разница с прошлым снимком
+    POST /admin/tracemalloc/stop                   - выключить tracemalloc
+"""
+import asyncio
+import hmac
+import math
+import threading
+from datetime import datetime
+
+from aiohttp import web
+
+from bot.config import ADMIN_PROFILE_MAX_SECONDS, ADMIN_TOKEN
+from .logger_setup import logger
+from .profiler import memory_tracker, render_collapsed, sample_stacks
+
+KEY_TYPES = ('lineno', 'filename', 'traceback')
+
+_profile_lock = asyncio.Lock()
+
+
+def _number(request, name, default, kind=float):
+    try:
+        value = kind(request.query.get(name, default))
+    except ValueError:
+        raise web.HTTPBadRequest(text=f"{name} должен быть числом")
+    # nan прошел бы min/max, и профилирование с бесконечным сроком держало бы блокировку
+    if not math.isfinite(value):
+        raise web.HTTPBadRequest(text=f"{name} должен быть конечным числом")
+    return value
+
+
+@web.middleware
+async def _require_token(request, handler):
+    if request.path.startswith('/admin/'):
+        if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+            raise web.HTTPForbidden()
+    return await handler(request)
+
+
+async def profile(request):
+    """
+    Снимает стеки всех потоков в отдельном потоке, пока event loop продолжает работать.
+    """
+    seconds = min(max(_number(request, 'seconds', 10), 0.1), ADMIN_PROFILE_MAX_SECONDS)
+    interval = max(_number(request, 'interval_ms', 5), 1) / 1000
+    if _profile_lock.locked():
+        raise web.HTTPConflict(text="Профилирование уже идет")
+    async with _profile_lock:
+        logger.info(f"Профилирование потоков на {seconds}с (интервал {interval * 1000:.0f} мс)")
+        counts, samples = await asyncio.to_thread(sample_stacks, seconds, interval, threading.get_ident())
+    name = f"profile-{datetime.now():%Y%m%d-%H%M%S}.folded"
+    return web.Response(text=render_collapsed(counts), content_type='text/plain',
+                        headers={'Content-Disposition': f'attachment; filename="{name}"',
+                                 'X-Profile-Samples': str(samples)})
+
+
+async def tracemalloc_start(request):
+    frames = min(max(_number(request, 'frames', 25, int), 1), 100)
+    await asyncio.to_thread(memory_tracker.start, frames)
+    logger.warning(f"tracemalloc включен ({frames} кадров), не забудьте выключить")
+    return web.json_response({'tracing': True, 'frames': frames})
+
+
+async def tracemalloc_snapshot(request):
+    limit = min(max(_number(request, 'limit', 20, int), 1), 200)
+    key_type = request.query.get('group', 'lineno')
+    if key_type not in KEY_TYPES:
+        raise web.HTTPBadRequest(text=f"group должен быть одним из {', '.join(KEY_TYPES)}")
+    try:
+        result = await asyncio.to_thread(memory_tracker.snapshot, limit, key_type)
+    except RuntimeError as e:
+        raise web.HTTPConflict(text=str(e))
+    return web.json_response(result)
+
+
+async def tracemalloc_stop(request):
+    await asyncio.to_thread(memory_tracker.stop)
+    logger.info("tracemalloc выключен")
+    return web.json_response({'tracing': False})
+
+
+def setup_admin_routes(app):
+    """
+    Регистрирует эндпоинты диагностики в приложении aiohttp.
+
+    Returns:
+        bool: False, если ADMIN_TOKEN не задан: профиль и снимки памяти раскрывают
+        внутренности бота, поэтому без токена эндпоинты не подключаются.
+    """
+    if not ADMIN_TOKEN:
+        logger.error("ADMIN_ENDPOINTS=true, но ADMIN_TOKEN не задан: эндпоинты /admin/* не подключены")
+        return False
+    app.middlewares.append(_require_token)
+    app.router.add_get('/admin/profile', profile)
+    app.router.add_post('/admin/tracemalloc/start', tracemalloc_start)
+    app.router.add_get('/admin/tracemalloc/snapshot', tracemalloc_snapshot)
+    app.router.add_post('/admin/tracemalloc/stop', tracemalloc_stop)
+    return True
@@ -0,0 +1,137 @@
+"""
+Восстановление открытых позиций с догоном пропущенной истории цен.
+
+Пока бот был выключен, цена могла дойти до TP или усредняющих ордеров. Для каждой
+монеты один раз запрашиваются минутные свечи с момента последнего сохранения ее
+позиций, но не раньше последней живой цены, которую движок уже обработал
+(PositionStore.load_seen): иначе тень минутной свечи, которой не было в потоке
+тикеров, дала бы срабатывания, которых вживую не было. История прогоняется через движок в хронологическом порядке: каждая свеча -
+пачка (close, high, low) против индекса уровней всех позиций монеты. Только после
+этого монета переходит на живые тики. Время восстановления зависит от числа монет,
+а не позиций: запросы по монетам идут параллельно, по одному потоку на монету.
+
+HTTP-слой подменяемый, как в price_cache: get_json(url, params, timeout).
+"""
+import asyncio
+import math
+import time
+
+from bot.config import (BINGX_REST_URL, BYBIT_REST_URL, CATCH_UP_CONCURRENCY, CATCH_UP_MAX_HOURS,
+                        PRICE_SNAPSHOT_TIMEOUT)
+from .logger_setup import logger
+from .price_cache import aiohttp_get_json
+
+INTERVAL_SECONDS = 60  # Минутные свечи
+
+
+def parse_bybit_klines(payload):
+    """
+    Свечи (начало в секундах, high, low, close) из ответа Bybit /v5/market/kline.
+    """
+    return [(int(item[0]) / 1000, float(item[2]), float(item[3]), float(item[4]))
+            for item in payload['result']['list']]
+
+
+def parse_bingx_klines(payload):
+    """
+    Свечи (начало в секундах, high, low, close) из ответа BingX /openApi/swap/v3/quote/klines.
+    """
+    return [(int(item['time']) / 1000, float(item['high']), float(item['low']), float(item['close']))
+            for item in payload['data']]
+
+
+def _bybit_params(coin, start_ms, end_ms, limit):
+    return {'category': 'linear', 'symbol': coin, 'interval': '1',
+            'start': str(start_ms), 'end': str(end_ms), 'limit': str(limit)}
+
+
+def _bingx_params(coin, start_ms, end_ms, limit):
+    symbol = coin if '-' in coin else coin.replace('USDT', '-USDT')
+    return {'symbol': symbol, 'interval': '1m',
+            'startTime': str(start_ms), 'endTime': str(end_ms), 'limit': str(limit)}
+
+
+# { биржа: (базовый URL, путь, свечей за запрос, параметры, разбор ответа) }
+KLINE_ENDPOINTS = {
+    'bybit': (BYBIT_REST_URL, '/v5/market/kline', 1000, _bybit_params, parse_bybit_klines),
+    'bingx': (BINGX_REST_URL, '/openApi/swap/v3/quote/klines', 1440, _bingx_params, parse_bingx_klines),
+}
+
+
+async def fetch_history(exchange, coin, since, until, get_json=aiohttp_get_json, endpoints=None,
+                        timeout=PRICE_SNAPSHOT_TIMEOUT):
+    """
+    Минутные свечи монеты, начавшиеся в [since, until], по страницам.
+
+    Каждая страница запрашивается окном [start, end] не длиннее limit свечей: Bybit
+    на более широкое окно отдает только limit самых новых свечей (от новых к старым),
+    и старая часть истории молча терялась бы.
+
+    Returns:
+        list[tuple]: (начало в секундах, high, low, close) по возрастанию времени.
+    """
+    base_url, path, limit, make_params, parse = (endpoints or KLINE_ENDPOINTS)[exchange]
+    url = base_url.rstrip('/') + path
+    candles = {}
+    start = since
+    while start <= until:
+        end = min(until, start + (limit - 1) * INTERVAL_SECONDS)
+        page = parse(await get_json(url, make_params(coin, int(start * 1000), int(end * 1000), limit), timeout))
+        for candle in page:
+            candles[candle[0]] = candle
+        start = end + INTERVAL_SECONDS
+    return sorted(candle for candle in candles.values() if since <= candle[0] <= until)
+
+
+async def restore_positions(engine, worksheet, states, get_json=aiohttp_get_json, endpoints=None,
+                            clock=time.time, max_hours=CATCH_UP_MAX_HOURS, concurrency=CATCH_UP_CONCURRENCY,
+                            last_seen=None):
+    """
+    Ставит позиции из хранилища на отслеживание, сначала догоняя пропущенную историю цен.
+
+    Args:
+        engine (PositionEngine): Движок позиций.
+        worksheet (gspread.Worksheet | None): Рабочий лист.
+        states (list[dict]): Состояния из PositionStore.load_open() (с updated_at).
+        get_json (callable): HTTP-слой.
+        endpoints (dict, optional): Описание запросов свечей (по умолчанию KLINE_ENDPOINTS).
+        clock (callable): Текущее время (секунды Unix).
+        max_hours (float): Глубже этого история не запрашивается.
+        concurrency (int): Сколько монет запрашивается одновременно.
+        last_seen (dict, optional): { (биржа, монета): время последней обработанной живой цены }.
+
+    Returns:
+        dict: Число монет, позиций и прогнанных свечей.
+    """
+    endpoints = endpoints or KLINE_ENDPOINTS
+    last_seen = last_seen or {}
+    groups = {}
+    for state in states:
+        groups.setdefault(engine._key(state['exchange'], state['coin']), []).append(state)
+    now = clock()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def history(key, group):
+        exchange, coin = key
+        since = max(min(state.get('updated_at') or now for state in group), last_seen.get(key, 0.0),
+                    now - max_hours * 3600)
+        # Свеча, внутри которой было последнее сохранение, нужна: после него в ней могли быть цены
+        since = math.floor(since / INTERVAL_SECONDS) * INTERVAL_SECONDS
+        if exchange not in endpoints or since > now:
+            return key, []
+        async with semaphore:
+            try:
+                return key, await fetch_history(exchange, coin, since, now, get_json, endpoints)
+            except Exception as e:
+                logger.error(f"Не удалось получить историю цен {coin} ({exchange}) для догона: {e}")
+                return key, []
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(history(key, group) for key, group in groups.items()))
+    candles_applied = 0
+    for key, candles in results:
+        candles_applied += engine.restore_with_history(worksheet, groups[key], candles, INTERVAL_SECONDS)
+    stats = {'coins': len(groups), 'positions': len(states), 'candles': candles_applied}
+    logger.info(f"Восстановлено позиций: {stats['positions']} по {stats['coins']} монетам, "
+                f"прогнано свечей: {candles_applied} за {time.perf_counter() - started:.1f}с")
+    return stats
@@ -3,6 +3,8 @@ import time
 import gspread
 from .logger_setup import logger
 from config import GS_JS_FILE, GS_SHEET_FILE, G_LIST
+from .metrics import SHEETS_ERRORS, SHEETS_REQUEST_SECONDS
+from .sheets_scheduler import PRIORITY_CRITICAL, PRIORITY_LOW, PRIORITY_NORMAL, is_quota_error, with_priority
 from .tg_signal import send_tech_alert
 
 # --- Константы ---
@@ -11,6 +13,70 @@ SHEET_URL = GS_SHEET_FILE  # URL Google таблицы
 LIST_NUMBER = int(G_LIST)  # Номер листа в таблице
 MAX_RETRIES = 5 # Максимальное количество попыток при ошибках API
 RETRY_DELAY = 10 # Задержка между попытками в секундах
+ROW_COLUMNS = 'ABCDEFGHIJKLMNOPQ' # Столбцы строки сделки
+
+# Буфер отложенной записи (SheetWriteBuffer). Если задан, функции gs_*_update
+# не обращаются к API сами, а складывают ячейки в буфер и сразу возвращаются.
+_write_buffer = None
+
+# Зеркало листа в памяти (SheetMirror). Если задано и загружено, проверочные
+# чтения перед записью отвечаются из него, а все наши записи в него попадают.
+_mirror = None
+
+# Планировщик квоты (SheetsScheduler). Если задан, каждая попытка запроса ждет
+# разрешения у него, а ответ 429 приостанавливает все запросы, не тратя попытку.
+_scheduler = None
+
+
+def enable_write_buffer(buffer):
+    """
+    Включает отложенную запись: обновления сделок будут отправляться пачками через buffer.
+
+    Args:
+        buffer (SheetWriteBuffer | None): Буфер записи или None, чтобы писать напрямую.
+    """
+    global _write_buffer
+    _write_buffer = buffer
+
+
+def enable_mirror(mirror):
+    """
+    Подключает зеркало листа: проверки перед записью перестают читать таблицу.
+
+    Args:
+        mirror (SheetMirror | None): Зеркало или None, чтобы читать из API.
+    """
+    global _mirror
+    _mirror = mirror
+
+
+def enable_scheduler(scheduler):
+    """
+    Подключает планировщик квоты Google Sheets API.
+
+    Args:
+        scheduler (SheetsScheduler | None): Планировщик или None, чтобы не ограничивать запросы.
+    """
+    global _scheduler
+    _scheduler = scheduler
+
+
+def _remember(row, cells):
+    if _mirror is not None:
+        _mirror.apply(row, cells)
+
+
+def _mirrored(row, col):
+    """
+    Значение ячейки из зеркала или None, если зеркало не подключено или не загружено.
+    """
+    return _mirror.get(row, col) if _mirror is not None else None
+
+
+def _mirrored_column(col):
+    if _mirror is not None and _mirror.loaded:
+        return _mirror.column(col)
+    return None
 
 def init_gspread_client():
     """
@@ -48,16 +114,33 @@ def _execute_with_retry(worksheet_operation, *args, **kwargs):
     Выполняет операцию с рабочим листом с логикой повторных попыток.
     Внутренняя функция-обертка.
     """
-    for i in range(MAX_RETRIES):
+    operation = getattr(worksheet_operation, '__name__', 'unknown')
+    request_seconds = SHEETS_REQUEST_SECONDS.labels(operation=operation)
+    i = 0
+    while i < MAX_RETRIES:
+        if _scheduler is not None:
+            _scheduler.acquire()
+        started = time.perf_counter()
         try:
             result = worksheet_operation(*args, **kwargs)
+            request_seconds.observe(time.perf_counter() - started)
             return result
         except gspread.exceptions.APIError as e:
+            request_seconds.observe(time.perf_counter() - started)
+            SHEETS_ERRORS.labels(operation=operation).inc()
+            if _scheduler is not None and is_quota_error(e):
+                # Запрос не ошибочный, просто рано: ждем квоту у планировщика, попытка не тратится
+                _scheduler.throttled()
+                continue
             logger.error(f'Ошибка API при выполнении операции {worksheet_operation.__name__} (попытка {i + 1}/{MAX_RETRIES}): {e}')
             time.sleep(RETRY_DELAY)
+            i += 1
         except Exception as e:
+            request_seconds.observe(time.perf_counter() - started)
+            SHEETS_ERRORS.labels(operation=operation).inc()
             logger.exception(f'Непредвиденная ошибка в {worksheet_operation.__name__} (попытка {i + 1}/{MAX_RETRIES}): {e}')
             time.sleep(RETRY_DELAY)
+            i += 1
     logger.error(f"Не удалось выполнить операцию {worksheet_operation.__name__} после {MAX_RETRIES} попыток.")
     send_tech_alert(f'Ошибка запроса к Google API при операции {worksheet_operation.__name__} ❌')
     return None
@@ -81,8 +164,10 @@ def get_empty_row(worksheet: gspread.Worksheet):
         int | None: Номер первой свободной строки или None в случае ошибки.
     """
     logger.debug("Получение первой свободной строки...")
-    # Используем col_values(1) для получения только первого столбца - это намного быстрее, чем get_all_values()
-    col_a = _execute_with_retry(worksheet.col_values, 1)
+    col_a = _mirrored_column('A')
+    if col_a is None:
+        # Используем col_values(1) для получения только первого столбца - это намного быстрее, чем get_all_values()
+        col_a = _execute_with_retry(worksheet.col_values, 1)
     if col_a is not None:
         empty_row = len(col_a) + 1
         logger.debug(f"Найдена свободная строка: {empty_row}")
@@ -105,8 +190,12 @@ def get_order_number(worksheet: gspread.Worksheet, empty_row: int):
         return 1
         
     logger.debug(f"Определение номера ордера для строки {empty_row}...")
-    cell = _execute_with_retry(worksheet.acell, f'A{empty_row - 1}')
-    number = cell.value if cell else None
+    number = _mirrored(empty_row - 1, 'A')
+    if number is None:
+        cell = _execute_with_retry(worksheet.acell, f'A{empty_row - 1}')
+        number = cell.value if cell else None
+    else:
+        number = number or None  # Пустая ячейка в зеркале - как пустая ячейка из API
 
     if number is not None and number.isdigit():
         order_num = int(number) + 1
@@ -114,7 +203,9 @@ def get_order_number(worksheet: gspread.Worksheet, empty_row: int):
         return order_num
     elif number is None:
          # Если предыдущая ячейка пуста, ищем последнюю заполненную
-        col_a = _execute_with_retry(worksheet.col_values, 1)
+        col_a = _mirrored_column('A')
+        if col_a is None:
+            col_a = _execute_with_retry(worksheet.col_values, 1)
         if col_a:
             for i in range(len(col_a) - 1, 0, -1):
                 if col_a[i] and col_a[i].isdigit():
@@ -138,7 +229,19 @@ def get_old_orders(worksheet: gspread.Worksheet):
     sheet_data = _execute_with_retry(worksheet.get_all_values)
     if sheet_data is None:
         return None
+    return select_live_trades(sheet_data)
+
+
+def select_live_trades(sheet_data):
+    """
+    Отбирает незавершенные сделки из значений листа.
+
+    Args:
+        sheet_data (list[list[str]]): Все значения листа по строкам.
 
+    Returns:
+        list: Строки незавершенных сделок, в конец каждой добавлен номер строки.
+    """
     live_trades = []
     for i, line in enumerate(sheet_data, start=1):
         # Проверяем, что в строке достаточно столбцов и что 13-й столбец (индекс 12) равен '➕'
@@ -150,45 +253,72 @@ def get_old_orders(worksheet: gspread.Worksheet):
     return live_trades
 
 
+def first_row_data(coin, side, date_time, current_price, tp1, tp2, tp3, tp4, tp5, is_order_exist, order_number):
+    """
+    Значения столбцов A:Q для строки новой сделки.
+    """
+    gs_coin = coin.replace('/USDT', '')
+    return [order_number, gs_coin, side, date_time, current_price, tp1, tp2, tp3, tp4, tp5, '0', '', is_order(is_order_exist), '', '0', '', '➖']
+
+
+@with_priority(PRIORITY_CRITICAL)
 def gs_first_update(worksheet: gspread.Worksheet, coin, side, date_time, current_price, tp1, tp2, tp3, tp4, tp5, is_order_exist, empty_row, order_number):
     """
     Записывает в таблицу информацию о новой сделке.
     """
-    gs_coin = coin.replace('/USDT', '')
-    row_data = [order_number, gs_coin, side, date_time, current_price, tp1, tp2, tp3, tp4, tp5, '0', '', is_order(is_order_exist), '', '0', '', '➖']
-    
+    row_data = first_row_data(coin, side, date_time, current_price, tp1, tp2, tp3, tp4, tp5, is_order_exist, order_number)
     logger.info(f"Запись новой сделки в строку {empty_row}: {row_data}")
+    cells = dict(zip(ROW_COLUMNS, row_data))
+    _remember(empty_row, cells)
+    if _write_buffer is not None:
+        _write_buffer.put(worksheet, empty_row, cells)
+        return True
     result = _execute_with_retry(worksheet.update, f'A{empty_row}:Q{empty_row}', [row_data])
     if result:
         logger.info('Успешно записали новую сделку в таблицу.')
     return result
 
 
+@with_priority(PRIORITY_NORMAL)
 def gs_tp_update(worksheet: gspread.Worksheet, tp_count, empty_row):
     """
     Обновляет в таблице количество взятых тейк-профитов.
     """
     logger.info(f"Обновление TP={tp_count} для строки {empty_row}")
-    # Сначала прочитаем значение, чтобы не делать лишнюю запись
-    cell = _execute_with_retry(worksheet.acell, f'O{empty_row}')
-    current_tp_in_gs = cell.value if cell else None
+    if _write_buffer is not None:
+        # Движок отслеживания только увеличивает TP, поэтому проверочное чтение не нужно
+        _remember(empty_row, {'O': tp_count})
+        _write_buffer.put(worksheet, empty_row, {'O': tp_count})
+        return True
+    # Сначала сверим значение (из зеркала, иначе из таблицы), чтобы не делать лишнюю запись
+    current_tp_in_gs = _mirrored(empty_row, 'O')
+    if current_tp_in_gs is None:
+        cell = _execute_with_retry(worksheet.acell, f'O{empty_row}')
+        current_tp_in_gs = cell.value if cell else None
 
     if current_tp_in_gs is not None and current_tp_in_gs.isdigit() and tp_count > int(current_tp_in_gs):
+        _remember(empty_row, {'O': tp_count})
         result = _execute_with_retry(worksheet.update, f'O{empty_row}', [[tp_count]])
         if result:
             logger.info(f'Успешно обновили TP в таблице для строки {empty_row}.')
         return result
     elif current_tp_in_gs is None or not current_tp_in_gs.isdigit(): # если ячейка пустая или не число
+        _remember(empty_row, {'O': tp_count})
         return _execute_with_retry(worksheet.update, f'O{empty_row}', [[tp_count]])
     else:
         logger.warning(f"Попытка обновить TP в таблице для строки {empty_row}, но новое значение ({tp_count}) не больше старого ({current_tp_in_gs}).")
         return None
 
+@with_priority(PRIORITY_CRITICAL)
 def gs_final_tp_update(worksheet: gspread.Worksheet, tp_count, empty_row, is_order_exist):
     """
     Обновляет количество TP и закрывает сделку в таблице.
     """
     logger.info(f"Финальное обновление TP={tp_count} и закрытие сделки для строки {empty_row}")
+    _remember(empty_row, {'O': tp_count, 'M': is_order(is_order_exist)})
+    if _write_buffer is not None:
+        _write_buffer.put(worksheet, empty_row, {'O': tp_count, 'M': is_order(is_order_exist)})
+        return True
     # Используем batch_update для выполнения нескольких операций за один API-вызов
     requests = [
         {'range': f'O{empty_row}', 'values': [[tp_count]]},
@@ -200,11 +330,16 @@ def gs_final_tp_update(worksheet: gspread.Worksheet, tp_count, empty_row, is_ord
     return result
 
 
+@with_priority(PRIORITY_CRITICAL)
 def gs_stop_update(worksheet: gspread.Worksheet, stop_loss, empty_row, is_order_exist):
     """
     Обновляет статус сделки на 'закрыто по стопу' и записывает цену стоп-лосса.
     """
     logger.info(f"Обновление стоп-лосса и закрытие сделки для строки {empty_row}")
+    _remember(empty_row, {'M': is_order(is_order_exist), 'P': stop_loss})
+    if _write_buffer is not None:
+        _write_buffer.put(worksheet, empty_row, {'M': is_order(is_order_exist), 'P': stop_loss})
+        return True
     requests = [
         {'range': f'M{empty_row}', 'values': [[is_order(is_order_exist)]]},
         {'range': f'P{empty_row}', 'values': [[stop_loss]]}
@@ -215,11 +350,16 @@ def gs_stop_update(worksheet: gspread.Worksheet, stop_loss, empty_row, is_order_
     return result
 
 
+@with_priority(PRIORITY_NORMAL)
 def gs_av_update(worksheet: gspread.Worksheet, av_count, empty_row, av_order):
     """
     Обновляет в таблице количество усреднений и цену последнего усреднения.
     """
     logger.info(f"Обновление усреднения {av_count} для строки {empty_row}")
+    _remember(empty_row, {'K': av_count, 'L': av_order})
+    if _write_buffer is not None:
+        _write_buffer.put(worksheet, empty_row, {'K': av_count, 'L': av_order})
+        return True
     requests = [
         {'range': f'K{empty_row}', 'values': [[av_count]]},
         {'range': f'L{empty_row}', 'values': [[av_order]]}
@@ -229,11 +369,16 @@ def gs_av_update(worksheet: gspread.Worksheet, av_count, empty_row, av_order):
         logger.info(f'Успешно обновили данные по усреднению в таблице для строки {empty_row}.')
     return result
 
+@with_priority(PRIORITY_CRITICAL)
 def gs_breakeven_update(worksheet: gspread.Worksheet, empty_row, is_order_exist):
     """
     Обновляет статус сделки на 'закрыто по безубытку'.
     """
     logger.info(f"Обновление статуса на 'безубыток' для строки {empty_row}")
+    _remember(empty_row, {'M': is_order(is_order_exist), 'N': '✅'})
+    if _write_buffer is not None:
+        _write_buffer.put(worksheet, empty_row, {'M': is_order(is_order_exist), 'N': '✅'})
+        return True
     requests = [
         {'range': f'M{empty_row}', 'values': [[is_order(is_order_exist)]]},
         {'range': f'N{empty_row}', 'values': [['✅']]}
@@ -244,11 +389,16 @@ def gs_breakeven_update(worksheet: gspread.Worksheet, empty_row, is_order_exist)
     return result
 
 
+@with_priority(PRIORITY_LOW)
 def gs_5_perc_alert_update(worksheet: gspread.Worksheet, empty_row):
     """
     Отмечает в таблице, что было отправлено уведомление о 5% отклонении цены.
     """
     logger.info(f"Установка флага '5% алерт' для строки {empty_row}")
+    _remember(empty_row, {'Q': '➕'})
+    if _write_buffer is not None:
+        _write_buffer.put(worksheet, empty_row, {'Q': '➕'})
+        return True
     result = _execute_with_retry(worksheet.update, f'Q{empty_row}', [['➕']])
     if result:
         logger.info("Успешно установили флаг '5% алерт'.")
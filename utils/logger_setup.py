@@ -1,17 +1,68 @@
+import threading
+import time
+
 from loguru import logger
-from config import LOG_PONG_MESSAGES
+from config import LOG_COMPRESSION, LOG_PONG_MESSAGES, LOG_RETENTION, LOG_ROTATION, LOG_THROTTLE_SECONDS
 
 # Определяем уровень логирования для файла в зависимости от настройки LOG_PONG_MESSAGES
 file_log_level = "DEBUG" if LOG_PONG_MESSAGES else "INFO"
 
+
+class ThrottleFilter:
+    """
+    Пропускает не больше одного сообщения с одинаковым ключом за interval секунд.
+
+    Ключ задается через logger.bind(throttle=...) (см. throttled()); сообщения без
+    ключа проходят всегда. Первое сообщение после паузы сообщает, сколько похожих
+    было скрыто. Фильтр работает в потоке вызова, до постановки записи в очередь,
+    поэтому скрытые сообщения не форматируются и не пишутся на диск.
+    """
+
+    def __init__(self, interval, clock=time.monotonic):
+        self.interval = interval
+        self._clock = clock
+        self._seen = {}  # { ключ: [время последнего пропущенного, скрыто после него] }
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        key = record["extra"].get("throttle")
+        if key is None or self.interval <= 0:
+            return True
+        now = self._clock()
+        with self._lock:
+            state = self._seen.get(key)
+            if state is not None and now - state[0] < self.interval:
+                state[1] += 1
+                return False
+            suppressed = state[1] if state is not None else 0
+            self._seen[key] = [now, 0]
+        if suppressed:
+            record["message"] += f" (еще {suppressed} похожих скрыто)"
+        return True
+
+
+def throttled(key):
+    """
+    Логгер, повторяющиеся сообщения которого ограничиваются по ключу key.
+    """
+    return logger.bind(throttle=key)
+
+
+throttle_filter = ThrottleFilter(LOG_THROTTLE_SECONDS)
+
+# enqueue=True: запись в файл, ротация и сжатие идут в отдельном потоке,
+# вызов logger.* в потоке цен только ставит запись в очередь
 logger.configure(
     handlers=[
         {
             "sink": "bot.log",
             "format": "{time:YY-MM-DD HH:mm:ss} | {level} | {message}",
             "level": file_log_level,
-            "rotation": "2 MB",
-            "retention": "30 days"
+            "filter": throttle_filter,
+            "enqueue": True,
+            "rotation": LOG_ROTATION,
+            "retention": LOG_RETENTION,
+            "compression": LOG_COMPRESSION or None,
         }
     ]
 )
@@ -0,0 +1,269 @@
+"""
+Реестр метрик в формате Prometheus (text exposition 0.0.4).
+
+Счетчики, показатели и гистограммы хранят значения в обычных атрибутах Python,
+поэтому запись метрики на горячем пути - это одно сложение (для гистограммы -
+еще bisect по границам корзин). Блокировок нет: в редких гонках между потоками
+может потеряться одно приращение, для мониторинга это допустимо.
+Дочерние метрики с метками лучше получить один раз через labels() и хранить.
+"""
+import bisect
+import math
+
+# Границы корзин по умолчанию (секунды): от 1 мс до 30 с
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_value(value):
+    if value != value:
+        return 'NaN'
+    if value == math.inf:
+        return '+Inf'
+    if value == -math.inf:
+        return '-Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+        (registry or REGISTRY).register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, **labels):
+        """
+        Возвращает дочернюю метрику для значений меток (создается при первом обращении).
+        """
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = self._new_child()
+        return child
+
+    def _unlabeled(self):
+        return self._children[()]
+
+    def samples(self):
+        for key, child in list(self._children.items()):
+            yield from child.samples(self.name, self.labelnames, key)
+
+    @property
+    def exposed_name(self):
+        return self.name
+
+    def render(self):
+        name = self.exposed_name
+        lines = [f'# HELP {name} {self.documentation}', f'# TYPE {name} {self.kind}']
+        lines.extend(f'{name}{labels} {_format_value(value)}' for name, labels, value in self.samples())
+        return '\n'.join(lines)
+
+
+class _CounterChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self, name, labelnames, key):
+        yield f'{name}_total', _format_labels(labelnames, key), self.value
+
+
+class Counter(_Metric):
+    """
+    Монотонно растущий счетчик. Имя задается без суффикса _total.
+    """
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    @property
+    def exposed_name(self):
+        return f'{self.name}_total'
+
+    def inc(self, amount=1):
+        self._unlabeled().value += amount
+
+
+class _GaugeChild:
+    __slots__ = ('value', '_function')
+
+    def __init__(self):
+        self.value = 0.0
+        self._function = None
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def set_function(self, function):
+        """
+        Значение будет вычисляться вызовом function() в момент чтения метрик.
+        """
+        self._function = function
+
+    def samples(self, name, labelnames, key):
+        value = self.value
+        if self._function is not None:
+            try:
+                value = self._function()
+            except Exception:
+                value = math.nan
+        yield name, _format_labels(labelnames, key), float(value)
+
+
+class Gauge(_Metric):
+    """
+    Текущее значение, которое может расти и падать.
+    """
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._unlabeled().set(value)
+
+    def inc(self, amount=1):
+        self._unlabeled().inc(amount)
+
+    def dec(self, amount=1):
+        self._unlabeled().dec(amount)
+
+    def set_function(self, function):
+        self._unlabeled().set_function(function)
+
+
+class _HistogramChild:
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labelnames, key):
+        cumulative = 0
+        for bound, count in zip(self.bounds + (math.inf,), self.counts):
+            cumulative += count
+            yield f'{name}_bucket', _format_labels(labelnames, key, ('le', _format_value(bound))), cumulative
+        yield f'{name}_sum', _format_labels(labelnames, key), self.sum
+        yield f'{name}_count', _format_labels(labelnames, key), self.count
+
+
+class Histogram(_Metric):
+    """
+    Распределение значений по корзинам (обычно задержки в секундах).
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(float(bound) for bound in buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._unlabeled().observe(value)
+
+
+class Registry:
+    """
+    Набор метрик, которые отдаются эндпоинтом /metrics.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f'Метрика {metric.name} уже зарегистрирована')
+        self._metrics[metric.name] = metric
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        """
+        Текст для ответа /metrics.
+        """
+        return '\n'.join(metric.render() for metric in self._metrics.values()) + '\n'
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# --- Метрики конвейера ---
+WS_TICKS = Counter('ws_ticks', "Тики, полученные от бирж", ('exchange',))
+WS_RECONNECTS = Counter('ws_reconnects', "Переподключения WebSocket", ('exchange',))
+WS_SUBSCRIBED_COINS = Gauge('ws_subscribed_coins', "Монеты с активной подпиской", ('exchange',))
+WS_CONNECTIONS = Gauge('ws_connections', "Открытые WebSocket-соединения", ('exchange',))
+
+ENGINE_OPEN_POSITIONS = Gauge('engine_open_positions', "Открытые позиции в движке")
+ENGINE_PENDING_SIGNALS = Gauge('engine_pending_signals', "Сигналы, ожидающие первую цену")
+ENGINE_BATCH_SECONDS = Histogram('engine_batch_seconds', "Обработка одной пачки цен монеты движком",
+                                 buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1))
+TICK_TO_ALERT_SECONDS = Histogram('tick_to_alert_seconds',
+                                  "От первого тика пачки до события позиции (TP, усреднение, алерт)")
+
+SIGNAL_INTAKE_DEPTH = Gauge('signal_intake_depth', "Сигналы, ожидающие работы с таблицей и регистрации")
+SIGNAL_INTAKE_DROPPED = Counter('signal_intake_dropped', "Сигналы, отброшенные из-за переполнения очереди")
+
+QUEUE_PUSHED = Counter('telegram_queue_pushed', "Сообщения, поставленные в очередь Telegram")
+QUEUE_FALLBACK = Counter('telegram_queue_fallback', "Сообщения, ушедшие в резервную очередь в памяти")
+QUEUE_DEPTH = Gauge('telegram_queue_depth', "Длина очереди Telegram (Redis + резервная)")
+QUEUE_DEAD_LETTER = Counter('telegram_dead_letter', "Сообщения, отправленные в очередь недоставленных")
+
+TELEGRAM_SENT = Counter('telegram_sent', "Результаты отправки сообщений в Telegram", ('result',))
+TELEGRAM_SEND_SECONDS = Histogram('telegram_send_seconds', "Отправка одного сообщения в Telegram с повторами")
+ALERT_TO_ACK_SECONDS = Histogram('alert_to_ack_seconds', "От постановки алерта в очередь до ответа Telegram",
+                                 buckets=DEFAULT_BUCKETS + (60.0, 120.0, 300.0))
+
+SHEETS_REQUEST_SECONDS = Histogram('sheets_request_seconds', "Один запрос к Google Sheets API", ('operation',))
+SHEETS_ERRORS = Counter('sheets_errors', "Ошибки запросов к Google Sheets API", ('operation',))
+SHEETS_PENDING_CELLS = Gauge('sheets_pending_cells', "Ячейки в буфере отложенной записи")
+SHEETS_SCHEDULER_WAITING = Gauge('sheets_scheduler_waiting', "Запросы к Google Sheets, ожидающие квоты", ('priority',))
+SHEETS_SCHEDULER_WAIT_SECONDS = Histogram('sheets_scheduler_wait_seconds', "Ожидание квоты перед запросом к Google Sheets",
+                                          ('priority',), buckets=DEFAULT_BUCKETS + (60.0, 120.0, 300.0))
+SHEETS_QUOTA_TOKENS = Gauge('sheets_quota_tokens', "Свободные запросы в бакете квоты Google Sheets")
+SHEETS_QUOTA_EXCEEDED = Counter('sheets_quota_exceeded', "Ответы Google Sheets о превышении квоты (429)")
+SHEETS_FLUSH_DEFERRED = Counter('sheets_flush_deferred', "Отправки буфера записи, отложенные из-за нехватки квоты")
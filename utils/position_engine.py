@@ -0,0 +1,782 @@
+"""
+Единый движок отслеживания позиций.
+
+Вместо отдельного потока на каждую сделку все позиции регистрируются в одном движке,
+который работает задачей в event loop бота. Для каждой монеты он хранит отсортированный
+индекс уровней срабатывания (TP, усредняющие ордера, безубыток и отклонение 5%),
+поэтому пачка цен (последняя, максимум, минимум) за O(log n) находит только те позиции,
+чьи уровни были пересечены.
+"""
+import asyncio
+import bisect
+import itertools
+import math
+import time
+from collections import deque
+from functools import partial
+
+try:
+    import numpy as np
+except ImportError:  # numpy необязателен: без него используется TriggerIndex
+    np = None
+
+from bot.config import FEED_MARK_INTERVAL, PRICE_CACHE_FRESH_AGE, PRICE_CACHE_MAX_AGE, TRIGGER_BACKEND
+from .google_sheet import (gs_first_update, gs_tp_update, gs_final_tp_update, gs_av_update,
+                           gs_breakeven_update, gs_5_perc_alert_update)
+from .logger_setup import logger
+from .row_allocator import row_allocator
+from .metrics import ENGINE_BATCH_SECONDS, ENGINE_OPEN_POSITIONS, ENGINE_PENDING_SIGNALS, TICK_TO_ALERT_SECONDS
+from .tg_signal import send_alert, send_av_alert
+from .track_positions import (get_time, get_avg_and_volume, change_volume, get_breakeven,
+                              manage_websocket_connection, release_websocket_connection)
+from .ws_base import PriceSlot
+
+ECOSYSTEM_LINK: str = "🐋 Ecosystem x10: @valcapital"
+ENTRY_VOLUME = 1000
+AV_ORDERS_PERC = [0.1, 0.2, 0.2, 0.4, 0.8]
+MAX_CANDLE_REPEATS = 16  # Предел повторов одной свечи при догоне истории (5 TP + 5 усреднений + алерт)
+PRICE_WAIT_TIMEOUT = 60  # Сколько секунд новый сигнал ждет первую цену (WebSocket или снимок REST)
+# Поля позиции, которые сохраняются в локальное хранилище
+STATE_FIELDS = ('row', 'coin', 'side', 'opened_at', 'entry_price', 'exchange', 'targets', 'id_targets',
+                'total_volume', 'breakeven', 'average_orders_list', 'id_average_orders', 'avg_prices_list',
+                'average_volume_list', 'volumes_list', 'was_3_averaging', 'is_5_perc_alert', 'is_open')
+
+
+class TriggerIndex:
+    """
+    Отсортированный индекс уровней срабатывания всех позиций одной монеты.
+
+    Уровни хранятся в двух списках кортежей (уровень, id позиции):
+    "верхние" срабатывают, когда максимум пачки >= уровня,
+    "нижние" - когда минимум пачки <= уровня.
+    """
+
+    def __init__(self):
+        self._up = []
+        self._down = []
+        self._entries = {}  # { position_id: [(список, кортеж), ...] }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def set(self, position_id, up_levels, down_levels):
+        """
+        Заменяет уровни позиции в индексе.
+
+        Args:
+            position_id (int): Идентификатор позиции.
+            up_levels (list[float]): Уровни, срабатывающие при росте цены.
+            down_levels (list[float]): Уровни, срабатывающие при падении цены.
+        """
+        self.discard(position_id)
+        entries = []
+        for levels, values in ((self._up, up_levels), (self._down, down_levels)):
+            for level in values:
+                entry = (level, position_id)
+                bisect.insort(levels, entry)
+                entries.append((levels, entry))
+        self._entries[position_id] = entries
+
+    def discard(self, position_id):
+        """
+        Удаляет все уровни позиции из индекса.
+        """
+        for levels, entry in self._entries.pop(position_id, ()):
+            i = bisect.bisect_left(levels, entry)
+            if i < len(levels) and levels[i] == entry:
+                del levels[i]
+
+    def crossed(self, high, low):
+        """
+        Находит позиции, чьи уровни пересекла пачка цен.
+
+        Args:
+            high (float): Максимальная цена пачки.
+            low (float): Минимальная цена пачки.
+
+        Returns:
+            set[int]: Идентификаторы затронутых позиций.
+        """
+        fired = set()
+        up_end = bisect.bisect_right(self._up, (high, math.inf))
+        for i in range(up_end):
+            fired.add(self._up[i][1])
+        down_start = bisect.bisect_left(self._down, (low, -math.inf))
+        for i in range(down_start, len(self._down)):
+            fired.add(self._down[i][1])
+        return fired
+
+
+class VectorTriggerIndex:
+    """
+    Индекс уровней срабатывания на массивах NumPy.
+
+    Для каждой позиции хранится ближайший "верхний" уровень (минимум TP/безубытка
+    при росте) и ближайший "нижний" (максимум усреднений/5% при падении): позиция
+    затронута пачкой, если high >= верхнего или low <= нижнего. Пачка проверяется
+    двумя векторными сравнениями по всем позициям монеты без цикла в Python.
+    Интерфейс совпадает с TriggerIndex.
+    """
+
+    def __init__(self, capacity=64):
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._up = np.full(capacity, np.inf)
+        self._down = np.full(capacity, -np.inf)
+        self._rows = {}  # { position_id: индекс в массивах }
+
+    def __len__(self):
+        return len(self._rows)
+
+    def set(self, position_id, up_levels, down_levels):
+        row = self._rows.get(position_id)
+        if row is None:
+            row = len(self._rows)
+            if row == len(self._ids):
+                self._grow()
+            self._rows[position_id] = row
+            self._ids[row] = position_id
+        self._up[row] = min(up_levels, default=np.inf)
+        self._down[row] = max(down_levels, default=-np.inf)
+
+    def discard(self, position_id):
+        row = self._rows.pop(position_id, None)
+        if row is None:
+            return
+        last = len(self._rows)
+        if row != last:
+            # Последняя позиция переезжает на место удаленной, массивы остаются плотными
+            moved_id = int(self._ids[last])
+            self._ids[row] = moved_id
+            self._up[row] = self._up[last]
+            self._down[row] = self._down[last]
+            self._rows[moved_id] = row
+        self._up[last] = np.inf
+        self._down[last] = -np.inf
+
+    def crossed(self, high, low):
+        n = len(self._rows)
+        hits = np.flatnonzero((self._up[:n] <= high) | (self._down[:n] >= low))
+        return set(self._ids[hits].tolist())
+
+    def _grow(self):
+        capacity = len(self._ids) * 2
+        self._ids = np.resize(self._ids, capacity)
+        self._up = np.concatenate((self._up, np.full(capacity - len(self._up), np.inf)))
+        self._down = np.concatenate((self._down, np.full(capacity - len(self._down), -np.inf)))
+
+
+def make_trigger_index(backend=TRIGGER_BACKEND):
+    """
+    Создает индекс уровней выбранной реализации.
+
+    Args:
+        backend (str): 'numpy', 'bisect' или 'auto' (numpy, если он установлен).
+    """
+    if backend == 'numpy' or (backend == 'auto' and np is not None):
+        if np is not None:
+            return VectorTriggerIndex()
+        logger.warning("TRIGGER_BACKEND=numpy, но numpy не установлен. Используется TriggerIndex.")
+    return TriggerIndex()
+
+
+class Position:
+    """
+    Состояние одной сделки и логика реакции на пачку цен.
+    """
+
+    def __init__(self, worksheet, row, coin, side, opened_at, entry_price, targets, exchange):
+        self.worksheet = worksheet
+        self.row = row
+        self.coin = coin
+        self.side = side
+        self.opened_at = opened_at
+        self.entry_price = entry_price
+        self.exchange = exchange
+        self.targets = list(targets)
+        self.id_targets = list(targets)
+        self.total_volume = ENTRY_VOLUME
+        self.breakeven = 0.0
+        self.average_orders_list = []
+        self.id_average_orders = []
+        self.avg_prices_list = []
+        self.average_volume_list = []
+        self.volumes_list = []
+        self.was_3_averaging = False
+        self.is_5_perc_alert = False
+        self.is_open = True
+
+    @classmethod
+    def from_signal(cls, worksheet, signal, price, row, order_number, exchange):
+        """
+        Открывает новую позицию по сигналу из Telegram и записывает ее в таблицу.
+
+        Args:
+            worksheet (gspread.Worksheet): Рабочий лист Google.
+            signal (dict): Разобранный сигнал.
+            price (float): Первая цена из WebSocket, она же цена входа.
+            row (int): Номер строки для сделки.
+            order_number (int): Номер сделки.
+            exchange (str): Название биржи.
+
+        Returns:
+            Position: Новая позиция.
+        """
+        coin = signal['coin'].replace("/", "")
+        targets = [signal[f'tp{i}'] for i in range(1, 6)]
+        opened_at, _ = get_time()
+        position = cls(worksheet, row, coin, signal['side'], opened_at, price, targets, exchange)
+
+        average_price_data = price * ENTRY_VOLUME
+        _, _, position.average_orders_list, position.avg_prices_list, \
+            position.average_volume_list, position.volumes_list = get_avg_and_volume(
+                position.side, price, AV_ORDERS_PERC, position.total_volume, average_price_data, ENTRY_VOLUME)
+        position.id_average_orders = position.average_orders_list.copy()
+        position.breakeven = get_breakeven(position.side, price)
+
+        gs_first_update(worksheet, coin, position.side, opened_at, price, *targets,
+                        position.is_open, row, order_number)
+        return position
+
+    @classmethod
+    def from_sheet_row(cls, worksheet, line, exchange):
+        """
+        Восстанавливает незавершенную сделку из строки таблицы.
+
+        Args:
+            worksheet (gspread.Worksheet): Рабочий лист Google.
+            line (list): Значения строки из get_old_orders(), последний элемент - номер строки.
+            exchange (str): Название биржи.
+
+        Returns:
+            Position: Восстановленная позиция.
+        """
+        entry_price = float(line[4].replace(",", "."))
+        targets = [float(line[i].replace(",", ".")) for i in range(5, 10)]
+        position = cls(worksheet, line[-1], line[1], line[2], line[3], entry_price, targets, exchange)
+        average_orders_number = int(line[10])
+        tp_count = int(line[14])
+        position.is_5_perc_alert = (line[16] == '➕')
+
+        average_price_data = entry_price * ENTRY_VOLUME
+        _, _, position.average_orders_list, position.avg_prices_list, \
+            position.average_volume_list, position.volumes_list = get_avg_and_volume(
+                position.side, entry_price, AV_ORDERS_PERC, position.total_volume, average_price_data, ENTRY_VOLUME)
+        position.id_average_orders = position.average_orders_list.copy()
+        id_avg_prices_list = position.avg_prices_list.copy()
+
+        # Корректировка в зависимости от количества взятых TP и усреднений
+        for _ in range(tp_count):
+            position.targets.pop(0)
+            position.total_volume -= (ENTRY_VOLUME * 0.2)
+        for _ in range(average_orders_number):
+            position.average_orders_list.pop(0)
+            position.avg_prices_list.pop(0)
+
+        position.average_volume_list, position.volumes_list = change_volume(position.total_volume)
+        last_avg_price = id_avg_prices_list[average_orders_number - 1] if average_orders_number > 0 else entry_price
+        position.breakeven = get_breakeven(position.side, last_avg_price)
+        return position
+
+    @classmethod
+    def from_state(cls, worksheet, state):
+        """
+        Восстанавливает позицию из локального хранилища.
+
+        Args:
+            worksheet (gspread.Worksheet | None): Рабочий лист Google (может быть недоступен).
+            state (dict): Состояние из PositionStore.load_open().
+
+        Returns:
+            Position: Восстановленная позиция.
+        """
+        position = cls(worksheet, state['row'], state['coin'], state['side'], state['opened_at'],
+                       state['entry_price'], state['targets'], state['exchange'])
+        for field in STATE_FIELDS:
+            setattr(position, field, state[field])
+        return position
+
+    def to_state(self):
+        """
+        Возвращает полное состояние позиции для сохранения в хранилище.
+        """
+        return {field: getattr(self, field) for field in STATE_FIELDS}
+
+    def trigger_levels(self):
+        """
+        Возвращает активные уровни срабатывания позиции.
+
+        Returns:
+            tuple[list[float], list[float]]: Уровни, срабатывающие при росте и при падении цены.
+        """
+        up, down = [], []
+        is_long = self.side == "LONG"
+        if not self.is_5_perc_alert:
+            (down if is_long else up).append(self.entry_price * (0.95 if is_long else 1.05))
+        if not self.was_3_averaging:
+            (up if is_long else down).extend(self.targets)
+        else:
+            (up if is_long else down).append(self.breakeven)
+        (down if is_long else up).extend(self.average_orders_list)
+        return up, down
+
+    def apply_batch(self, current_price, batch_max, batch_min):
+        """
+        Проверяет пачку цен на срабатывание TP, безубытка, усреднений и 5% отклонения.
+
+        Returns:
+            bool: True, если состояние позиции изменилось.
+        """
+        changed = False
+        side = self.side
+        coin = self.coin
+
+        # Проверка отклонения на 5% для алерта
+        if not self.is_5_perc_alert:
+            # Для LONG критично падение, проверяем по минимуму
+            price_to_check = batch_min if side == 'LONG' else batch_max
+            price_change = (price_to_check - self.entry_price) / self.entry_price
+
+            if (side == 'LONG' and price_change < -0.05) or (side == 'SHORT' and price_change > 0.05):
+                tg_msg = f"💰 <b>#{coin.replace('USDT','/USDT')} [{side}]</b>\n⏰ {self.opened_at} msk\n\n" \
+                         f"❗️ Цена отклонилась на -5%, желательно запросить усреднение.\n" \
+                         f"❗ До усреднения не забудьте отменить первоначальный стоп-лосс.\n\n{ECOSYSTEM_LINK}"
+
+                send_alert(tg_msg)
+                logger.info(tg_msg)
+                self.is_5_perc_alert = True
+                changed = True
+                gs_5_perc_alert_update(self.worksheet, self.row)
+
+        # Проверка тейк-профитов (только если не было 3-х усреднений)
+        if not self.was_3_averaging:
+            for target_price in self.targets:
+                # Для TP в LONG нам важен максимум, в SHORT - минимум
+                if (side == "LONG" and batch_max >= target_price) or (side == "SHORT" and batch_min <= target_price):
+                    tp_id = self.id_targets.index(target_price) + 1
+                    tg_msg = (f"✅ Взяли {tp_id} цель 🔥\n💰 <b>#{coin.replace('USDT','/USDT')} [{side}]</b>"
+                              f"(⏰ {self.opened_at} msk).\n"
+                              f"Цена: {target_price}\n"
+                              f"{ECOSYSTEM_LINK}")
+
+                    send_alert(tg_msg)
+                    logger.info(f'{tg_msg}\nТекущая цена: {current_price} (Max batch: {batch_max}, Min batch: {batch_min})')
+
+                    # Если это последний TP - закрываем сделку
+                    if len(self.targets) == 1:
+                        self.is_open = False
+                        gs_final_tp_update(self.worksheet, tp_id, self.row, self.is_open)
+                        return True
+                    changed = True
+                    self.targets.remove(target_price)
+                    gs_tp_update(self.worksheet, tp_id, self.row)
+                    self.total_volume -= (ENTRY_VOLUME * 0.2)
+                    self.average_volume_list, self.volumes_list = change_volume(self.total_volume)
+                    break
+
+        # Проверка безубытка (только после 3-го усреднения)
+        if self.was_3_averaging:
+            # Безубыток: LONG - high, SHORT - low
+            if (side == "LONG" and batch_max >= self.breakeven) or \
+               (side == "SHORT" and batch_min <= self.breakeven):
+                tg_msg = f"✅ Достигли безубытка 🔥\n[{side}]: {coin} \n(⏰ {self.opened_at} msk).\n\n" \
+                         f"Цена: {self.breakeven}"
+                send_av_alert(tg_msg)
+                logger.info(f'{tg_msg}\nТекущая цена: {current_price}')
+                self.is_open = False
+                gs_breakeven_update(self.worksheet, self.row, self.is_open)
+                return True
+
+        # Проверка усредняющих ордеров
+        for i, av_order in enumerate(self.average_orders_list):
+            # Усреднение: LONG - low (падаем), SHORT - high (растем)
+            if (side == "LONG" and batch_min <= av_order) or (side == "SHORT" and batch_max >= av_order):
+                id_av = self.id_average_orders.index(av_order) + 1
+                self.breakeven = get_breakeven(side, self.avg_prices_list[i])
+                self.total_volume += self.average_volume_list[i]
+                tg_msg = f"✔️ Усреднили позицию - {id_av} ордер\n[{side}]: {coin} " \
+                         f"(⏰ {self.opened_at} msk).\n" \
+                         f"Цена: {av_order}\n" \
+                         f"Средняя цена входа: {self.avg_prices_list[i]}\n" \
+                         f"Цена безубытка: {self.breakeven}"
+                send_av_alert(tg_msg)
+                logger.info(f'{tg_msg}\nТекущая цена: {current_price} (Triggered by spike)')
+
+                self.average_orders_list.pop(i)
+                self.avg_prices_list.pop(i)
+                self.average_volume_list.pop(i)
+                self.volumes_list.pop(i)
+                gs_av_update(self.worksheet, id_av, self.row, av_order)
+                if id_av >= 3:
+                    self.was_3_averaging = True
+                changed = True
+                break
+        return changed
+
+
+class PositionEngine:
+    """
+    Единый движок отслеживания всех открытых позиций.
+
+    Все изменения состояния выполняются в одной задаче event loop, поэтому блокировки не нужны.
+    Цены каждой монеты сворачиваются в свой PriceSlot, команды регистрации позиций
+    складываются в очередь команд; задача движка просыпается по событию и разбирает и то и другое.
+    Запросы к Google таблице уходят в буфер отложенной записи и не блокируют event loop,
+    а полное состояние позиций после каждого события сохраняется в store (PositionStore).
+    """
+
+    def __init__(self, clock=time.time, store=None, subscribe=None, unsubscribe=None,
+                 index_factory=make_trigger_index, allocator=None):
+        """
+        Args:
+            clock (callable): Источник времени (при воспроизведении - время из записи).
+            store (PositionStore, optional): Хранилище состояний позиций.
+            subscribe (callable, optional): subscribe(coin, exchange, slot) подключает монету к
+                потоку цен; по умолчанию manage_websocket_connection.
+            unsubscribe (callable, optional): unsubscribe(coin, exchange, slot) отключает монету,
+                когда по ней не осталось позиций; по умолчанию release_websocket_connection.
+            index_factory (callable): Создает индекс уровней для новой монеты.
+            allocator (RowAllocator, optional): Выдает строку и номер сделки в момент открытия
+                позиции; по умолчанию глобальный row_allocator.
+        """
+        self._clock = clock
+        self.store = store
+        self._subscribe = subscribe
+        self._unsubscribe = unsubscribe
+        self._index_factory = index_factory
+        self._allocator = allocator
+        self._commands = deque()
+        self._dirty = deque()  # Ключи монет, в слоты которых пришли новые цены
+        self._wakeup = asyncio.Event()
+        self._ids = itertools.count(1)
+        self._positions = {}  # { position_id: Position }
+        self._indexes = {}  # { (exchange, coin): TriggerIndex }
+        self._pending = {}  # { (exchange, coin): [(deadline, worksheet, signal), ...] }
+        self._slots = {}  # { (exchange, coin): PriceSlot }
+        self._last_prices = {}  # { (exchange, coin): float }
+        self._batch_started = {}  # { (exchange, coin): perf_counter первого тика пачки }
+        self._seen = {}  # { (exchange, coin): время последней живой пачки }, еще не сохраненное
+        self._seen_saved_at = clock()
+        self.price_cache = None  # PriceCache со снимком цен всех монет (см. use_price_cache)
+
+    @staticmethod
+    def _key(exchange, coin):
+        return exchange.lower(), coin.replace("/", "")
+
+    def register_signal(self, worksheet, signal, exchange='bybit'):
+        """
+        Ставит новый сигнал на отслеживание. Позиция откроется по первой цене из WebSocket,
+        строка и номер сделки выдаются тогда же: сигнал без цены не оставляет пустую строку.
+        """
+        self._commands.append(('signal', worksheet, signal, exchange))
+        self._wakeup.set()
+
+    def register_order(self, worksheet, line, exchange='bybit'):
+        """
+        Ставит на отслеживание незавершенную сделку из таблицы.
+        """
+        self._commands.append(('order', worksheet, line, exchange))
+        self._wakeup.set()
+
+    def register_state(self, worksheet, state):
+        """
+        Ставит на отслеживание позицию из локального хранилища.
+        """
+        self._commands.append(('state', worksheet, state))
+        self._wakeup.set()
+
+    def use_price_cache(self, cache):
+        """
+        Подключает кэш цен: новые сигналы открываются по цене из него, не дожидаясь WebSocket.
+        """
+        self.price_cache = cache
+        cache.add_listener(self._on_prices_refreshed)
+
+    def _on_prices_refreshed(self, exchange):
+        self._commands.append(('prices', exchange))
+        self._wakeup.set()
+
+    def _cached_price(self, key, max_age=PRICE_CACHE_MAX_AGE):
+        if self.price_cache is None:
+            return None
+        return self.price_cache.get(key[0], key[1], max_age)
+
+    def _request_snapshot(self, exchange):
+        if self.price_cache is None:
+            return
+        try:
+            self.price_cache.schedule_refresh(exchange)
+        except RuntimeError:
+            pass  # Нет запущенного event loop: ждем цену из WebSocket
+
+    def open_position_count(self):
+        return len(self._positions)
+
+    def pending_signal_count(self):
+        return sum(len(waiting) for waiting in self._pending.values())
+
+    def add_position(self, position, persist=True):
+        """
+        Добавляет готовую позицию в индекс своей монеты и подписывает монету на цены.
+
+        Args:
+            position (Position): Позиция.
+            persist (bool): Сохранить позицию в хранилище (не нужно, если она из него же и загружена).
+
+        Returns:
+            int: Идентификатор позиции в движке.
+        """
+        key = self._key(position.exchange, position.coin)
+        position_id = next(self._ids)
+        self._positions[position_id] = position
+        self._indexes.setdefault(key, self._index_factory()).set(position_id, *position.trigger_levels())
+        self._ensure_feed(key)
+        if persist:
+            self._persist(position)
+        return position_id
+
+    def restore_with_history(self, worksheet, states, candles, interval=60):
+        """
+        Восстанавливает позиции одной монеты и прогоняет через них пропущенные свечи.
+
+        Позиция попадает в индекс со свечи, внутри которой было ее последнее сохранение
+        (updated_at), поэтому каждая свеча действует только на позиции, которые в тот
+        момент уже были открыты, а вся история проходит через индекс монеты один раз.
+
+        Args:
+            worksheet (gspread.Worksheet | None): Рабочий лист.
+            states (list[dict]): Состояния позиций одной монеты и биржи.
+            candles (list[tuple]): (начало в секундах, high, low, close) по возрастанию времени.
+            interval (float): Длительность свечи в секундах.
+
+        Returns:
+            int: Сколько свечей прогнано.
+        """
+        positions = []
+        for state in states:
+            try:
+                positions.append((state.get('updated_at') or 0.0, Position.from_state(worksheet, state)))
+            except Exception as e:
+                logger.exception(f'Ошибка при восстановлении позиции из хранилища {state}: {e}')
+        positions.sort(key=lambda item: item[0])
+        added = applied = 0
+        for started_at, high, low, close in candles:
+            while added < len(positions) and positions[added][0] < started_at + interval:
+                self.add_position(positions[added][1], persist=False)
+                added += 1
+            if added:
+                # Позиция берет одну цель за пачку; живой поток взял бы остальные следующими
+                # тиками, поэтому свеча повторяется, пока она что-то меняет
+                position = positions[0][1]
+                for _ in range(MAX_CANDLE_REPEATS):
+                    if not self.on_batch(position.exchange, position.coin, close, high, low):
+                        break
+                applied += 1
+        for _, position in positions[added:]:
+            self.add_position(position, persist=False)
+        return applied
+
+    def _persist(self, position):
+        if self.store is None:
+            return
+        try:
+            self.store.save(position.to_state())
+        except Exception as e:
+            logger.exception(f'Ошибка сохранения позиции {position.coin} (строка {position.row}) в хранилище: {e}')
+
+    def on_batch(self, exchange, coin, last, high=None, low=None):
+        """
+        Обрабатывает пачку цен монеты: срабатывают только пересеченные уровни.
+
+        Args:
+            exchange (str): Название биржи.
+            coin (str): Монета, например 'BTCUSDT'.
+            last (float): Последняя цена.
+            high (float, optional): Максимум пачки (по умолчанию last).
+            low (float, optional): Минимум пачки (по умолчанию last).
+
+        Returns:
+            int: Сколько позиций изменили состояние.
+        """
+        started = time.perf_counter()
+        changed = 0
+        key = self._key(exchange, coin)
+        first_tick_at = self._batch_started.pop(key, None)
+        high = last if high is None else high
+        low = last if low is None else low
+        self._last_prices[key] = last
+
+        index = self._indexes.get(key)
+        if index:
+            for position_id in sorted(index.crossed(high, low)):
+                position = self._positions[position_id]
+                try:
+                    if position.apply_batch(last, high, low):
+                        changed += 1
+                        if first_tick_at is not None:
+                            TICK_TO_ALERT_SECONDS.observe(time.perf_counter() - first_tick_at)
+                        self._persist(position)
+                except Exception as e:
+                    logger.exception(f'Ошибка при обработке цены для {position.coin} (строка {position.row}): {e}')
+                if position.is_open:
+                    index.set(position_id, *position.trigger_levels())
+                else:
+                    index.discard(position_id)
+                    del self._positions[position_id]
+
+        # Новые позиции открываются по этой цене и начинают отслеживаться со следующей пачки
+        for _, worksheet, signal in self._pending.pop(key, ()):
+            self._open_signal(worksheet, signal, last, key[0])
+        self._release_idle_feed(key)
+        ENGINE_BATCH_SECONDS.observe(time.perf_counter() - started)
+        return changed
+
+    def _ensure_feed(self, key):
+        if key not in self._slots:
+            self._slots[key] = PriceSlot(on_ready=partial(self._mark_dirty, key))
+            subscribe = self._subscribe or manage_websocket_connection
+            subscribe(key[1], key[0], self._slots[key])
+
+    def _release_idle_feed(self, key):
+        """
+        Отписывает монету от потока цен, если по ней не осталось позиций и ожидающих сигналов.
+        """
+        if self._indexes.get(key) or key in self._pending or key not in self._slots:
+            return
+        slot = self._slots.pop(key)
+        self._indexes.pop(key, None)
+        self._last_prices.pop(key, None)  # Без подписки цена устареет
+        unsubscribe = self._unsubscribe or release_websocket_connection
+        unsubscribe(key[1], key[0], slot)
+        logger.info(f"Позиций по {key[1]} ({key[0]}) не осталось, подписка на цены снята.")
+
+    def _mark_dirty(self, key):
+        self._batch_started[key] = time.perf_counter()
+        self._dirty.append(key)
+        self._wakeup.set()
+
+    def _open_signal(self, worksheet, signal, price, exchange):
+        allocation = (self._allocator or row_allocator).allocate()
+        if allocation is None:
+            logger.error(f'Аллокатор строк не инициализирован, сигнал не отслеживается: {signal}')
+            return
+        row, order_number = allocation
+        try:
+            position = Position.from_signal(worksheet, signal, price, row, order_number, exchange)
+            self.add_position(position)
+        except Exception as e:
+            logger.exception(f'Ошибка при открытии новой позиции {signal}: {e}')
+
+    def _handle_command(self, command):
+        if command[0] == 'signal':
+            _, worksheet, signal, exchange = command
+            logger.info(f'Новый сигнал из ТГ: {signal}')
+            key = self._key(exchange, signal['coin'])
+            price = self._last_prices.get(key)
+            if price is None:
+                # Цена входа определяет всю лестницу усреднений: снимок старше секунды не берем,
+                # а ждем первый тик или новый снимок, смотря что придет раньше
+                price = self._cached_price(key, PRICE_CACHE_FRESH_AGE)
+            if price is not None:
+                self._open_signal(worksheet, signal, price, key[0])
+            else:
+                deadline = self._clock() + PRICE_WAIT_TIMEOUT
+                self._pending.setdefault(key, []).append((deadline, worksheet, signal))
+                self._ensure_feed(key)
+                self._request_snapshot(key[0])
+        elif command[0] == 'order':
+            _, worksheet, line, exchange = command
+            logger.info(f'Загрузка ордера из таблицы: {line}')
+            try:
+                self.add_position(Position.from_sheet_row(worksheet, line, exchange))
+            except Exception as e:
+                logger.exception(f'Ошибка при обработке старого ордера: {e}')
+        elif command[0] == 'prices':
+            # Пришел снимок цен биржи: ожидающие сигналы открываются по нему
+            exchange = command[1]
+            for key in [key for key in self._pending if key[0] == exchange]:
+                price = self._cached_price(key)
+                if price is not None:
+                    for _, worksheet, signal in self._pending.pop(key):
+                        self._open_signal(worksheet, signal, price, exchange)
+                    self._release_idle_feed(key)
+        elif command[0] == 'state':
+            _, worksheet, state = command
+            try:
+                self.add_position(Position.from_state(worksheet, state), persist=False)
+            except Exception as e:
+                logger.exception(f'Ошибка при восстановлении позиции из хранилища {state}: {e}')
+
+    def _expire_pending(self):
+        now = self._clock()
+        for key in list(self._pending):
+            waiting = [item for item in self._pending[key] if item[0] > now]
+            for _ in range(len(self._pending[key]) - len(waiting)):
+                logger.error(f"Не удалось получить начальную цену для {key[1]} ({key[0]}) "
+                             f"за {PRICE_WAIT_TIMEOUT}с. Запись в таблицу невозможна.")
+            if waiting:
+                self._pending[key] = waiting
+            else:
+                del self._pending[key]
+                self._release_idle_feed(key)
+
+    def _drain(self):
+        """
+        Разбирает накопившуюся работу: сначала пачки цен из слотов, затем команды.
+        """
+        while self._dirty:
+            key = self._dirty.popleft()
+            slot = self._slots.get(key)
+            batch = slot.read() if slot is not None else None
+            if batch is not None:
+                last, high, low, _ = batch
+                self.on_batch(key[0], key[1], last, high, low)
+                if self.store is not None:
+                    self._seen[key] = self._clock()
+        while self._commands:
+            self._handle_command(self._commands.popleft())
+
+    def step(self):
+        """
+        Один проход движка: пачки цен, команды и просроченные сигналы.
+        """
+        self._drain()
+        if self._pending:
+            self._expire_pending()
+        if self._seen and self._clock() - self._seen_saved_at >= FEED_MARK_INTERVAL:
+            self.save_seen()
+
+    def save_seen(self):
+        """
+        Сохраняет в хранилище, до какого времени цены монет уже обработаны вживую:
+        после перезапуска догон истории не повторяет эти минуты (см. catch_up).
+        """
+        seen, self._seen = self._seen, {}
+        self._seen_saved_at = self._clock()
+        if not seen or self.store is None:
+            return
+        try:
+            self.store.mark_seen(seen)
+        except Exception as e:
+            logger.exception(f'Ошибка сохранения отметок цен в хранилище: {e}')
+
+    async def run(self):
+        """
+        Основной цикл движка: ждет цены и команды, пачки цен обрабатываются без ожидания таблицы.
+        """
+        logger.info("Движок отслеживания позиций запущен.")
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=1.0)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                self.step()
+            except Exception as e:
+                logger.exception(f'Ошибка в движке отслеживания позиций: {e}')
+
+
+# Глобальный экземпляр движка
+tracking_engine = PositionEngine()
+ENGINE_OPEN_POSITIONS.set_function(tracking_engine.open_position_count)
+ENGINE_PENDING_SIGNALS.set_function(tracking_engine.pending_signal_count)
@@ -0,0 +1,117 @@
+"""
+Локальное хранилище состояния позиций (SQLite в режиме WAL).
+
+Хранилище - источник истины для открытых сделок: движок сохраняет полное
+состояние позиции при каждом событии, а Google таблица обновляется
+асинхронно как проекция. При перезапуске позиции читаются отсюда за
+миллисекунды и без доступа к Google.
+"""
+import json
+import sqlite3
+import threading
+import time
+
+from .logger_setup import logger
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS positions (
+    row INTEGER PRIMARY KEY,
+    exchange TEXT NOT NULL,
+    coin TEXT NOT NULL,
+    is_open INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+# Время последней живой цены, обработанной движком по монете: догон истории начинается с него
+_FEEDS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS feeds (
+    exchange TEXT NOT NULL,
+    coin TEXT NOT NULL,
+    seen_at REAL NOT NULL,
+    PRIMARY KEY (exchange, coin)
+)
+"""
+
+
+class PositionStore:
+    """
+    Транзакционное хранилище состояний позиций, ключ - номер строки в таблице.
+    """
+
+    def __init__(self, path, clock=time.time):
+        self.path = path
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.execute(_FEEDS_SCHEMA)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS positions_open ON positions (is_open)")
+
+    def save(self, state):
+        """
+        Сохраняет состояние позиции одной транзакцией.
+
+        Args:
+            state (dict): Состояние из Position.to_state().
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO positions (row, exchange, coin, is_open, state, updated_at) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(row) DO UPDATE SET exchange=excluded.exchange, coin=excluded.coin, "
+                "is_open=excluded.is_open, state=excluded.state, updated_at=excluded.updated_at",
+                (state['row'], state['exchange'], state['coin'], int(state['is_open']),
+                 json.dumps(state, ensure_ascii=False), self._clock()),
+            )
+
+    def load_open(self):
+        """
+        Читает все открытые позиции.
+
+        Returns:
+            list[dict]: Состояния позиций в порядке строк таблицы.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT state, updated_at FROM positions WHERE is_open = 1 ORDER BY row").fetchall()
+        states = []
+        for raw_state, updated_at in rows:
+            state = json.loads(raw_state)
+            state['updated_at'] = updated_at
+            states.append(state)
+        logger.info(f"Из локального хранилища загружено {len(states)} открытых позиций.")
+        return states
+
+    def mark_seen(self, marks):
+        """
+        Запоминает время последней обработанной цены монет одной транзакцией.
+
+        Args:
+            marks (dict): { (биржа, монета): время в секундах Unix }.
+        """
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO feeds (exchange, coin, seen_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(exchange, coin) DO UPDATE SET seen_at=max(seen_at, excluded.seen_at)",
+                [(exchange, coin, seen_at) for (exchange, coin), seen_at in marks.items()],
+            )
+
+    def load_seen(self):
+        """
+        Returns:
+            dict: { (биржа, монета): время последней обработанной цены }.
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT exchange, coin, seen_at FROM feeds").fetchall()
+        return {(exchange, coin): seen_at for exchange, coin, seen_at in rows}
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM positions").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,151 @@
+"""
+Кэш последних цен всех монет биржи из одного REST-запроса "все тикеры".
+
+Снимок запрашивается при старте бота, после переподключения WebSocket и когда
+новому сигналу не нашлось свежей цены. Если снимку не больше секунды
+(PRICE_CACHE_FRESH_AGE), движок открывает позицию по нему сразу, не дожидаясь
+первого тика после подписки.
+
+HTTP-слой подменяемый: PriceCache принимает функцию get_json(url, params, timeout),
+а базовые адреса REST API берутся из настроек, поэтому в тестах можно поднять
+локальный сервер-заглушку.
+"""
+import asyncio
+import time
+
+import aiohttp
+
+from bot.config import BINGX_REST_URL, BYBIT_REST_URL, PRICE_SNAPSHOT_TIMEOUT
+from .logger_setup import logger
+
+
+def parse_bybit_tickers(payload):
+    """
+    { монета: цена } из ответа Bybit /v5/market/tickers.
+    """
+    return {item['symbol']: float(item['lastPrice'])
+            for item in payload['result']['list'] if item.get('lastPrice')}
+
+
+def parse_bingx_tickers(payload):
+    """
+    { монета: цена } из ответа BingX /openApi/swap/v2/quote/ticker (символы без дефиса).
+    """
+    return {item['symbol'].replace('-', ''): float(item['lastPrice'])
+            for item in payload['data'] if item.get('lastPrice')}
+
+
+# { биржа: (базовый URL, путь, параметры, разбор ответа) }
+SNAPSHOT_ENDPOINTS = {
+    'bybit': (BYBIT_REST_URL, '/v5/market/tickers', {'category': 'linear'}, parse_bybit_tickers),
+    'bingx': (BINGX_REST_URL, '/openApi/swap/v2/quote/ticker', {}, parse_bingx_tickers),
+}
+
+
+async def aiohttp_get_json(url, params, timeout):
+    """
+    HTTP-слой по умолчанию: GET через aiohttp, ответ разбирается как JSON.
+    """
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        async with session.get(url, params=params) as response:
+            response.raise_for_status()
+            return await response.json(content_type=None)
+
+
+class PriceCache:
+    """
+    Последние известные цены монет по биржам с временем получения.
+    """
+
+    def __init__(self, get_json=aiohttp_get_json, endpoints=None, timeout=PRICE_SNAPSHOT_TIMEOUT,
+                 clock=time.monotonic):
+        """
+        Args:
+            get_json (callable): Корутина get_json(url, params, timeout) -> dict.
+            endpoints (dict, optional): Описание запросов снимка по биржам (по умолчанию SNAPSHOT_ENDPOINTS).
+            timeout (float): Таймаут одного запроса в секундах.
+            clock (callable): Источник времени для возраста цен.
+        """
+        self._get_json = get_json
+        self.endpoints = dict(SNAPSHOT_ENDPOINTS if endpoints is None else endpoints)
+        self.timeout = timeout
+        self._clock = clock
+        self._prices = {}  # { (exchange, coin): (цена, время получения) }
+        self._refreshing = {}  # { exchange: asyncio.Task }
+        self._listeners = []
+
+    def __len__(self):
+        return len(self._prices)
+
+    def get(self, exchange, coin, max_age=None):
+        """
+        Цена монеты или None, если ее нет или она старше max_age секунд.
+        """
+        entry = self._prices.get((exchange.lower(), coin))
+        if entry is None or (max_age is not None and self._clock() - entry[1] > max_age):
+            return None
+        return entry[0]
+
+    def update(self, exchange, prices):
+        """
+        Записывает цены { монета: цена } и уведомляет подписчиков.
+        """
+        exchange = exchange.lower()
+        now = self._clock()
+        for coin, price in prices.items():
+            self._prices[(exchange, coin)] = (price, now)
+        for listener in list(self._listeners):
+            listener(exchange)
+
+    def add_listener(self, callback):
+        """
+        callback(exchange) вызывается после каждого обновления цен биржи.
+        """
+        self._listeners.append(callback)
+
+    async def refresh(self, exchange):
+        """
+        Запрашивает снимок всех тикеров биржи.
+
+        Returns:
+            int: Сколько цен получено (0 при ошибке).
+        """
+        base_url, path, params, parse = self.endpoints[exchange]
+        started = time.perf_counter()
+        try:
+            prices = parse(await self._get_json(base_url.rstrip('/') + path, params, self.timeout))
+        except Exception as e:
+            logger.error(f"Не удалось получить снимок цен {exchange}: {e}")
+            return 0
+        self.update(exchange, prices)
+        logger.info(f"Снимок цен {exchange}: {len(prices)} монет за {(time.perf_counter() - started) * 1000:.0f} мс")
+        return len(prices)
+
+    async def refresh_all(self, exchanges=None):
+        """
+        Запрашивает снимки нескольких бирж параллельно.
+
+        Returns:
+            dict: { биржа: число полученных цен }
+        """
+        exchanges = list(self.endpoints) if exchanges is None else list(exchanges)
+        results = await asyncio.gather(*(self.refresh(exchange) for exchange in exchanges))
+        return dict(zip(exchanges, results))
+
+    def schedule_refresh(self, exchange):
+        """
+        Запускает обновление снимка в фоне. Пока запрос идет, повторные вызовы новых не создают.
+
+        Returns:
+            asyncio.Task | None: Задача обновления (None для неизвестной биржи).
+        """
+        if exchange not in self.endpoints:
+            return None
+        task = self._refreshing.get(exchange)
+        if task is None or task.done():
+            task = self._refreshing[exchange] = asyncio.get_running_loop().create_task(self.refresh(exchange))
+        return task
+
+
+# Глобальный кэш цен
+price_cache = PriceCache()
@@ -0,0 +1,138 @@
+"""
+Профилирование работающего бота без перезапуска.
+
+sample_stacks() раз в interval секунд снимает стеки всех потоков через
+sys._current_frames() и считает одинаковые стеки. Результат в формате collapsed
+stacks ("поток;функция (файл:строка);... число") открывается flamegraph.pl,
+speedscope или inferno. Поток event loop подписывается отдельно, поэтому видно,
+какая корутина занимает цикл.
+
+MemoryTracker включает tracemalloc только по запросу и показывает самые крупные
+места выделения памяти и разницу между двумя последними снимками.
+
+Пока профилирование не запущено, модуль ничего не делает и ничего не стоит.
+"""
+import collections
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+EVENT_LOOP_THREAD = 'event-loop'
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})'
+
+
+def _collapse(frame):
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ';'.join(labels)
+
+
+def sample_stacks(duration, interval=0.005, loop_thread_id=None, clock=time.monotonic, sleep=time.sleep):
+    """
+    Снимает стеки всех потоков в течение duration секунд.
+
+    Args:
+        duration (float): Длительность замера в секундах.
+        interval (float): Пауза между выборками.
+        loop_thread_id (int, optional): Идентификатор потока event loop, его стеки
+            помечаются как 'event-loop'.
+
+    Returns:
+        tuple[collections.Counter, int]: Число попаданий каждого свернутого стека и число выборок.
+    """
+    own_id = threading.get_ident()
+    counts = collections.Counter()
+    samples = 0
+    deadline = clock() + duration
+    while True:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            name = EVENT_LOOP_THREAD if thread_id == loop_thread_id else names.get(thread_id, str(thread_id))
+            counts[f'{name};{_collapse(frame)}'] += 1
+        samples += 1
+        if clock() >= deadline:
+            break
+        sleep(interval)
+    return counts, samples
+
+
+def render_collapsed(counts):
+    """
+    Текст в формате collapsed stacks: по строке на стек, самые частые сверху.
+    """
+    return ''.join(f'{stack} {count}\n' for stack, count in counts.most_common())
+
+
+class MemoryTracker:
+    """
+    Снимки tracemalloc по запросу: топ мест выделения и разница со следующим снимком.
+    """
+
+    def __init__(self):
+        self._previous = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return tracemalloc.is_tracing()
+
+    def start(self, frames=25):
+        """
+        Включает tracemalloc (трассировка замедляет каждое выделение памяти, не забудьте stop()).
+        """
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+                self._previous = None
+
+    def stop(self):
+        with self._lock:
+            tracemalloc.stop()
+            self._previous = None
+
+    def snapshot(self, limit=20, key_type='lineno'):
+        """
+        Делает снимок и сравнивает его с предыдущим.
+
+        Args:
+            limit (int): Сколько мест выделения вернуть.
+            key_type (str): Группировка tracemalloc: 'lineno', 'filename' или 'traceback'.
+
+        Returns:
+            dict: Занято/пик в байтах, топ мест выделения и разница с прошлым снимком
+                (diff - None для первого снимка).
+
+        Raises:
+            RuntimeError: Если tracemalloc не запущен.
+        """
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                raise RuntimeError("tracemalloc не запущен")
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            ))
+            current, peak = tracemalloc.get_traced_memory()
+            top = [{'where': str(stat.traceback), 'size': stat.size, 'count': stat.count}
+                   for stat in snapshot.statistics(key_type)[:limit]]
+            diff = None
+            if self._previous is not None:
+                diff = [{'where': str(stat.traceback), 'size_diff': stat.size_diff, 'size': stat.size,
+                         'count_diff': stat.count_diff}
+                        for stat in snapshot.compare_to(self._previous, key_type)[:limit]]
+            self._previous = snapshot
+            return {'traced_bytes': current, 'peak_bytes': peak, 'top': top, 'diff': diff}
+
+
+memory_tracker = MemoryTracker()
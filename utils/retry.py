@@ -1,24 +1,133 @@
 import asyncio
 import logging
+import random
+import time
 from collections.abc import Awaitable, Callable
 from typing import TypeVar
 
 T = TypeVar("T")
 
 
+class CircuitBreaker:
+    """Stop calling a service after `failure_threshold` consecutive outages.
+
+    While open, callers wait instead of hammering the service. After
+    `reset_timeout` seconds one probe call is let through (half-open): its
+    success closes the breaker, its failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def acquire(self) -> float:
+        """Return 0 if a call may proceed, otherwise seconds to wait before asking again."""
+        if self.state == self.CLOSED:
+            return 0.0
+        if self.state == self.OPEN:
+            remaining = self._opened_at + self.reset_timeout - self._clock()
+            if remaining > 0:
+                return remaining
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        if self._probe_in_flight:
+            return min(1.0, self.reset_timeout)
+        self._probe_in_flight = True
+        return 0.0
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self._failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logging.warning("Circuit breaker opened after %s failures", self._failures)
+            self.state = self.OPEN
+            self._opened_at = self._clock()
+
+
 async def async_retry(
     func: Callable[[], Awaitable[T]],
     retries: int = 5,
     base_delay: float = 1.0,
+    max_delay: float | None = None,
+    jitter: float = 0.0,
+    retry_after: Callable[[Exception], float | None] | None = None,
+    is_permanent: Callable[[Exception], bool] | None = None,
+    breaker: CircuitBreaker | None = None,
 ) -> T:
+    """Call `func` until it succeeds or `retries` attempts fail.
+
+    - `is_permanent(exc)` -> True re-raises `exc` at once, without retrying.
+    - `retry_after(exc)` returning a delay makes the next attempt wait exactly
+      that long (server-provided, e.g. Telegram flood control) instead of backoff.
+    - Otherwise the delay is `base_delay * 2**attempt`, capped by `max_delay`,
+      plus up to `jitter * delay` of random spread.
+    - With a `breaker`, calls wait while it is open (this does not use up
+      attempts) and outages are reported to it.
+    """
     last_error: Exception | None = None
-    for attempt in range(retries):
+    attempt = 0
+    while attempt < retries:
+        if breaker is not None:
+            wait = breaker.acquire()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+
         try:
-            return await func()
+            result = await func()
         except Exception as exc:  # noqa: BLE001
+            if is_permanent is not None and is_permanent(exc):
+                if breaker is not None:
+                    # The service answered, so it is up.
+                    breaker.record_success()
+                raise
+
             last_error = exc
-            delay = base_delay * (2**attempt)
-            logging.warning("Retry %s/%s failed: %s", attempt + 1, retries, exc)
+            server_delay = retry_after(exc) if retry_after is not None else None
+            if breaker is not None:
+                if server_delay is None:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+
+            attempt += 1
+            logging.warning("Retry %s/%s failed: %s", attempt, retries, exc)
+            if attempt >= retries:
+                break
+
+            if server_delay is not None:
+                delay = server_delay
+            else:
+                delay = base_delay * (2 ** (attempt - 1))
+                if max_delay is not None:
+                    delay = min(delay, max_delay)
+                if jitter:
+                    delay += random.uniform(0, jitter * delay)
             await asyncio.sleep(delay)
+            continue
+
+        if breaker is not None:
+            breaker.record_success()
+        return result
 
     raise RuntimeError("Max retries exceeded") from last_error
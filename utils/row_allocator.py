@@ -0,0 +1,76 @@
+"""
+Локальная выдача номеров строк и номеров сделок для новых сигналов.
+
+Счетчики берутся из столбца A зеркала листа (seed_rows в bot/main.py) при старте,
+а дальше аллокатор выдает пары (строка, номер сделки) из памяти за O(1) под
+блокировкой, поэтому два близких по времени сигнала никогда не получат одну
+строку. Сверка с таблицей идет по расписанию (resync_rows) и никогда не сдвигает
+счетчики назад: если лист дописали вручную, счетчики перепрыгивают занятые строки.
+"""
+import threading
+
+from .logger_setup import logger
+
+
+def next_order_number(col_a):
+    """
+    Определяет следующий номер сделки по значениям столбца A.
+
+    Args:
+        col_a (list[str]): Значения столбца A (первая строка - заголовок).
+
+    Returns:
+        int: Номер для следующей сделки.
+    """
+    for value in reversed(col_a[1:]):
+        if value and value.isdigit():
+            return int(value) + 1
+    return 1
+
+
+class RowAllocator:
+    """
+    Потокобезопасный счетчик свободных строк и номеров сделок.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._next_row = None
+        self._next_order = None
+
+    @property
+    def is_seeded(self):
+        return self._next_row is not None
+
+    def update_from_column(self, col_a):
+        """
+        Сдвигает счетчики вперед по уже прочитанному столбцу A.
+        """
+        sheet_row = len(col_a) + 1
+        sheet_order = next_order_number(col_a)
+        with self._lock:
+            if self._next_row is not None and (sheet_row > self._next_row or sheet_order > self._next_order):
+                logger.warning(f"Таблица изменена извне: строка {self._next_row} -> {sheet_row}, "
+                               f"номер {self._next_order} -> {sheet_order}")
+            self._next_row = max(sheet_row, self._next_row or 0)
+            self._next_order = max(sheet_order, self._next_order or 0)
+            logger.info(f"Аллокатор строк: следующая строка {self._next_row}, следующий номер {self._next_order}")
+
+    def allocate(self):
+        """
+        Выдает номер строки и номер сделки для нового сигнала.
+
+        Returns:
+            tuple[int, int] | None: (строка, номер сделки) или None, если аллокатор не инициализирован.
+        """
+        with self._lock:
+            if self._next_row is None:
+                return None
+            allocation = (self._next_row, self._next_order)
+            self._next_row += 1
+            self._next_order += 1
+            return allocation
+
+
+# Глобальный экземпляр аллокатора
+row_allocator = RowAllocator()
@@ -0,0 +1,171 @@
+"""
+Копия листа Google таблицы в памяти.
+
+Зеркало загружается одним чтением всего листа, а дальше обновляется нашими же
+записями (функции gs_* сообщают ему ячейки до отправки в API) и периодическим
+чтением "хвоста" - строк ниже последней известной, куда могли дописать извне.
+Изредка лист перечитывается целиком, чтобы подхватить ручные правки.
+
+Проверки, для которых раньше читались ячейки перед записью (текущий TP в столбце O,
+номер сделки в столбце A), отвечаются из памяти без запросов к API.
+"""
+import threading
+
+from .google_sheet import _execute_with_retry
+from .logger_setup import logger
+from .sheet_writer import column_index
+
+
+class SheetMirror:
+    """
+    Значения ячеек листа по строкам. Потокобезопасно.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows = {}  # { номер строки: [значения столбцов A, B, ...] }
+        self._writes = {}  # { (строка, индекс столбца): (номер записи, значение) }
+        self._seq = 0
+        self.loaded = False
+
+    @property
+    def last_row(self):
+        """
+        Номер последней непустой строки (0 для пустого листа).
+        """
+        with self._lock:
+            return max((row for row, values in self._rows.items() if any(values)), default=0)
+
+    def get(self, row, col):
+        """
+        Значение ячейки ('' для пустой) или None, если зеркало еще не загружено.
+        """
+        if not self.loaded:
+            return None
+        index = column_index(col) - 1
+        with self._lock:
+            values = self._rows.get(row, ())
+            return values[index] if index < len(values) else ''
+
+    def column(self, col):
+        """
+        Значения столбца сверху вниз до последней непустой ячейки, как col_values().
+        """
+        index = column_index(col) - 1
+        with self._lock:
+            cells = {row: values[index] for row, values in self._rows.items()
+                     if index < len(values) and values[index]}
+        if not cells:
+            return []
+        return [cells.get(row, '') for row in range(1, max(cells) + 1)]
+
+    def values(self):
+        """
+        Копия всех строк листа, как get_all_values().
+        """
+        with self._lock:
+            last = max((row for row, values in self._rows.items() if any(values)), default=0)
+            return [list(self._rows.get(row, ())) for row in range(1, last + 1)]
+
+    def mark(self):
+        """
+        Отметка перед чтением из API: записи, сделанные после нее, переживут load().
+        """
+        with self._lock:
+            return self._seq
+
+    def apply(self, row, cells):
+        """
+        Запоминает ячейки, которые мы записываем в таблицу.
+
+        Args:
+            row (int): Номер строки.
+            cells (dict): { буква столбца: значение }.
+        """
+        with self._lock:
+            self._seq += 1
+            for col, value in cells.items():
+                index = column_index(col) - 1
+                self._set(row, index, value)
+                self._writes[(row, index)] = (self._seq, value)
+
+    def load(self, values, start_row=1, since=None):
+        """
+        Заменяет строки начиная со start_row прочитанными из таблицы.
+
+        Записи, сделанные после отметки since, накладываются поверх прочитанного:
+        чтение могло начаться раньше, чем они дошли до таблицы.
+
+        Args:
+            values (list[list]): Строки, как их вернул API (хвостовые пустые опущены).
+            start_row (int): Номер строки, с которой начинается values.
+            since (int, optional): Результат mark(), полученный до чтения.
+        """
+        with self._lock:
+            for row in [row for row in self._rows if row >= start_row]:
+                del self._rows[row]
+            for row, line in enumerate(values, start=start_row):
+                if line:
+                    self._rows[row] = ['' if value is None else str(value) for value in line]
+            if since is not None:
+                for (row, index), (seq, value) in list(self._writes.items()):
+                    if seq > since:
+                        if row >= start_row:
+                            self._set(row, index, value)
+                    elif row >= start_row:
+                        del self._writes[(row, index)]
+            self.loaded = True
+
+    def _set(self, row, index, value):
+        values = self._rows.setdefault(row, [])
+        if index >= len(values):
+            values.extend([''] * (index + 1 - len(values)))
+        values[index] = '' if value is None else str(value)
+
+    def _tail_range(self, full):
+        if full or not self.loaded:
+            return 1, None
+        start_row = self.last_row + 1
+        return start_row, f'A{start_row}:ZZ'
+
+    def refresh(self, worksheet, full=False):
+        """
+        Подтягивает изменения таблицы через gspread: весь лист при full
+        (или первой загрузке), иначе только строки ниже последней известной.
+
+        Returns:
+            bool: True, если таблицу удалось прочитать.
+        """
+        start_row, tail = self._tail_range(full)
+        since = self.mark()
+        if tail is None:
+            values = _execute_with_retry(worksheet.get_all_values)
+        else:
+            values = _execute_with_retry(worksheet.get, tail)
+        return self._loaded(values, start_row, since)
+
+    async def refresh_async(self, client, full=False):
+        """
+        То же, что refresh(), через AsyncSheetsClient.
+        """
+        start_row, tail = self._tail_range(full)
+        since = self.mark()
+        if tail is None:
+            values = await client.get_all_values()
+        else:
+            values = await client.get_values(tail)
+        return self._loaded(values, start_row, since)
+
+    def _loaded(self, values, start_row, since):
+        if values is None:
+            return False
+        self.load(list(values), start_row, since)
+        if start_row == 1:
+            logger.info(f"Зеркало таблицы загружено: {len(values)} строк")
+        elif values:
+            logger.info(f"В таблицу дописаны строки {start_row}-{start_row + len(values) - 1}, зеркало обновлено")
+        return True
+
+
+# Глобальное зеркало рабочего листа
+sheet_mirror = SheetMirror()
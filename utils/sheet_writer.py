@@ -0,0 +1,296 @@
+"""
+Буфер отложенной записи в Google таблицу (write-behind).
+
+Обновления ячеек складываются в буфер и сливаются по строкам: повторная запись
+в ту же ячейку заменяет предыдущее значение. Фоновый поток отправляет накопленное
+одним batch_update раз в flush_interval секунд или сразу, когда буфер достигает
+max_cells ячеек. Отслеживание позиций никогда не ждет ответа Google API.
+
+С асинхронным клиентом (AsyncSheetsClient) вместо потока работает задача
+event loop: start_async() / stop_async(), batch_update клиента - корутина.
+
+С планировщиком квоты (scheduler) буфер помнит старший приоритет накопленных
+ячеек и, пока квоты для него нет, откладывает отправку: ячейки продолжают
+сливаться и уходят позже одним запросом, а не теряются после повторов.
+"""
+import asyncio
+import threading
+
+from .google_sheet import _execute_with_retry
+from .logger_setup import logger
+from .metrics import SHEETS_FLUSH_DEFERRED
+from .sheets_scheduler import PRIORITY_NAMES, PRIORITY_NORMAL, current_priority, scheduling_priority
+
+
+def column_index(letter):
+    """
+    Переводит букву столбца в номер (A -> 1, Q -> 17, AA -> 27).
+    """
+    index = 0
+    for char in letter:
+        index = index * 26 + (ord(char.upper()) - 64)
+    return index
+
+
+def column_letter(index):
+    """
+    Переводит номер столбца в букву (1 -> A, 27 -> AA).
+    """
+    letters = ''
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def build_requests(rows):
+    """
+    Собирает запросы batch_update: соседние ячейки строки объединяются в один диапазон.
+
+    Args:
+        rows (dict): { номер строки: { 'O': значение, ... } }.
+
+    Returns:
+        list[dict]: Запросы вида {'range': 'K5:L5', 'values': [[...]]}.
+    """
+    requests = []
+    for row in sorted(rows):
+        columns = sorted((column_index(col), value) for col, value in rows[row].items())
+        start, values = None, []
+        for i, (col, value) in enumerate(columns):
+            if start is None:
+                start, values = col, [value]
+            else:
+                values.append(value)
+            if i + 1 == len(columns) or columns[i + 1][0] != col + 1:
+                cell_range = f'{column_letter(start)}{row}'
+                if col != start:
+                    cell_range += f':{column_letter(col)}{row}'
+                requests.append({'range': cell_range, 'values': [values]})
+                start = None
+    return requests
+
+
+class SheetWriteBuffer:
+    """
+    Копит обновления ячеек и отправляет их пачками из фонового потока.
+    """
+
+    def __init__(self, flush_interval=0.5, max_cells=200, execute=_execute_with_retry):
+        """
+        Args:
+            flush_interval (float): Период отправки буфера в секундах.
+            max_cells (int): Размер буфера, при котором отправка происходит сразу.
+            execute (callable): Функция выполнения запроса с повторами,
+                вызывается как execute(worksheet.batch_update, requests).
+        """
+        self._execute = execute
+        self.worksheet = None  # Лист по умолчанию для обновлений, поставленных без листа
+        self.scheduler = None  # SheetsScheduler: отправка ждет квоты для старшего приоритета в буфере
+        self.flush_interval = flush_interval
+        self.max_cells = max_cells
+        self._pending = {}  # { worksheet: { row: { 'O': value } } }
+        self._priorities = {}  # { worksheet: старший (наименьший) приоритет накопленных ячеек }
+        self._cells = 0
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+        self._task = None
+        self._loop = None
+        self._wakeup = None
+
+    def __len__(self):
+        return self._cells
+
+    def put(self, worksheet, row, cells, priority=None):
+        """
+        Добавляет обновления ячеек строки в буфер. Не блокирует вызывающий код.
+
+        Args:
+            worksheet (gspread.Worksheet): Рабочий лист.
+            row (int): Номер строки.
+            cells (dict): { буква столбца: значение }.
+            priority (int, optional): Класс приоритета (по умолчанию - текущий, см. sheets_scheduler).
+        """
+        if priority is None:
+            priority = current_priority()
+        with self._condition:
+            self._priorities[worksheet] = min(priority, self._priorities.get(worksheet, priority))
+            pending_row = self._pending.setdefault(worksheet, {}).setdefault(row, {})
+            before = len(pending_row)
+            pending_row.update(cells)
+            self._cells += len(pending_row) - before
+            if self._cells >= self.max_cells:
+                self._condition.notify()
+                if self._loop is not None:
+                    self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def pending_priority(self):
+        """
+        Старший приоритет среди накопленных ячеек или None для пустого буфера.
+        """
+        with self._condition:
+            return min(self._priorities.values(), default=None)
+
+    def _should_defer(self):
+        """
+        True, если квоты для накопленного сейчас нет и отправку лучше отложить.
+        """
+        if self.scheduler is None or not self._cells:
+            return False
+        priority = self.pending_priority()
+        if priority is None or self.scheduler.wait_time(priority) <= 0:
+            return False
+        SHEETS_FLUSH_DEFERRED.inc()
+        logger.debug(f"Мало квоты Google Sheets, отправка {self._cells} ячеек ({PRIORITY_NAMES[priority]}) отложена")
+        return True
+
+    def flush(self):
+        """
+        Отправляет все накопленные обновления. Для каждого листа - один batch_update.
+
+        Returns:
+            int: Количество отправленных запросов batch_update.
+        """
+        calls = 0
+        for worksheet, rows, requests, priority in self._take_batches():
+            with scheduling_priority(priority):
+                result = self._execute(worksheet.batch_update, requests)
+            calls += 1
+            self._check_result(result, worksheet, rows, requests, priority)
+        return calls
+
+    async def flush_async(self):
+        """
+        То же, что flush(), для листов с асинхронным batch_update (AsyncSheetsClient).
+        """
+        calls = 0
+        for worksheet, rows, requests, priority in self._take_batches():
+            try:
+                with scheduling_priority(priority):
+                    result = await worksheet.batch_update(requests)
+            except Exception as e:
+                logger.exception(f'Ошибка при отправке буфера в Google таблицу: {e}')
+                result = None
+            calls += 1
+            self._check_result(result, worksheet, rows, requests, priority)
+        return calls
+
+    def _take_batches(self):
+        """
+        Забирает накопленное из буфера: [(лист, строки, запросы batch_update, приоритет)].
+        """
+        with self._condition:
+            pending, self._pending = self._pending, {}
+            priorities, self._priorities = self._priorities, {}
+            self._cells = 0
+
+        batches = []
+        for worksheet, rows in pending.items():
+            priority = priorities.get(worksheet, PRIORITY_NORMAL)
+            if worksheet is None:
+                worksheet = self.worksheet
+            if worksheet is None:
+                # Таблица пока недоступна: держим обновления, пока лист не будет подключен
+                self._requeue(None, rows, priority)
+                continue
+            requests = build_requests(rows)
+            logger.info(f"Отправка в таблицу {len(requests)} диапазонов для {len(rows)} строк одним запросом")
+            batches.append((worksheet, rows, requests, priority))
+        return batches
+
+    def _check_result(self, result, worksheet, rows, requests, priority):
+        if result is None:
+            logger.warning(f"Не удалось записать {len(requests)} диапазонов, повторим при следующей отправке.")
+            self._requeue(worksheet, rows, priority)
+
+    def _requeue(self, worksheet, rows, priority=PRIORITY_NORMAL):
+        """
+        Возвращает неотправленные ячейки в буфер, не затирая более свежие значения.
+        """
+        with self._condition:
+            self._priorities[worksheet] = min(priority, self._priorities.get(worksheet, priority))
+            pending_rows = self._pending.setdefault(worksheet, {})
+            for row, cells in rows.items():
+                pending_row = pending_rows.setdefault(row, {})
+                for col, value in cells.items():
+                    if col not in pending_row:
+                        pending_row[col] = value
+                        self._cells += 1
+
+    def start(self):
+        """
+        Запускает фоновый поток отправки (повторный вызов ничего не делает).
+        """
+        with self._condition:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="sheet-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """
+        Останавливает фоновый поток и отправляет остаток буфера.
+        """
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def _run(self):
+        deferred = False
+        while True:
+            with self._condition:
+                if self._running and (deferred or self._cells < self.max_cells):
+                    self._condition.wait(self.flush_interval)
+                if not self._running:
+                    return
+            try:
+                deferred = self._should_defer()
+                if self._cells and not deferred:
+                    self.flush()
+            except Exception as e:
+                logger.exception(f'Ошибка при отправке буфера в Google таблицу: {e}')
+
+    def start_async(self):
+        """
+        Запускает отправку задачей текущего event loop (для AsyncSheetsClient).
+        """
+        if self._task is not None and not self._task.done():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = self._loop.create_task(self._run_async())
+
+    async def stop_async(self):
+        """
+        Останавливает задачу отправки и отправляет остаток буфера.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._loop = None
+        await self.flush_async()
+
+    async def _run_async(self):
+        deferred = False
+        while True:
+            if deferred or self._cells < self.max_cells:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._wakeup.clear()
+            try:
+                deferred = self._should_defer()
+                if self._cells and not deferred:
+                    await self.flush_async()
+            except Exception as e:
+                logger.exception(f'Ошибка при отправке буфера в Google таблицу: {e}')
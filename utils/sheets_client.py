@@ -0,0 +1,479 @@
+"""
+Асинхронный клиент Google Sheets API v4.
+
+В отличие от gspread, клиент не занимает поток на каждый запрос: все операции -
+корутины поверх одной aiohttp-сессии с пулом keep-alive соединений, поэтому
+несколько обращений к таблице могут выполняться одновременно в event loop.
+Токен сервисного аккаунта кэшируется и обновляется заранее, до истечения срока.
+Повторы при ошибках - через async_retry с экспоненциальной задержкой (и Retry-After,
+если Google его прислал) вместо time.sleep.
+
+Базовые адреса API и выдачи токенов берутся из настроек, поэтому в тестах
+и бенчмарках клиент можно направить на локальный сервер-заглушку.
+"""
+import asyncio
+import json
+import re
+import time
+from urllib.parse import quote
+
+import aiohttp
+from yarl import URL
+
+from bot.config import GS_MAX_CONNECTIONS, GS_REQUEST_TIMEOUT, GS_TOKEN_URL, SHEETS_BASE_URL
+from .google_sheet import (JS_FILE, LIST_NUMBER, ROW_COLUMNS, SHEET_URL, _mirrored, _mirrored_column, _remember,
+                           first_row_data, is_order, select_live_trades)
+from .logger_setup import logger
+from .metrics import SHEETS_ERRORS, SHEETS_REQUEST_SECONDS
+from .retry import async_retry
+from .sheet_writer import column_letter
+from .sheets_scheduler import PRIORITY_CRITICAL, PRIORITY_LOW, PRIORITY_NORMAL, is_quota_error, with_priority
+from .tg_signal import send_tech_alert
+
+SCOPES = ('https://www.googleapis.com/auth/spreadsheets',)
+TOKEN_LIFETIME = 3600  # Срок жизни токена, который запрашиваем у Google (секунды)
+
+
+class SheetsAPIError(Exception):
+    """
+    Ответ Google API с кодом ошибки.
+    """
+
+    def __init__(self, status, message, retry_after=None):
+        super().__init__(f'{status}: {message}')
+        self.status = status
+        self.retry_after = retry_after
+
+
+def _is_permanent(exc):
+    # Ошибки запроса (неверный диапазон, нет доступа) повторять бесполезно.
+    # 401 - протухший токен, его обновим; 408 и 429 - временные.
+    return isinstance(exc, SheetsAPIError) and 400 <= exc.status < 500 and exc.status not in (401, 408, 429)
+
+
+def _retry_after(exc):
+    return exc.retry_after if isinstance(exc, SheetsAPIError) else None
+
+
+def spreadsheet_id_from_url(url):
+    """
+    Извлекает ID таблицы из ее URL (.../spreadsheets/d/<id>/edit).
+    """
+    match = re.search(r'/spreadsheets/d/([a-zA-Z0-9-_]+)', url)
+    if match is None:
+        raise ValueError(f'Не удалось найти ID таблицы в URL: {url}')
+    return match.group(1)
+
+
+async def _raise_for_status(response):
+    if response.status < 400:
+        return
+    try:
+        payload = await response.json(content_type=None)
+        message = payload.get('error', payload)
+    except (ValueError, aiohttp.ContentTypeError, AttributeError):
+        message = await response.text()
+    retry_after = response.headers.get('Retry-After')
+    raise SheetsAPIError(response.status, message,
+                         float(retry_after) if retry_after and retry_after.isdigit() else None)
+
+
+class StaticToken:
+    """
+    Заранее известный токен (локальная заглушка API, отладка).
+    """
+
+    def __init__(self, token):
+        self.token = token
+
+    async def __call__(self, session):
+        return self.token
+
+    def invalidate(self):
+        pass
+
+
+class ServiceAccountToken:
+    """
+    OAuth-токен сервисного аккаунта (JWT bearer grant) с кэшированием.
+
+    Токен обновляется за refresh_margin секунд до истечения срока; одновременные
+    запросы в этот момент ждут одно общее обновление.
+    """
+
+    def __init__(self, info, token_url=None, scopes=SCOPES, refresh_margin=300.0, clock=time.time):
+        """
+        Args:
+            info (dict): Содержимое JSON-ключа сервисного аккаунта.
+            token_url (str, optional): Адрес выдачи токенов (по умолчанию token_uri из ключа).
+            scopes (tuple[str]): Запрашиваемые области доступа.
+            refresh_margin (float): За сколько секунд до истечения токен обновляется.
+            clock (callable): Источник времени (секунды Unix).
+        """
+        from google.auth import crypt
+
+        self._signer = crypt.RSASigner.from_service_account_info(info)
+        self.email = info['client_email']
+        self.token_url = token_url or info['token_uri']
+        self.scopes = tuple(scopes)
+        self.refresh_margin = refresh_margin
+        self._clock = clock
+        self._token = None
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def from_file(cls, filename, **kwargs):
+        with open(filename, encoding='utf-8') as f:
+            return cls(json.load(f), **kwargs)
+
+    def _is_fresh(self):
+        return self._token is not None and self._clock() < self._expires_at - self.refresh_margin
+
+    def invalidate(self):
+        """
+        Забывает токен (например, после ответа 401): следующий запрос получит новый.
+        """
+        self._token = None
+
+    async def __call__(self, session):
+        if self._is_fresh():
+            return self._token
+        async with self._lock:
+            if self._is_fresh():
+                return self._token
+            from google.auth import jwt
+
+            now = int(self._clock())
+            assertion = jwt.encode(self._signer, {
+                'iss': self.email,
+                'scope': ' '.join(self.scopes),
+                'aud': self.token_url,
+                'iat': now,
+                'exp': now + TOKEN_LIFETIME,
+            })
+            data = {'grant_type': 'urn:ietf:params:oauth:grant-type:jwt-bearer', 'assertion': assertion.decode()}
+            async with session.post(self.token_url, data=data) as response:
+                await _raise_for_status(response)
+                payload = await response.json(content_type=None)
+            self._token = payload['access_token']
+            self._expires_at = now + float(payload.get('expires_in', TOKEN_LIFETIME))
+            logger.debug(f'Получен токен Google API, действует {payload.get("expires_in", TOKEN_LIFETIME)} с')
+            return self._token
+
+
+class AsyncSheetsClient:
+    """
+    Один лист Google таблицы поверх Sheets API v4.
+
+    Методы чтения и записи повторяют gspread (col_values, get_all_values, acell,
+    update, batch_update), но являются корутинами. Как и _execute_with_retry,
+    после исчерпания повторов они возвращают None и отправляют техалерт.
+    """
+
+    def __init__(self, spreadsheet_id, token_source, sheet_index=0, base_url=SHEETS_BASE_URL,
+                 max_connections=GS_MAX_CONNECTIONS, timeout=GS_REQUEST_TIMEOUT,
+                 retries=5, base_delay=1.0, max_delay=30.0, scheduler=None):
+        """
+        Args:
+            spreadsheet_id (str): ID таблицы.
+            token_source (callable): Корутина token_source(session) -> токен доступа,
+                с методом invalidate() (ServiceAccountToken или StaticToken).
+            sheet_index (int): Номер листа (с 0), как G_LIST.
+            base_url (str): Адрес Sheets API (локальная заглушка в тестах).
+            max_connections (int): Размер пула соединений.
+            timeout (float): Таймаут одного запроса в секундах.
+            retries (int): Попыток на один запрос.
+            base_delay (float): Начальная задержка между попытками, удваивается.
+            max_delay (float): Верхняя граница задержки.
+            scheduler (SheetsScheduler, optional): Планировщик квоты. С ним каждая попытка
+                ждет разрешения, а ответ 429 приостанавливает запросы, не тратя попытку.
+        """
+        self.spreadsheet_id = spreadsheet_id
+        self.sheet_index = sheet_index
+        self.title = None
+        self.base_url = base_url.rstrip('/')
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._token_source = token_source
+        self._session = None
+        self.scheduler = scheduler
+
+    @classmethod
+    def from_service_account(cls, filename=JS_FILE, sheet_url=SHEET_URL, sheet_index=LIST_NUMBER,
+                             token_url=GS_TOKEN_URL or None, **kwargs):
+        return cls(spreadsheet_id_from_url(sheet_url), ServiceAccountToken.from_file(filename, token_url=token_url),
+                   sheet_index, **kwargs)
+
+    def __repr__(self):
+        return f'AsyncSheetsClient({self.spreadsheet_id!r}, {self.title or self.sheet_index!r})'
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _url(self, suffix=''):
+        return URL(f'{self.base_url}/v4/spreadsheets/{self.spreadsheet_id}{suffix}', encoded=True)
+
+    def _range(self, cell_range=None):
+        # Диапазоны всегда с именем листа: 'Лист 1'!O5; только имя - весь лист
+        title = "'" + self.title.replace("'", "''") + "'"
+        return f'{title}!{cell_range}' if cell_range else title
+
+    def _values_url(self, cell_range, suffix=''):
+        return self._url(f'/values/{quote(self._range(cell_range), safe="")}{suffix}')
+
+    async def _request(self, operation, method, url, params=None, body=None):
+        """
+        Запрос к API с повторами. Возвращает разобранный JSON или None после всех неудачных попыток.
+        """
+        request_seconds = SHEETS_REQUEST_SECONDS.labels(operation=operation)
+        errors = SHEETS_ERRORS.labels(operation=operation)
+
+        async def send():
+            session = self._get_session()
+            started = time.perf_counter()
+            try:
+                token = await self._token_source(session)
+                async with session.request(method, url, params=params, json=body,
+                                           headers={'Authorization': f'Bearer {token}'}) as response:
+                    if response.status == 401:
+                        self._token_source.invalidate()
+                    await _raise_for_status(response)
+                    return await response.json(content_type=None)
+            except Exception as e:
+                errors.inc()
+                logger.warning(f'Ошибка запроса {operation} к Google API: {e!r}')
+                raise
+            finally:
+                request_seconds.observe(time.perf_counter() - started)
+
+        async def attempt():
+            # Ответ 429 с планировщиком не тратит попытку: все запросы ждут квоту
+            while True:
+                if self.scheduler is not None:
+                    await self.scheduler.acquire_async()
+                try:
+                    return await send()
+                except SheetsAPIError as e:
+                    if self.scheduler is None or not is_quota_error(e):
+                        raise
+                    self.scheduler.throttled(e.retry_after)
+
+        try:
+            return await async_retry(attempt, retries=self.retries, base_delay=self.base_delay,
+                                     max_delay=self.max_delay, jitter=0.1,
+                                     retry_after=_retry_after, is_permanent=_is_permanent)
+        except Exception as e:
+            logger.error(f'Не удалось выполнить операцию {operation}: {e}')
+            send_tech_alert(f'Ошибка запроса к Google API при операции {operation} ❌')
+            return None
+
+    async def connect(self):
+        """
+        Проверяет доступ к таблице и находит название листа по его номеру.
+
+        Returns:
+            bool: True, если лист найден.
+        """
+        payload = await self._request('open', 'GET', self._url(),
+                                      params={'fields': 'sheets.properties(sheetId,title,index)'})
+        if payload is None:
+            return False
+        for sheet in payload.get('sheets', ()):
+            properties = sheet['properties']
+            if properties.get('index', 0) == self.sheet_index:
+                self.title = properties['title']
+                return True
+        logger.error(f'В таблице нет листа с номером {self.sheet_index}')
+        return False
+
+    async def get_values(self, cell_range, major_dimension='ROWS'):
+        """
+        Значения диапазона (list[list[str]]), [] для пустого диапазона или None при ошибке.
+        """
+        payload = await self._request('get_values', 'GET', self._values_url(cell_range),
+                                      params={'majorDimension': major_dimension})
+        if payload is None:
+            return None
+        return payload.get('values', [])
+
+    async def get_all_values(self):
+        payload = await self._request('get_all_values', 'GET', self._values_url(None))
+        if payload is None:
+            return None
+        return payload.get('values', [])
+
+    async def col_values(self, col):
+        letter = column_letter(col)
+        values = await self.get_values(f'{letter}:{letter}', major_dimension='COLUMNS')
+        if values is None:
+            return None
+        return values[0] if values else []
+
+    async def acell(self, label):
+        """
+        Значение одной ячейки ('' для пустой) или None при ошибке.
+        """
+        values = await self.get_values(label)
+        if values is None:
+            return None
+        return values[0][0] if values and values[0] else ''
+
+    async def update(self, cell_range, values):
+        return await self._request('update', 'PUT', self._values_url(cell_range),
+                                   params={'valueInputOption': 'RAW'},
+                                   body={'range': self._range(cell_range), 'majorDimension': 'ROWS', 'values': values})
+
+    async def batch_update(self, data):
+        """
+        Записывает несколько диапазонов одним запросом.
+
+        Args:
+            data (list[dict]): Запросы вида {'range': 'K5:L5', 'values': [[...]]}, как у gspread.
+        """
+        body = {
+            'valueInputOption': 'RAW',
+            'data': [{'range': self._range(item['range']), 'values': item['values']} for item in data],
+        }
+        return await self._request('batch_update', 'POST', self._url('/values:batchUpdate'), body=body)
+
+
+async def init_sheets_client(**kwargs):
+    """
+    Асинхронный аналог init_gspread_client(): клиент, подключенный к листу G_LIST.
+
+    Returns:
+        AsyncSheetsClient | None: Клиент или None, если подключиться не удалось.
+    """
+    logger.info("Попытка подключения к Google Sheets API (асинхронный клиент)...")
+    try:
+        client = AsyncSheetsClient.from_service_account(**kwargs)
+    except Exception as e:
+        logger.exception(f'Не удалось создать клиент Google Sheets: {e}')
+        send_tech_alert('Критическая ошибка: не удалось подключиться к Google API ❌')
+        return None
+    if await client.connect():
+        logger.info(f"Успешное подключение к Google Sheets API, лист '{client.title}'.")
+        send_tech_alert('Подключились к Google API ✅')
+        return client
+    await client.close()
+    logger.error("Не удалось подключиться к Google Sheets API.")
+    send_tech_alert('Критическая ошибка: не удалось подключиться к Google API ❌')
+    return None
+
+
+# --- Операции со сделками (awaitable-версии gs_* из google_sheet) ---
+
+async def get_empty_row(client: AsyncSheetsClient):
+    col_a = _mirrored_column('A')
+    if col_a is None:
+        col_a = await client.col_values(1)
+    return None if col_a is None else len(col_a) + 1
+
+
+async def get_order_number(client: AsyncSheetsClient, empty_row: int):
+    if empty_row <= 2:
+        return 1
+    number = _mirrored(empty_row - 1, 'A')
+    if number is None:
+        number = await client.acell(f'A{empty_row - 1}')
+    if number and number.isdigit():
+        return int(number) + 1
+    if number == '':
+        col_a = _mirrored_column('A')
+        if col_a is None:
+            col_a = await client.col_values(1)
+        for value in reversed((col_a or [])[1:]):
+            if value and value.isdigit():
+                return int(value) + 1
+    return 1
+
+
+async def get_old_orders(client: AsyncSheetsClient):
+    logger.info("Загрузка незавершенных ордеров из таблицы...")
+    sheet_data = await client.get_all_values()
+    if sheet_data is None:
+        return None
+    return select_live_trades(sheet_data)
+
+
+@with_priority(PRIORITY_CRITICAL)
+async def gs_first_update(client: AsyncSheetsClient, coin, side, date_time, current_price, tp1, tp2, tp3, tp4, tp5,
+                          is_order_exist, empty_row, order_number):
+    row_data = first_row_data(coin, side, date_time, current_price, tp1, tp2, tp3, tp4, tp5, is_order_exist, order_number)
+    logger.info(f"Запись новой сделки в строку {empty_row}: {row_data}")
+    _remember(empty_row, dict(zip(ROW_COLUMNS, row_data)))
+    return await client.update(f'A{empty_row}:Q{empty_row}', [row_data])
+
+
+@with_priority(PRIORITY_NORMAL)
+async def gs_tp_update(client: AsyncSheetsClient, tp_count, empty_row):
+    logger.info(f"Обновление TP={tp_count} для строки {empty_row}")
+    current_tp_in_gs = _mirrored(empty_row, 'O')
+    if current_tp_in_gs is None:
+        current_tp_in_gs = await client.acell(f'O{empty_row}')
+    if current_tp_in_gs and current_tp_in_gs.isdigit() and tp_count <= int(current_tp_in_gs):
+        logger.warning(f"Попытка обновить TP в таблице для строки {empty_row}, "
+                       f"но новое значение ({tp_count}) не больше старого ({current_tp_in_gs}).")
+        return None
+    _remember(empty_row, {'O': tp_count})
+    return await client.update(f'O{empty_row}', [[tp_count]])
+
+
+@with_priority(PRIORITY_CRITICAL)
+async def gs_final_tp_update(client: AsyncSheetsClient, tp_count, empty_row, is_order_exist):
+    logger.info(f"Финальное обновление TP={tp_count} и закрытие сделки для строки {empty_row}")
+    _remember(empty_row, {'M': is_order(is_order_exist), 'O': tp_count})
+    return await client.batch_update([
+        {'range': f'M{empty_row}', 'values': [[is_order(is_order_exist)]]},
+        {'range': f'O{empty_row}', 'values': [[tp_count]]},
+    ])
+
+
+@with_priority(PRIORITY_CRITICAL)
+async def gs_stop_update(client: AsyncSheetsClient, stop_loss, empty_row, is_order_exist):
+    logger.info(f"Обновление стоп-лосса и закрытие сделки для строки {empty_row}")
+    _remember(empty_row, {'M': is_order(is_order_exist), 'P': stop_loss})
+    return await client.batch_update([
+        {'range': f'M{empty_row}', 'values': [[is_order(is_order_exist)]]},
+        {'range': f'P{empty_row}', 'values': [[stop_loss]]},
+    ])
+
+
+@with_priority(PRIORITY_NORMAL)
+async def gs_av_update(client: AsyncSheetsClient, av_count, empty_row, av_order):
+    logger.info(f"Обновление усреднения {av_count} для строки {empty_row}")
+    _remember(empty_row, {'K': av_count, 'L': av_order})
+    return await client.update(f'K{empty_row}:L{empty_row}', [[av_count, av_order]])
+
+
+@with_priority(PRIORITY_CRITICAL)
+async def gs_breakeven_update(client: AsyncSheetsClient, empty_row, is_order_exist):
+    logger.info(f"Обновление статуса на 'безубыток' для строки {empty_row}")
+    _remember(empty_row, {'M': is_order(is_order_exist), 'N': '✅'})
+    return await client.update(f'M{empty_row}:N{empty_row}', [[is_order(is_order_exist), '✅']])
+
+
+@with_priority(PRIORITY_LOW)
+async def gs_5_perc_alert_update(client: AsyncSheetsClient, empty_row):
+    logger.info(f"Установка флага '5% алерт' для строки {empty_row}")
+    _remember(empty_row, {'Q': '➕'})
+    return await client.update(f'Q{empty_row}', [['➕']])
@@ -0,0 +1,210 @@
+"""
+Планировщик запросов к Google Sheets API с учетом квоты.
+
+Google ограничивает число запросов в минуту. Все обращения к API (gspread через
+_execute_with_retry и AsyncSheetsClient) берут разрешение у одного token bucket,
+размер которого подобран так, чтобы за любую минуту не выйти за квоту.
+
+Запросы делятся на классы приоритета. Закрытие сделки и новая строка могут
+израсходовать бакет до конца; обновления TP и усреднений ждут, если в бакете
+осталось меньше четверти, а флаг 5% - если меньше половины. Пока запросы
+старшего класса ждут, младшие их не обгоняют. Ответ "квота превышена" не тратит
+попытку: планировщик приостанавливает всех и запрос повторяется после паузы.
+
+Приоритет передается через contextvars: scheduling_priority() и декоратор
+with_priority() задают его для кода внутри, поэтому функции gs_* не передают
+его явно через буфер записи и обертку повторов.
+"""
+import asyncio
+import contextlib
+import contextvars
+import functools
+import inspect
+import threading
+import time
+
+from bot.config import GS_QUOTA_BURST, GS_QUOTA_PAUSE, GS_QUOTA_PER_MINUTE
+from .logger_setup import logger
+from .metrics import SHEETS_QUOTA_EXCEEDED, SHEETS_SCHEDULER_WAIT_SECONDS
+
+PRIORITY_CRITICAL = 0  # Закрытие сделки (final TP, безубыток, стоп) и строка новой сделки
+PRIORITY_NORMAL = 1  # TP, усреднения, чтения таблицы
+PRIORITY_LOW = 2  # Флаг 5% алерта
+PRIORITY_NAMES = ('critical', 'normal', 'low')
+
+# Доля бакета, которая должна остаться свободной, чтобы запрос класса прошел
+RESERVE = (0.0, 0.25, 0.5)
+
+_priority = contextvars.ContextVar('sheets_priority', default=PRIORITY_NORMAL)
+
+
+def current_priority():
+    return _priority.get()
+
+
+@contextlib.contextmanager
+def scheduling_priority(priority):
+    """
+    Задает приоритет запросов к таблице для кода внутри блока with.
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def with_priority(priority):
+    """
+    Декоратор: запросы, сделанные функцией (в том числе корутиной), получают priority.
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with scheduling_priority(priority):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with scheduling_priority(priority):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class SheetsScheduler:
+    """
+    Token bucket квоты Google Sheets с приоритетами. Потокобезопасен,
+    ждать разрешения можно и из потока (acquire), и из event loop (acquire_async).
+    """
+
+    def __init__(self, per_minute=GS_QUOTA_PER_MINUTE, burst=GS_QUOTA_BURST, quota_pause=GS_QUOTA_PAUSE,
+                 poll_interval=0.5, clock=time.monotonic, sleep=time.sleep):
+        """
+        Args:
+            per_minute (int): Квота запросов в минуту.
+            burst (int): Размер бакета - сколько запросов можно сделать подряд.
+                Скорость пополнения (per_minute - burst) / 60 в секунду, так что
+                за любую минуту уходит не больше per_minute запросов.
+            quota_pause (float): Пауза для всех запросов после ответа 429 без Retry-After.
+            poll_interval (float): Как часто ожидающие запросы перепроверяют бакет.
+            clock (callable): Источник времени.
+            sleep (callable): Ожидание в потоке для acquire().
+        """
+        self.capacity = float(burst)
+        self.rate = max(per_minute - burst, 1) / 60
+        self.quota_pause = quota_pause
+        self.poll_interval = poll_interval
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._waiting = [0] * len(PRIORITY_NAMES)
+
+    def waiting_count(self, priority=None):
+        """
+        Сколько запросов ждет квоты (всего или в классе priority).
+        """
+        return sum(self._waiting) if priority is None else self._waiting[priority]
+
+    def tokens(self):
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+    def _refill(self):
+        now = self._clock()
+        if now > self._updated:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def _wait_time(self, priority):
+        # Вызывается под self._lock
+        now = self._clock()
+        if now < self._paused_until:
+            return self._paused_until - now
+        if any(self._waiting[:priority]):
+            return self.poll_interval
+        self._refill()
+        need = 1 + RESERVE[priority] * self.capacity
+        if self._tokens >= need - 1e-9:  # Погрешность сложения дробных пополнений
+            return 0.0
+        return (need - self._tokens) / self.rate
+
+    def wait_time(self, priority=PRIORITY_NORMAL):
+        """
+        Через сколько секунд пройдет запрос класса priority (0 - сразу). Токен не расходуется.
+        """
+        with self._lock:
+            return self._wait_time(priority)
+
+    def _try_take(self, priority):
+        with self._lock:
+            wait = self._wait_time(priority)
+            if wait <= 0:
+                self._tokens -= 1
+            return wait
+
+    def _enter(self, priority):
+        with self._lock:
+            self._waiting[priority] += 1
+        return self._clock()
+
+    def _leave(self, priority, started):
+        with self._lock:
+            self._waiting[priority] -= 1
+        waited = self._clock() - started
+        SHEETS_SCHEDULER_WAIT_SECONDS.labels(priority=PRIORITY_NAMES[priority]).observe(waited)
+        if waited >= 1:
+            logger.debug(f"Запрос к таблице ({PRIORITY_NAMES[priority]}) ждал квоту {waited:.1f} с")
+
+    def acquire(self, priority=None):
+        """
+        Блокирует поток, пока запрос класса priority (по умолчанию - текущего) не может пройти.
+        """
+        priority = current_priority() if priority is None else priority
+        started = self._enter(priority)
+        try:
+            while (wait := self._try_take(priority)) > 0:
+                self._sleep(min(wait, self.poll_interval))
+        finally:
+            self._leave(priority, started)
+
+    async def acquire_async(self, priority=None):
+        """
+        То же, что acquire(), не блокируя event loop.
+        """
+        priority = current_priority() if priority is None else priority
+        started = self._enter(priority)
+        try:
+            while (wait := self._try_take(priority)) > 0:
+                await asyncio.sleep(min(wait, self.poll_interval))
+        finally:
+            self._leave(priority, started)
+
+    def throttled(self, retry_after=None):
+        """
+        Google ответил 429: бакет обнуляется, все запросы ждут retry_after
+        (или quota_pause) секунд.
+        """
+        SHEETS_QUOTA_EXCEEDED.inc()
+        pause = retry_after if retry_after is not None else self.quota_pause
+        with self._lock:
+            now = self._clock()
+            self._refill()
+            self._tokens = 0.0
+            self._paused_until = max(self._paused_until, now + pause)
+            self._updated = max(self._updated, self._paused_until)
+        logger.warning(f"Превышена квота Google Sheets API, запросы приостановлены на {pause:.0f} с")
+
+
+def is_quota_error(exc):
+    """
+    Ответ "квота превышена" от gspread (APIError) или AsyncSheetsClient (SheetsAPIError).
+    """
+    code = getattr(exc, 'code', None) or getattr(exc, 'status', None)
+    return code == 429
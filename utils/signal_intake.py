@@ -0,0 +1,87 @@
+"""
+Фоновая обработка входящих сигналов.
+
+Обработчик webhook только разбирает сообщение и ставит сигнал в ограниченную
+очередь, после чего сразу отвечает Telegram. Работа с таблицей (первичное чтение
+столбца A, выдача строки) и регистрация в движке выполняются отдельной задачей,
+поэтому медленный ответ Google не задерживает ни webhook, ни другие задачи event loop.
+Сигналы обрабатываются по одному в порядке поступления, так что номера строк
+выдаются в том же порядке, в каком сигналы пришли в канал.
+"""
+import asyncio
+
+from .logger_setup import logger
+from .metrics import SIGNAL_INTAKE_DROPPED
+from .tg_signal import send_tech_alert
+
+
+class SignalIntake:
+    """
+    Ограниченная очередь сигналов с одной задачей-обработчиком.
+    """
+
+    def __init__(self, process, maxsize=100):
+        """
+        Args:
+            process (callable): Корутина process(signal), выполняющая работу с таблицей и движком.
+            maxsize (int): Сколько сигналов может ждать обработки; лишние отбрасываются с алертом.
+        """
+        self._process = process
+        self._queue = asyncio.Queue(maxsize)
+        self._task = None
+
+    def __len__(self):
+        return self._queue.qsize()
+
+    def depth(self):
+        """
+        Сколько сигналов ждет обработки.
+        """
+        return self._queue.qsize()
+
+    def submit(self, signal):
+        """
+        Ставит сигнал в очередь, не дожидаясь обработки.
+
+        Returns:
+            bool: False, если очередь переполнена и сигнал отброшен.
+        """
+        try:
+            self._queue.put_nowait(signal)
+        except asyncio.QueueFull:
+            SIGNAL_INTAKE_DROPPED.inc()
+            logger.error(f"Очередь сигналов переполнена ({self._queue.maxsize}), сигнал отброшен: {signal}")
+            send_tech_alert(f"Очередь сигналов переполнена, сигнал {signal.get('coin')} не отслеживается ❌")
+            return False
+        return True
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self, timeout=10.0):
+        """
+        Дает обработать уже принятые сигналы (не дольше timeout секунд) и останавливает задачу.
+        """
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Не обработано сигналов при остановке: {self._queue.qsize()}")
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def run(self):
+        while True:
+            signal = await self._queue.get()
+            try:
+                await self._process(signal)
+            except Exception as e:
+                logger.exception(f"Ошибка при запуске трекинга {signal}: {e}")
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,187 @@
+"""
+Запись сырых тиков бирж в компактные бинарные файлы с ротацией.
+
+Тики копятся в массивах array (по столбцу на поле) и сбрасываются на диск
+блоками, поэтому запись одного тика - это четыре append без форматирования строк.
+Формат файла - последовательность блоков:
+
+    заголовок  <4sIH>  MAGIC, число тиков n, длина таблицы символов в байтах
+    символы    utf-8, 'биржа:монета' через '\\n'; индекс строки - id символа в блоке
+    столбцы    n x float64 время биржи, n x float64 локальное время,
+               n x uint16 id символа, n x float64 цена (little-endian)
+
+Каждый блок самодостаточен, поэтому файл, оборванный на середине блока,
+читается до последнего целого блока.
+"""
+import os
+import struct
+import sys
+import time
+from array import array
+from datetime import datetime
+
+from .logger_setup import logger
+
+MAGIC = b'TCK1'
+HEADER = struct.Struct('<4sIH')
+_SWAP = sys.byteorder != 'little'
+
+
+def _column_bytes(values):
+    if _SWAP:
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+class TickRecorder:
+    """
+    Пишет тики (время биржи, локальное время, символ, цена) в каталог с ротацией файлов.
+    """
+
+    def __init__(self, directory, max_file_bytes=16 * 1024 * 1024, max_files=None,
+                 chunk_size=4096, flush_interval=5.0, clock=time.time):
+        """
+        Args:
+            directory (str): Каталог для файлов ticks-*.bin.
+            max_file_bytes (int): Размер файла, после которого начинается новый.
+            max_files (int | None): Сколько последних файлов хранить (None - все).
+            chunk_size (int): Число тиков в одном блоке.
+            flush_interval (float): Не держать тики в памяти дольше стольких секунд.
+            clock (callable): Источник локального времени.
+        """
+        self.directory = directory
+        self.max_file_bytes = max_file_bytes
+        self.max_files = max_files
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+        self._clock = clock
+        self._file = None
+        self._file_seq = 0
+        self._last_flush = clock()
+        self._reset_chunk()
+        os.makedirs(directory, exist_ok=True)
+
+    def _reset_chunk(self):
+        self._exchange_ts = array('d')
+        self._local_ts = array('d')
+        self._symbol_ids = array('H')
+        self._prices = array('d')
+        self._symbols = {}  # { 'bybit:BTCUSDT': id в блоке }
+
+    def __len__(self):
+        return len(self._prices)
+
+    def record(self, exchange, coin, price, exchange_ts=None):
+        """
+        Добавляет тик. Время биржи в секундах; если биржа его не прислала, берется локальное.
+        """
+        now = self._clock()
+        symbol = f'{exchange}:{coin}'
+        symbol_id = self._symbols.get(symbol)
+        if symbol_id is None:
+            if len(self._symbols) > 0xFFFF:
+                self.flush()
+            symbol_id = self._symbols[symbol] = len(self._symbols)
+        self._exchange_ts.append(now if exchange_ts is None else exchange_ts)
+        self._local_ts.append(now)
+        self._symbol_ids.append(symbol_id)
+        self._prices.append(price)
+        if len(self._prices) >= self.chunk_size or now - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """
+        Дописывает накопленный блок в текущий файл.
+        """
+        self._last_flush = self._clock()
+        if not self._prices:
+            return
+        symbols = '\n'.join(self._symbols).encode('utf-8')
+        chunk = b''.join((
+            HEADER.pack(MAGIC, len(self._prices), len(symbols)),
+            symbols,
+            _column_bytes(self._exchange_ts),
+            _column_bytes(self._local_ts),
+            _column_bytes(self._symbol_ids),
+            _column_bytes(self._prices),
+        ))
+        self._reset_chunk()
+        try:
+            file = self._current_file()
+            file.write(chunk)
+            file.flush()
+        except OSError as e:
+            logger.error(f'Не удалось записать тики в {self.directory}: {e}')
+
+    def _current_file(self):
+        if self._file is not None and self._file.tell() >= self.max_file_bytes:
+            self._file.close()
+            self._file = None
+        if self._file is None:
+            self._file_seq += 1
+            name = f"ticks-{datetime.fromtimestamp(self._clock()):%Y%m%d-%H%M%S}-{self._file_seq:04d}.bin"
+            self._file = open(os.path.join(self.directory, name), 'ab')
+            self._prune()
+        return self._file
+
+    def _prune(self):
+        if not self.max_files:
+            return
+        for path in tick_files(self.directory)[:-self.max_files]:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f'Не удалось удалить старый файл тиков {path}: {e}')
+
+    def close(self):
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def tick_files(directory):
+    """
+    Файлы тиков каталога в порядке записи.
+    """
+    names = sorted(name for name in os.listdir(directory) if name.startswith('ticks-') and name.endswith('.bin'))
+    return [os.path.join(directory, name) for name in names]
+
+
+def _read_column(data, offset, typecode, count):
+    column = array(typecode)
+    end = offset + column.itemsize * count
+    column.frombytes(data[offset:end])
+    if _SWAP:
+        column.byteswap()
+    return column, end
+
+
+def read_ticks(paths):
+    """
+    Читает тики из файлов по порядку.
+
+    Yields:
+        tuple[str, str, float, float, float]: (биржа, монета, время биржи, локальное время, цена).
+    """
+    for path in paths:
+        with open(path, 'rb') as file:
+            data = file.read()
+        offset = 0
+        while offset + HEADER.size <= len(data):
+            magic, count, symbols_len = HEADER.unpack_from(data, offset)
+            chunk_size = HEADER.size + symbols_len + count * (8 + 8 + 2 + 8)
+            if magic != MAGIC or offset + chunk_size > len(data):
+                logger.warning(f'Файл тиков {path} обрывается на байте {offset}, остаток пропущен.')
+                break
+            offset += HEADER.size
+            symbols = [tuple(s.split(':', 1)) for s in data[offset:offset + symbols_len].decode('utf-8').split('\n')]
+            offset += symbols_len
+            exchange_ts, offset = _read_column(data, offset, 'd', count)
+            local_ts, offset = _read_column(data, offset, 'd', count)
+            symbol_ids, offset = _read_column(data, offset, 'H', count)
+            prices, offset = _read_column(data, offset, 'd', count)
+            for i in range(count):
+                exchange, coin = symbols[symbol_ids[i]]
+                yield exchange, coin, exchange_ts[i], local_ts[i], prices[i]
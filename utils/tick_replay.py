@@ -0,0 +1,151 @@
+"""
+Детерминированное воспроизведение записанных тиков через движок позиций.
+
+Тики из файлов TickRecorder подаются в PriceSlot движка так же, как их подавал бы
+WebSocket, а часы движка показывают время из записи, поэтому сутки рынка
+проигрываются за секунды. Алерты и записи в таблицу не отправляются, а
+собираются в список событий с временем срабатывания.
+
+Запуск:
+    python -m utils.tick_replay ticks/ --db positions.db
+"""
+import argparse
+import contextlib
+
+from . import position_engine
+from .position_store import PositionStore
+from .tick_recorder import read_ticks, tick_files
+
+# Побочные эффекты движка, которые при воспроизведении перехватываются
+SIDE_EFFECTS = ('send_alert', 'send_av_alert', 'gs_first_update', 'gs_tp_update', 'gs_final_tp_update',
+                'gs_av_update', 'gs_breakeven_update', 'gs_5_perc_alert_update')
+
+
+class ReplayClock:
+    """
+    Часы, которые показывают время текущего воспроизводимого тика.
+    """
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class ReplayFeed:
+    """
+    Подменяет подписку на WebSocket: запоминает слоты движка и раздает им записанные цены.
+    """
+
+    def __init__(self):
+        self.slots = {}  # { (exchange, coin): [PriceSlot, ...] }
+
+    def subscribe(self, coin, exchange, slot):
+        self.slots.setdefault((exchange, coin), []).append(slot)
+
+    def unsubscribe(self, coin, exchange, slot):
+        slots = self.slots.get((exchange, coin), [])
+        if slot in slots:
+            slots.remove(slot)
+
+    def publish(self, exchange, coin, price):
+        for slot in self.slots.get((exchange, coin), ()):
+            slot.put(price)
+
+
+@contextlib.contextmanager
+def captured_side_effects(clock, events):
+    """
+    На время блока заменяет отправку алертов и запись в таблицу сбором событий.
+
+    Args:
+        clock (callable): Часы воспроизведения.
+        events (list): Сюда добавляются кортежи (время, имя функции, аргументы).
+    """
+    originals = {name: getattr(position_engine, name) for name in SIDE_EFFECTS}
+
+    def capture(name):
+        return lambda *args: events.append((clock(), name, args))
+
+    try:
+        for name in SIDE_EFFECTS:
+            setattr(position_engine, name, capture(name))
+        yield events
+    finally:
+        for name, func in originals.items():
+            setattr(position_engine, name, func)
+
+
+def replay(engine, feed, clock, ticks, batch_interval=0.3):
+    """
+    Проигрывает тики через движок.
+
+    Args:
+        engine (PositionEngine): Движок, созданный с clock=clock, subscribe=feed.subscribe
+            и unsubscribe=feed.unsubscribe.
+        feed (ReplayFeed): Источник цен движка.
+        clock (ReplayClock): Часы движка.
+        ticks (iterable): Кортежи из read_ticks().
+        batch_interval (float): Как часто (в секундах записи) движок разбирает накопленные цены.
+            0 - после каждого тика.
+
+    Returns:
+        dict: Число тиков и проходов движка, начало и конец записи.
+    """
+    engine.step()
+    stats = {'ticks': 0, 'steps': 1, 'start': None, 'end': None}
+    next_step = None
+    for exchange, coin, _exchange_ts, local_ts, price in ticks:
+        if stats['start'] is None:
+            stats['start'] = local_ts
+        if batch_interval:
+            if next_step is None:
+                next_step = local_ts + batch_interval
+            elif local_ts >= next_step:
+                clock.now = next_step
+                engine.step()
+                stats['steps'] += 1
+                next_step += batch_interval * ((local_ts - next_step) // batch_interval + 1)
+        clock.now = local_ts
+        feed.publish(exchange, coin, price)
+        stats['ticks'] += 1
+        if not batch_interval:
+            engine.step()
+            stats['steps'] += 1
+    if stats['start'] is not None:
+        stats['end'] = clock.now
+    engine.step()
+    stats['steps'] += 1
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Воспроизведение записанных тиков через движок позиций")
+    parser.add_argument('directory', help="Каталог с файлами ticks-*.bin")
+    parser.add_argument('--db', required=True, help="Хранилище позиций, открытые позиции берутся из него")
+    parser.add_argument('--batch-interval', type=float, default=0.3,
+                        help="Период разбора пачек цен в секундах записи (0 - каждый тик)")
+    args = parser.parse_args(argv)
+
+    store = PositionStore(args.db)
+    states = store.load_open()
+    store.close()
+
+    clock = ReplayClock()
+    feed = ReplayFeed()
+    engine = position_engine.PositionEngine(clock=clock, subscribe=feed.subscribe, unsubscribe=feed.unsubscribe)
+    events = []
+    with captured_side_effects(clock, events):
+        for state in states:
+            engine.register_state(None, state)
+        stats = replay(engine, feed, clock, read_ticks(tick_files(args.directory)), args.batch_interval)
+
+    print(f"Тиков: {stats['ticks']}, проходов движка: {stats['steps']}, "
+          f"запись: {stats['start']} - {stats['end']}")
+    for at, name, event_args in events:
+        print(f"{at:.3f} {name} {event_args}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,378 @@
+"""
+Общая основа asyncio-клиентов WebSocket бирж.
+
+Клиенты работают в том же event loop, что и aiohttp-приложение бота,
+и передают цены подписчикам через сворачивающие слоты без отдельных потоков.
+"""
+import asyncio
+
+import aiohttp
+
+from utils.logger_setup import logger, throttled
+from utils.metrics import WS_RECONNECTS, WS_TICKS
+from utils.tg_signal import send_tech_alert
+
+
+class PriceSlot:
+    """
+    Сворачивающий слот цен одной монеты для одного потребителя.
+
+    Вместо очереди всех тиков хранит только последнюю цену, максимум, минимум
+    и количество тиков с момента последнего чтения, поэтому память на монету
+    не зависит от скорости потока. Слот используется внутри одного event loop,
+    так что put() и read() атомарны относительно друг друга.
+    """
+    __slots__ = ('last', 'high', 'low', 'count', 'ready', '_on_ready')
+
+    def __init__(self, on_ready=None):
+        self.last = self.high = self.low = 0.0
+        self.count = 0
+        self.ready = asyncio.Event()
+        self._on_ready = on_ready  # Вызывается, когда в пустой слот пришла первая цена
+
+    def put(self, price):
+        if self.count:
+            self.last = price
+            if price > self.high:
+                self.high = price
+            elif price < self.low:
+                self.low = price
+            self.count += 1
+            return
+        self.last = self.high = self.low = price
+        self.count = 1
+        self.ready.set()
+        if self._on_ready is not None:
+            self._on_ready()
+
+    def read(self):
+        """
+        Забирает накопленную пачку и очищает слот.
+
+        Returns:
+            tuple[float, float, float, int] | None: (последняя, максимум, минимум, число тиков)
+            или None, если новых цен не было.
+        """
+        if not self.count:
+            return None
+        batch = (self.last, self.high, self.low, self.count)
+        self.count = 0
+        self.ready.clear()
+        return batch
+
+    async def get(self):
+        """
+        Ждет хотя бы одну новую цену и забирает пачку.
+        """
+        await self.ready.wait()
+        return self.read()
+
+
+class WSConnection:
+    """
+    Одно WebSocket-соединение (шард) менеджера биржи со своим набором монет.
+    """
+
+    def __init__(self, manager, number):
+        self.manager = manager
+        self.number = number
+        self.coins = set()  # Монеты, закрепленные за соединением
+        self.ws = None
+        self.task = None
+        self.reconnect_delay = 5
+        self._pending_sub = set()
+        self._pending_unsub = set()
+        self._flush_scheduled = False
+        self._was_open = False
+
+    @property
+    def label(self):
+        return self.manager.name if self.number == 0 else f"{self.manager.name} #{self.number + 1}"
+
+    def is_connected(self):
+        return self.ws is not None and not self.ws.closed
+
+    def add_coin(self, coin):
+        self.coins.add(coin)
+        if coin in self._pending_unsub:
+            self._pending_unsub.discard(coin)
+        else:
+            self._pending_sub.add(coin)
+        self._schedule_flush()
+
+    def remove_coin(self, coin):
+        self.coins.discard(coin)
+        if coin in self._pending_sub:
+            self._pending_sub.discard(coin)
+        else:
+            self._pending_unsub.add(coin)
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        """
+        Откладывает отправку подписок до конца текущего шага event loop, чтобы
+        монеты, добавленные подряд, ушли одним кадром.
+        """
+        if self._flush_scheduled or not self.is_connected():
+            return
+        self._flush_scheduled = True
+        asyncio.get_running_loop().call_soon(self.flush_subscriptions)
+
+    def flush_subscriptions(self):
+        self._flush_scheduled = False
+        unsub, self._pending_unsub = sorted(self._pending_unsub), set()
+        sub, self._pending_sub = sorted(self._pending_sub), set()
+        if not self.is_connected():
+            return  # После подключения _on_open подпишет все монеты соединения
+        if unsub:
+            self.send_frames(self.manager._subscription_payloads(unsub, subscribe=False))
+            logger.info(f"Отправлена отписка {self.label} от {', '.join(unsub)}")
+        if sub:
+            self.send_frames(self.manager._subscription_payloads(sub))
+            logger.info(f"Отправлена подписка {self.label} на {', '.join(sub)}")
+
+    def send_frames(self, frames):
+        """
+        Отправляет кадры в WebSocket, не блокируя вызывающий код.
+        """
+        if not self.is_connected():
+            return
+        loop = asyncio.get_running_loop()
+        for payload in frames:
+            task = loop.create_task(self.ws.send_str(payload))
+            self.manager._send_tasks.add(task)
+            task.add_done_callback(self.manager._send_tasks.discard)
+
+    def _on_open(self):
+        throttled(f'{self.label}:open').info(f'Соединение с {self.label} открыто.')
+        if self._was_open and self.manager.price_cache is not None:
+            # Пока соединения не было, цены могли уйти: обновляем снимок для новых сигналов
+            self.manager.price_cache.schedule_refresh(self.manager.exchange)
+        self._was_open = True
+        self.reconnect_delay = 5
+        self._pending_sub.clear()
+        self._pending_unsub.clear()
+        if self.coins:
+            coins = sorted(self.coins)
+            self.send_frames(self.manager._subscription_payloads(coins))
+            throttled(f'{self.label}:resubscribe').info(f"Отправлена подписка {self.label} на {len(coins)} монет")
+
+    def _on_close(self, close_status_code, close_msg):
+        throttled(f'{self.label}:close').info(
+            f"{self.label} WebSocket closed. Code: {close_status_code}, Msg: {close_msg}")
+        self.manager._mark_disconnected(self.coins)
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def run(self):
+        manager = self.manager
+        async with aiohttp.ClientSession(headers=manager.headers) as session:
+            while manager.is_running:
+                close_code, close_msg = None, None
+                try:
+                    async with session.ws_connect(manager.url, heartbeat=manager.heartbeat) as ws:
+                        self.ws = ws
+                        self._on_open()
+                        async for msg in ws:
+                            if msg.type in (aiohttp.WSMsgType.TEXT, aiohttp.WSMsgType.BINARY):
+                                reply = manager._on_message(msg.data)
+                                if reply is not None:
+                                    await ws.send_str(reply)
+                            elif msg.type == aiohttp.WSMsgType.ERROR:
+                                manager._on_error(ws.exception())
+                        close_code = ws.close_code
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    close_msg = str(e)
+                    throttled(f'{self.label}:crash').exception(f"Критическая ошибка в {type(manager).__name__}: {e}")
+                finally:
+                    self.ws = None
+                    self._on_close(close_code, close_msg)
+
+                if manager.is_running:
+                    WS_RECONNECTS.labels(exchange=manager.exchange).inc()
+                    throttled(f'{self.label}:reconnect').warning(
+                        f"Переподключение {self.label} через {self.reconnect_delay}с...")
+                    await asyncio.sleep(self.reconnect_delay)
+                    self.reconnect_delay = min(self.reconnect_delay * 2, manager.max_reconnect_delay)
+
+
+class BaseWSManager:
+    """
+    Базовый класс управления WebSocket-соединениями биржи для множества монет.
+
+    Подписки считаются по получателям: монета подписывается с первым получателем и
+    отписывается, когда уходит последний. Подписки отправляются пачками до
+    max_args_per_frame монет в кадре, а когда на соединении становится
+    max_topics_per_connection монет, следующие монеты уходят на новое соединение.
+
+    Наследники задают url, name, exchange, headers, лимиты и реализуют
+    _on_message() и _subscription_payloads().
+    """
+    url = ""
+    name = ""
+    exchange = ""
+    headers = None
+    heartbeat = 20  # Пинг каждые 20с, соединение закрывается, если pong не пришел за 10с
+    max_args_per_frame = 10
+    max_topics_per_connection = 200
+    max_reconnect_delay = 120
+
+    def __init__(self):
+        # { 'BTCUSDT': (slot1, slot2, ...) } - кортеж заменяется целиком при изменении подписок,
+        # поэтому раздача тика всегда идет по неизменяемому снимку
+        self.subscribers = {}
+        self.connection_states = {}  # { 'BTCUSDT': {'connected': False} }
+        self._live_coins = set()  # Монеты, от которых после подключения уже пришла цена
+        self.connections = []  # [WSConnection, ...]
+        self._coin_connections = {}  # { 'BTCUSDT': WSConnection }
+        self.is_running = False
+        self._send_tasks = set()
+        self.recorder = None  # TickRecorder для записи сырых тиков (по умолчанию выключен)
+        self.price_cache = None  # PriceCache, снимок которого обновляется после переподключения
+        self._ticks = WS_TICKS.labels(exchange=self.exchange)
+
+    def subscribed_count(self):
+        return len(self.subscribers)
+
+    def connected_count(self):
+        return sum(connection.is_connected() for connection in self.connections)
+
+    def _on_message(self, message):
+        """
+        Обрабатывает сообщение биржи.
+
+        Returns:
+            str | None: Ответ, который нужно отправить обратно (например, Pong).
+        """
+        raise NotImplementedError
+
+    def _subscription_payloads(self, coins, subscribe=True):
+        """
+        Кадры подписки (или отписки) на монеты.
+
+        Returns:
+            list[str]: Кадры для отправки.
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def _chunks(cls, coins):
+        size = cls.max_args_per_frame
+        return [coins[i:i + size] for i in range(0, len(coins), size)]
+
+    def _publish(self, coin, last_price, exchange_ts=None):
+        """
+        Раздает цену подписчикам монеты и отмечает первое сообщение после подключения.
+
+        Args:
+            coin (str): Монета, например 'BTCUSDT'.
+            last_price (float): Последняя цена.
+            exchange_ts (float, optional): Время тика на бирже в секундах.
+        """
+        self._ticks.inc()
+        if self.recorder is not None:
+            self.recorder.record(self.exchange, coin, last_price, exchange_ts)
+        subscribers = self.subscribers.get(coin)
+        if not subscribers:
+            return
+        for slot in subscribers:
+            slot.put(last_price)
+        if coin not in self._live_coins:
+            self._mark_connected(coin)
+
+    def _notify(self, msg):
+        """
+        Отправляет тех. уведомление после текущего шага event loop, не задерживая раздачу тиков.
+        """
+        try:
+            asyncio.get_running_loop().call_soon(send_tech_alert, msg)
+        except RuntimeError:
+            send_tech_alert(msg)
+
+    def _mark_connected(self, coin):
+        self._live_coins.add(coin)
+        self.connection_states[coin] = {'connected': True}
+        throttled(f'{self.exchange}:{coin}:connected').info(
+            f"Первое сообщение получено от {self.name} для {coin}. Соединение стабильно.")
+        self._notify(f'Подключились к {self.name} для {coin} ✅')
+
+    def _mark_disconnected(self, coins):
+        """
+        Сбрасывает состояние монет отключившегося соединения одним уведомлением.
+        """
+        lost = sorted(coin for coin in coins if coin in self._live_coins)
+        self._live_coins.difference_update(coins)
+        for coin in coins:
+            self.connection_states[coin] = {'connected': False}
+        if lost:
+            self._notify(f'Отключились от {self.name} для {", ".join(lost)} ❌')
+
+    def _on_error(self, error):
+        throttled(f'{self.exchange}:error:{type(error).__name__}').error(f"{self.name} WebSocket error: {error}")
+
+    def _connection_for_new_coin(self):
+        for connection in self.connections:
+            if len(connection.coins) < self.max_topics_per_connection:
+                return connection
+        connection = WSConnection(self, len(self.connections))
+        self.connections.append(connection)
+        logger.info(f"Открывается дополнительное соединение {connection.label}: "
+                    f"лимит {self.max_topics_per_connection} монет на соединение")
+        return connection
+
+    def add_subscriber(self, coin, slot):
+        subscribers = self.subscribers.get(coin)
+        if subscribers is None:
+            self.connection_states[coin] = {'connected': False}
+            connection = self._connection_for_new_coin()
+            self._coin_connections[coin] = connection
+            connection.add_coin(coin)
+            if self.is_running:
+                connection.start()
+        self.subscribers[coin] = (subscribers or ()) + (slot,)
+
+    def remove_subscriber(self, coin, slot):
+        """
+        Убирает получателя; после последнего монета отписывается от биржи.
+        """
+        subscribers = self.subscribers.get(coin)
+        if subscribers is None or slot not in subscribers:
+            return
+        index = subscribers.index(slot)
+        subscribers = subscribers[:index] + subscribers[index + 1:]
+        if subscribers:
+            self.subscribers[coin] = subscribers
+            return
+        del self.subscribers[coin]
+        self.connection_states.pop(coin, None)
+        self._live_coins.discard(coin)
+        connection = self._coin_connections.pop(coin)
+        connection.remove_coin(coin)
+        logger.debug(f"Монета {coin} больше не отслеживается на {self.name}")
+
+    def ensure_running(self):
+        """
+        Запускает соединения в текущем event loop, если они еще не запущены.
+        """
+        self.is_running = True
+        for connection in self.connections:
+            if connection.coins:
+                connection.start()
+
+    async def stop(self):
+        self.is_running = False
+        for connection in self.connections:
+            await connection.stop()
@@ -0,0 +1,86 @@
+"""
+Быстрое декодирование кадров WebSocket бирж.
+
+Тикеры разбираются без построения словаря всего сообщения: из кадра вырезаются
+только символ, цена и время биржи. Остальные сообщения (пинги, ответы на подписку,
+ошибки) разбираются целиком через orjson, если он установлен, иначе через json.
+"""
+import json
+import zlib
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен
+    orjson = None
+
+JSON_BACKEND = 'orjson' if orjson is not None else 'json'
+loads = orjson.loads if orjson is not None else json.loads
+
+GZIP_MAGIC = b'\x1f\x8b'
+_GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+def gunzip(frame):
+    """
+    Распаковывает gzip-кадр одним вызовом zlib; кадры без gzip-заголовка возвращаются как есть.
+    """
+    if frame[:2] == GZIP_MAGIC:
+        return zlib.decompress(frame, _GZIP_WBITS)
+    return frame
+
+
+def decode_bybit_ticker(message):
+    """
+    Вырезает тикер из текстового кадра Bybit.
+
+    Bybit присылает компактный JSON: symbol - первое поле data, lastPrice идет
+    после него, ts - последнее поле кадра.
+
+    Returns:
+        tuple[str, float, float | None] | None: (символ, цена, время биржи в секундах)
+        или None, если в кадре нет цены тикера.
+    """
+    i = message.find('"symbol":"')
+    if i < 0:
+        return None
+    i += 10
+    end = message.find('"', i)
+    symbol = message[i:end]
+    i = message.find('"lastPrice":"', end)
+    if i < 0:
+        return None
+    i += 13
+    price = float(message[i:message.find('"', i)])
+    ts = None
+    i = message.rfind('"ts":')
+    if i > 0:
+        end = message.find('}', i)
+        comma = message.find(',', i, end)
+        ts = int(message[i + 5:comma if comma > 0 else end]) / 1000
+    return symbol, price, ts
+
+
+def decode_bingx_ticker(payload):
+    """
+    Вырезает тикер из распакованного кадра BingX (bytes).
+
+    Returns:
+        tuple[str, float, float | None] | None: (символ без дефиса, цена, время биржи в секундах)
+        или None, если это не одиночный тикер.
+    """
+    i = payload.find(b'"data":{')
+    if i < 0:
+        return None
+    s = payload.find(b'"s":"', i)
+    c = payload.find(b'"c":"', i)
+    if s < 0 or c < 0:
+        return None
+    symbol = payload[s + 5:payload.find(b'"', s + 5)].decode().replace('-', '')
+    price = float(payload[c + 5:payload.find(b'"', c + 5)])
+    ts = None
+    e = payload.find(b'"E":', i)
+    if e > 0:
+        end = payload.find(b'}', e)
+        comma = payload.find(b',', e, end)
+        ts = int(payload[e + 4:comma if comma > 0 else end]) / 1000
+    return symbol, price, ts
@@ -1,20 +1,79 @@
 import asyncio
 import logging
 
-from app_queue.redis_queue import pop
+from app_queue.redis_queue import pop_many_async, push_many
+from bot.config import (
+    TELEGRAM_CHAT_BURST,
+    TELEGRAM_CHAT_RATE_PER_MIN,
+    TELEGRAM_COALESCE_WINDOW_MS,
+    TELEGRAM_GLOBAL_RATE,
+    TELEGRAM_SEND_CONCURRENCY,
+    TELEGRAM_SHUTDOWN_TIMEOUT,
+)
+from services.telegram.coalescer import AlertCoalescer
+from services.telegram.rate_limiter import TelegramRateLimiter
 from services.telegram.sender import send_task_message
+from services.telegram.sender_pool import SenderPool
+
+POP_BATCH_SIZE = 20
+POP_TIMEOUT = 1.0
+
+
+def create_sender_pool() -> SenderPool:
+    limiter = TelegramRateLimiter(
+        global_rate=TELEGRAM_GLOBAL_RATE,
+        group_rate_per_minute=TELEGRAM_CHAT_RATE_PER_MIN,
+        group_burst=TELEGRAM_CHAT_BURST,
+    )
+    return SenderPool(send_task_message, limiter, TELEGRAM_SEND_CONCURRENCY)
+
+
+def create_coalescer() -> AlertCoalescer | None:
+    if TELEGRAM_COALESCE_WINDOW_MS <= 0:
+        return None
+    return AlertCoalescer(TELEGRAM_COALESCE_WINDOW_MS / 1000)
 
 
 async def worker() -> None:
-    while True:
-        try:
-            item = await asyncio.to_thread(pop)
-            if not item:
-                await asyncio.sleep(0.5)
+    pool = create_sender_pool()
+    coalescer = create_coalescer()
+    try:
+        while True:
+            timeout = POP_TIMEOUT
+            if coalescer is not None:
+                deadline = coalescer.next_deadline()
+                if deadline is not None:
+                    timeout = max(0.01, min(timeout, deadline))
+
+            try:
+                items = await pop_many_async(POP_BATCH_SIZE, timeout=timeout)
+            except Exception as exc:  # noqa: BLE001
+                logging.exception("Worker error: %s", exc)
+                await asyncio.sleep(1.0)
                 continue
 
-            await send_task_message(item)
-            await asyncio.sleep(0.3)
-        except Exception as exc:  # noqa: BLE001
-            logging.exception("Worker error: %s", exc)
-            await asyncio.sleep(1.0)
+            if coalescer is not None:
+                ready = []
+                for item in items:
+                    ready.extend(coalescer.add(item))
+                ready.extend(coalescer.flush_due())
+                items = ready
+
+            for item in items:
+                await pool.submit(item)
+    finally:
+        # Alerts still held by the coalescer get the same shutdown window as the
+        # pool; those that do not fit in memory go back to Redis with the rest
+        leftovers = coalescer.flush_all() if coalescer is not None else []
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + TELEGRAM_SHUTDOWN_TIMEOUT
+        while leftovers:
+            try:
+                await asyncio.wait_for(pool.submit(leftovers[0]), deadline - loop.time())
+            except asyncio.TimeoutError:
+                break
+            leftovers.pop(0)
+        unsent = await pool.close(max(0.0, deadline - loop.time())) + leftovers
+        if unsent:
+            logging.warning("Returning %d unsent messages to the queue", len(unsent))
+            await asyncio.to_thread(push_many, unsent)